@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { CategoryTrafficSource, FirewallData, IDSData, IPCategoriesResponse, IPCategory, MergedData } from './interface';
+import { CategoryTrafficSource, Connection, GraphLevel, GraphResponse, HistogramBin, JobQuery, JobStatus, NodeCentrality, TopKValue, FirewallData, IDSData, IPCategoriesResponse, IPCategory, MergedData } from './interface';
 import { createAsyncThunk } from '@reduxjs/toolkit/react';
 
 // Fetch data template
@@ -40,12 +40,14 @@ const getDataTemplate = async () => {
     }
 };
 
-const getFirewallDataByDateTimeRange = async (start: string, end: string) => {
+// fields limits the returned columns, e.g. ['DateTime', 'SourceIP', 'DestinationIP', 'DestinationPort', 'Direction']
+const getFirewallDataByDateTimeRange = async (start: string, end: string, fields?: string[]) => {
     try {
         const response = await axios.get('http://127.0.0.1:5000/firewallDataByDateTime', {
             params: {
                 start_datetime: start,
                 end_datetime: end,
+                ...(fields ? { fields: fields.join(',') } : {}),
             },
         });
 
@@ -61,9 +63,10 @@ const getFirewallDataByDateTimeRange = async (start: string, end: string) => {
     }
 };
 
-const getIDSDataByDateTimeRange = async (start: string, end: string): Promise<IDSData[]> => {
+const getIDSDataByDateTimeRange = async (start: string, end: string, fields?: string[]): Promise<IDSData[]> => {
     try {
-        const response = await fetch(`http://127.0.0.1:5000/idsDataByDateTime?start_datetime=${start}&end_datetime=${end}`);
+        const fieldsParam = fields ? `&fields=${fields.join(',')}` : '';
+        const response = await fetch(`http://127.0.0.1:5000/idsDataByDateTime?start_datetime=${start}&end_datetime=${end}${fieldsParam}`);
         if (!response.ok) throw new Error("Failed to fetch IDS data");
         const data: IDSData[] = await response.json();
         console.log("Fetched IDS Data:", data);
@@ -74,82 +77,44 @@ const getIDSDataByDateTimeRange = async (start: string, end: string): Promise<ID
     }
 };
 
-const normalizeIP = (ip: string) => ip.trim();
-
+// Firewall rows joined with the matching IDS alert (same SourceIP/DestinationIP, less than a minute apart),
+// the matching runs on the server, see /correlatedData
 const getMergedDataByDateTimeRange = async (start: string, end: string): Promise<MergedData[]> => {
     try {
-        const [firewallData, idsData] = await Promise.all([
-            getFirewallDataByDateTimeRange(start, end),
-            getIDSDataByDateTimeRange(start, end),
-        ]);
-
-        console.log(`Firewall data records: ${firewallData.length}`);
-        console.log(`IDS data records: ${idsData.length}`);
-
-        firewallData.forEach((firewall) => {
-            const matches = idsData.filter((ids) => {
-                const isSourceMatch = normalizeIP(ids.SourceIP) === normalizeIP(firewall.SourceIP);
-                const isDestinationMatch = normalizeIP(ids.DestinationIP) === normalizeIP(firewall.DestinationIP);
-                const firewallTime = new Date(firewall.DateTime).getTime();
-                const idsTime = new Date(ids.DateTime).getTime();
-                const isTimeMatch = Math.abs(idsTime - firewallTime) < 1000 * 60;
-
-                if (!isSourceMatch) {
-                    console.warn(`Source IP mismatch: Firewall (${firewall.SourceIP}) vs IDS (${ids.SourceIP})`);
-                }
-                if (!isDestinationMatch) {
-                    console.warn(`Destination IP mismatch: Firewall (${firewall.DestinationIP}) vs IDS (${ids.DestinationIP})`);
-                }
-                if (!isTimeMatch) {
-                    console.warn(`Time mismatch: Firewall (${firewall.DateTime}) vs IDS (${ids.DateTime})`);
-                }
-
-                return isSourceMatch && isDestinationMatch && isTimeMatch;
-            });
-
-            if (matches.length === 0) {
-                console.warn(`No match for Firewall entry:`, firewall);
-            } else {
-                console.log(`Match found for Firewall entry:`, firewall, matches);
-            }
+        const response = await axios.get('http://127.0.0.1:5000/correlatedData', {
+            params: {
+                start_datetime: start,
+                end_datetime: end,
+            },
         });
 
-        const mergedData: MergedData[] = firewallData.map((firewall) => {
-            const matchingIDS = idsData.find(
-                (ids) =>
-                    normalizeIP(ids.SourceIP) === normalizeIP(firewall.SourceIP) &&
-                    normalizeIP(ids.DestinationIP) === normalizeIP(firewall.DestinationIP) &&
-                    Math.abs(new Date(ids.DateTime).getTime() - firewall.DateTime.getTime()) < 1000 * 60 // Match within 1 minute
-            );
-
-            return {
-                DateTime: firewall.DateTime,
-                SourceIP: firewall.SourceIP,
-                DestinationIP: firewall.DestinationIP,
-                DestinationService: firewall.DestinationService || "",
-                Direction: firewall.Direction || "",
-                ConnectionsBuilt: firewall.ConnectionsBuilt || "",
-                ConnectionsTornDown: firewall.ConnectionsTornDown || "",
-                Protocol: firewall.Protocol || "TCP",
-                SyslogPriority: firewall.SyslogPriority || "",
-                Operation: firewall.Operation || "",
-                MessageCode: firewall.MessageCode || "",
-                Classification: matchingIDS?.Classification || "Unclassified",
-                Priority: matchingIDS?.Priority || 0,
-                Label: matchingIDS?.Label || firewall.Direction || "Unknown",
-                PacketInfo: matchingIDS?.PacketInfo || "",
-                PacketInfoContd: matchingIDS?.PacketInfoContd || "",
-                XRef: matchingIDS?.XRef || "",
-                SourceHostname: firewall.SourceHostname || "",
-                DestinationHostname: firewall.DestinationHostname || "",
-                SourcePort: matchingIDS?.SourcePort || firewall.SourcePort || "",
-                DestinationPort: matchingIDS?.DestinationPort || firewall.DestinationPort || "",
-                Betweenness: 0,
-                Eigenvector: 0,
-                Degree: 0,
-                Closeness: 0,
-            };
-        });
+        const mergedData: MergedData[] = response.data.map((item: any) => ({
+            DateTime: new Date(item.DateTime),
+            SourceIP: item.SourceIP,
+            DestinationIP: item.DestinationIP,
+            DestinationService: item.DestinationService || "",
+            Direction: item.Direction || "",
+            ConnectionsBuilt: item.ConnectionsBuilt || "",
+            ConnectionsTornDown: item.ConnectionsTornDown || "",
+            Protocol: item.Protocol || "TCP",
+            SyslogPriority: item.SyslogPriority || "",
+            Operation: item.Operation || "",
+            MessageCode: item.MessageCode || "",
+            Classification: item.Classification || "Unclassified",
+            Priority: item.Priority || 0,
+            Label: item.Label || item.Direction || "Unknown",
+            PacketInfo: item.PacketInfo || "",
+            PacketInfoContd: item.PacketInfoContd || "",
+            XRef: item.Xref || "",
+            SourceHostname: item.SourceHostname || "",
+            DestinationHostname: item.DestinationHostname || "",
+            SourcePort: item.SourcePort || "",
+            DestinationPort: item.DestinationPort || "",
+            Betweenness: 0,
+            Eigenvector: 0,
+            Degree: 0,
+            Closeness: 0,
+        }));
 
         console.log(`Merged data records: ${mergedData.length}`);
 
@@ -214,6 +179,262 @@ export const fetchAllCategoryData = async (
 };
 
 
+// Fetch deduplicated connections, sourcePrefix/destinationPrefix group the IPs by subnet (e.g. 24)
+export const fetchConnections = async (
+    source: CategoryTrafficSource,
+    startDateTime?: string,
+    endDateTime?: string,
+    sourcePrefix: number = 32,
+    destinationPrefix: number = 32,
+    byPort: boolean = false
+): Promise<Connection[]> => {
+    try {
+        const baseUrl = `http://localhost:5000/connections/${source}`;
+        const params = new URLSearchParams();
+
+        if (startDateTime) params.append('start_datetime', startDateTime);
+        if (endDateTime) params.append('end_datetime', endDateTime);
+        params.append('source_prefix', sourcePrefix.toString());
+        params.append('destination_prefix', destinationPrefix.toString());
+        params.append('by_port', byPort.toString());
+
+        const response = await fetch(`${baseUrl}?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || `Failed to fetch ${source} connections`);
+        }
+
+        const data: any[] = await response.json();
+        return data.map((item) => ({
+            ...item,
+            FirstSeen: new Date(item.FirstSeen),
+            LastSeen: new Date(item.LastSeen),
+        }));
+    } catch (error) {
+        console.error(`Error fetching ${source} connections:`, error);
+        throw error;
+    }
+};
+
+
+// Fetch the value counts of one attribute, e.g. Protocol or DestinationPort, optionally only for traffic of a category
+export const fetchHistogram = async (
+    source: CategoryTrafficSource,
+    attribute: string,
+    startDateTime?: string,
+    endDateTime?: string,
+    category?: string
+): Promise<HistogramBin[]> => {
+    try {
+        const baseUrl = `http://localhost:5000/histogram/${source}/${attribute}`;
+        const params = new URLSearchParams();
+
+        if (startDateTime) params.append('start_datetime', startDateTime);
+        if (endDateTime) params.append('end_datetime', endDateTime);
+        if (category) params.append('category', category);
+
+        const response = await fetch(`${baseUrl}?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || `Failed to fetch ${source} ${attribute} histogram`);
+        }
+
+        return await response.json();
+    } catch (error) {
+        console.error(`Error fetching ${source} ${attribute} histogram:`, error);
+        throw error;
+    }
+};
+
+// Fetch the k most frequent values of an attribute, e.g. SourceIP or Classification,
+// exact is false when the counts are estimates from the server's summaries
+export const fetchTopK = async (
+    source: CategoryTrafficSource,
+    attribute: string,
+    startDateTime?: string,
+    endDateTime?: string,
+    k: number = 10
+): Promise<{ values: TopKValue[]; exact: boolean }> => {
+    try {
+        const baseUrl = `http://localhost:5000/topK/${source}/${attribute}`;
+        const params = new URLSearchParams();
+
+        if (startDateTime) params.append('start_datetime', startDateTime);
+        if (endDateTime) params.append('end_datetime', endDateTime);
+        params.append('k', k.toString());
+
+        const response = await fetch(`${baseUrl}?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || `Failed to fetch top ${source} ${attribute} values`);
+        }
+
+        return {
+            values: (await response.json()) as TopKValue[],
+            exact: response.headers.get('X-TopK-Exact') !== 'false',
+        };
+    } catch (error) {
+        console.error(`Error fetching top ${source} ${attribute} values:`, error);
+        throw error;
+    }
+};
+
+// Fetch the centrality of every IP of the window, source selects the connections the graph is built from
+export const fetchCentrality = async (
+    startDateTime?: string,
+    endDateTime?: string,
+    source: CategoryTrafficSource | 'all' = 'all'
+): Promise<NodeCentrality[]> => {
+    try {
+        const baseUrl = 'http://localhost:5000/centrality';
+        const params = new URLSearchParams();
+
+        if (startDateTime) params.append('start_datetime', startDateTime);
+        if (endDateTime) params.append('end_datetime', endDateTime);
+        params.append('source', source);
+
+        const response = await fetch(`${baseUrl}?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to fetch centrality');
+        }
+
+        return (await response.json()) as NodeCentrality[];
+    } catch (error) {
+        console.error('Error fetching centrality:', error);
+        throw error;
+    }
+};
+
+
+// Fetch the graph of the window with categories and /24 subnets as super-nodes,
+// expand lists the node ids to show as their members (e.g. 'Workstations' or 'Workstations:172.23.1.0/24'),
+// layout adds X/Y positions computed (and cached) on the server
+export const fetchGraph = async (
+    startDateTime?: string,
+    endDateTime?: string,
+    level: GraphLevel = 'category',
+    expand: string[] = [],
+    source: CategoryTrafficSource | 'all' = 'all',
+    layout: boolean = false
+): Promise<GraphResponse> => {
+    try {
+        const baseUrl = 'http://localhost:5000/graph';
+        const params = new URLSearchParams();
+
+        if (startDateTime) params.append('start_datetime', startDateTime);
+        if (endDateTime) params.append('end_datetime', endDateTime);
+        params.append('level', level);
+        params.append('source', source);
+        if (expand.length > 0) params.append('expand', expand.join(','));
+        if (layout) params.append('layout', 'true');
+
+        const response = await fetch(`${baseUrl}?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to fetch graph');
+        }
+
+        return (await response.json()) as GraphResponse;
+    } catch (error) {
+        console.error('Error fetching graph:', error);
+        throw error;
+    }
+};
+
+
+// Run a wide query in the background, e.g. a multi-day firewall window; poll it with fetchJobStatus
+export const submitJob = async (
+    query: JobQuery,
+    params: Record<string, string>
+): Promise<JobStatus> => {
+    try {
+        const response = await fetch('http://localhost:5000/jobs', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ query, params }),
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to submit job');
+        }
+
+        return (await response.json()) as JobStatus;
+    } catch (error) {
+        console.error('Error submitting job:', error);
+        throw error;
+    }
+};
+
+// Get the state and progress of a job
+export const fetchJobStatus = async (jobId: string): Promise<JobStatus> => {
+    try {
+        const response = await fetch(`http://localhost:5000/jobs/${jobId}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to fetch job status');
+        }
+
+        return (await response.json()) as JobStatus;
+    } catch (error) {
+        console.error('Error fetching job status:', error);
+        throw error;
+    }
+};
+
+// Cancel a job that is no longer needed, e.g. when another day is selected
+export const cancelJob = async (jobId: string): Promise<JobStatus> => {
+    try {
+        const response = await fetch(`http://localhost:5000/jobs/${jobId}`, { method: 'DELETE' });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to cancel job');
+        }
+
+        return (await response.json()) as JobStatus;
+    } catch (error) {
+        console.error('Error cancelling job:', error);
+        throw error;
+    }
+};
+
+// Fetch one page of the rows of a finished job, nextCursor is null after the last page
+export const fetchJobResult = async <T>(
+    jobId: string,
+    limit: number = 10000,
+    cursor?: string
+): Promise<{ rows: T[]; nextCursor: string | null; total: number }> => {
+    try {
+        const params = new URLSearchParams();
+        params.append('limit', limit.toString());
+        if (cursor) params.append('cursor', cursor);
+
+        const response = await fetch(`http://localhost:5000/jobs/${jobId}/result?${params.toString()}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to fetch job result');
+        }
+
+        return {
+            rows: (await response.json()) as T[],
+            nextCursor: response.headers.get('X-Next-Cursor'),
+            total: Number(response.headers.get('X-Total-Count')),
+        };
+    } catch (error) {
+        console.error('Error fetching job result:', error);
+        throw error;
+    }
+};
+
 // Add new fetcher function
 export const fetchIPCategories = async (
     startDateTime?: string,
@@ -86,4 +86,91 @@ export interface IPCategoriesResponse {
     [category: string]: string[] | null;
 }
 
-export type CategoryTrafficSource = 'firewall' | 'ids';
\ No newline at end of file
+export type CategoryTrafficSource = 'firewall' | 'ids';
+
+export interface Connection {
+    SourceIP: string;
+    DestinationIP: string;
+    DestinationPort?: number;
+    Count: number;
+    FirstSeen: Date;
+    LastSeen: Date;
+    // Firewall connections
+    ConnectionsBuilt?: number;
+    ConnectionsTornDown?: number;
+    Protocol?: string;
+    // IDS connections
+    Priority?: number;
+    Classification?: string;
+}
+
+export interface NodeCentrality {
+    IP: string;
+    Degree: number;
+    Eigenvector: number;
+    Closeness: number;
+    Betweenness: number;
+}
+
+export type GraphLevel = 'category' | 'subnet' | 'ip';
+
+export interface GraphNode {
+    Id: string;
+    Level: GraphLevel;
+    Category: string;
+    Parent: string | null;
+    Members: number;
+    Count: number;
+    InternalCount: number;
+    Expandable: boolean;
+    // With layout, position between 0 and 1
+    X?: number;
+    Y?: number;
+}
+
+export interface GraphEdge {
+    Source: string;
+    Target: string;
+    Count: number;
+    FirstSeen: string;
+    LastSeen: string;
+    Connections: number;
+}
+
+export interface GraphResponse {
+    nodes: GraphNode[];
+    edges: GraphEdge[];
+}
+
+// One value of a histogram, keyed by the attribute name like the rows of the data
+export interface HistogramBin {
+    [attribute: string]: string | number;
+    Count: number;
+}
+
+export type JobQuery = 'firewallDataByDateTime' | 'idsDataByDateTime' | 'categoryTraffic';
+
+export type JobState = 'queued' | 'running' | 'done' | 'failed' | 'cancelled';
+
+// Status of a background query job, times in seconds since the epoch
+export interface JobStatus {
+    id: string;
+    query: JobQuery;
+    params: Record<string, string | null>;
+    state: JobState;
+    // Partitions done of total, null until the job starts
+    progress: { done: number; total: number } | null;
+    rows: number | null;
+    error: string | null;
+    submitted: number;
+    started: number | null;
+    finished: number | null;
+    cancel_requested: boolean;
+}
+
+// One of the most frequent values of an attribute, the true count lies within [Count - Error, Count]
+export interface TopKValue {
+    [attribute: string]: string | number;
+    Count: number;
+    Error: number;
+}
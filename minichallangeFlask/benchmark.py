@@ -0,0 +1,372 @@
+"""
+Backend benchmark on synthetic data.
+
+Generates a dataset (see utils.syntheticData) in a scratch folder, measures
+the ingest of the CSVs (time and peak RSS, in a separate process), the
+warm-up of the app and the latency of every route over windows of growing
+size, through the Flask test client (no network). Every route is timed with
+cold query and partition summary caches (partitions stay loaded) and once
+more when cached. Wide queries are also run as background jobs (submit, poll
+until done and fetch a result page), and the routes without a window (probes,
+metrics and reports) are timed once per run.
+
+    python benchmark.py --rows 1000000 --days 2 --output results.json
+    python benchmark.py --baseline results.json   # exit code 1 on a regression
+
+Peak RSS is only available where the resource module is (not on Windows).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from urllib.parse import parse_qsl
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Routes timed per window, {window} is replaced by the start_datetime/end_datetime parameters
+ROUTES = [
+    '/firewallDataByDateTime?{window}&limit=1000',
+    '/idsDataByDateTime?{window}&limit=1000',
+    '/firewallDataByDateTime?{window}&limit=1000&format=arrow',
+    '/ipCategories?{window}',
+    '/categoryTraffic/firewall/Workstations?{window}&limit=1000',
+    '/categoryTraffic/ids/Anomalies?{window}&limit=1000',
+    '/aggregatedByTime?{window}&interval=5min',
+    '/connections/firewall?{window}&limit=1000',
+    '/connections/ids?{window}&source_prefix=24&limit=1000',
+    '/correlatedData?{window}&limit=1000',
+    '/centrality?{window}&limit=1000',
+    '/graph?{window}&level=category',
+    '/graph?{window}&level=subnet&layout=true',
+    '/histogram/firewall/DestinationPort?{window}',
+    '/histogram/ids/Classification?{window}&category=Workstations',
+    '/topK/firewall/SourceIP?{window}&k=20',
+    '/topK/ids/Classification?{window}',
+]
+
+# Routes without a window, timed once
+STATIC_ROUTES = [
+    '/health',
+    '/ready',
+    '/metrics',
+    '/cacheStats',
+    '/memoryReport',
+    '/dataTemplate',
+]
+
+# Queries run as background jobs per window, see time_job
+JOB_QUERIES = [
+    ('firewallDataByDateTime', {}),
+    ('categoryTraffic', {'source': 'firewall', 'category': 'Workstations'}),
+]
+
+# Rows per result page fetched from a finished job
+JOB_RESULT_LIMIT = 1000
+
+# Seconds between polls of a running job
+JOB_POLL_SECONDS = 0.01
+
+# Window sizes, 'all' is the whole dataset
+WINDOWS = ['1h', '6h', '1D', 'all']
+
+
+def get_peak_rss():
+    """Peak resident memory of this process in MB, None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_ingest(root):
+    """
+    Build the partition caches of a dataset from scratch, run in a child process.
+
+    Parameters:
+    root (str): Folder containing data/firewall and data/intrusion-detection.
+
+    Returns:
+    dict: Seconds per dataset, total rows and peak RSS in MB
+    """
+    from utils.ingest import update_partition_cache, get_partition_index
+    from utils.schema import firewall_schema, intrusion_detection_schema
+
+    result = {'rows': 0}
+    for dataset, schema in (('firewall', firewall_schema), ('intrusion-detection', intrusion_detection_schema)):
+        start = time.perf_counter()
+        manifest = update_partition_cache(os.path.join(root, 'data', dataset), dataset, schema, rebuild=True)
+        result[f'{dataset}_seconds'] = round(time.perf_counter() - start, 3)
+        result['rows'] += sum(partition['rows'] for partition in get_partition_index(manifest))
+    result['peak_rss_mb'] = get_peak_rss()
+    return result
+
+
+def get_windows(start, end):
+    """
+    Get the benchmark windows starting at the first row.
+
+    Parameters:
+    start (pd.Timestamp): Time of the first row.
+    end (pd.Timestamp): Time of the last row.
+
+    Returns:
+    dict: Window name -> query string
+    """
+    windows = {}
+    for name in WINDOWS:
+        window_end = end if name == 'all' else min(end, start + pd.Timedelta(name))
+        windows[name] = f"start_datetime={start.isoformat()}&end_datetime={window_end.isoformat()}"
+    return windows
+
+
+def summarize(latencies, response, body, cached):
+    """
+    Summarize the latencies of one route.
+
+    Parameters:
+    latencies (list): Cold latencies in ms.
+    response (TestResponse): Last cold response.
+    body (bytes): Body of the last cold response.
+    cached (float or None): Latency of a cached request in ms, None where there is none.
+
+    Returns:
+    dict: Status, response bytes, p50/p99 of the cold requests and the cached latency in ms
+    """
+    return {
+        'status': response.status_code,
+        'bytes': len(body),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'cached_ms': round(cached, 2) if cached is not None else None,
+    }
+
+
+def time_route(client, url, repeat, clear_caches):
+    """
+    Time one request repeatedly.
+
+    Parameters:
+    client (FlaskClient): Test client of the app.
+    url (str): Request path and query.
+    repeat (int): Number of cold requests.
+    clear_caches (callable): Called before every cold request.
+
+    Returns:
+    dict: See summarize
+    """
+    latencies = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        response = client.get(url)
+        body = response.get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    client.get(url).get_data()
+    return summarize(latencies, response, body, (time.perf_counter() - start) * 1000)
+
+
+def time_job(client, query, params, repeat, clear_caches):
+    """
+    Time a query run as a background job: the submit, the polls until it is
+    done, the whole run and the first result page.
+
+    Parameters:
+    client (FlaskClient): Test client of the app.
+    query (str): Query of the job, see the /jobs route.
+    params (dict): Parameters of the query, with the window.
+    repeat (int): Number of cold jobs.
+    clear_caches (callable): Called before every job.
+
+    Returns:
+    dict: Route name -> timing, see summarize
+    """
+    from utils.jobs import FINISHED_STATES
+
+    submits, polls, runs, results = [], [], [], []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        submitted = client.post('/jobs', json={'query': query, 'params': params})
+        submit_body = submitted.get_data()
+        submits.append((time.perf_counter() - start) * 1000)
+        if submitted.status_code != 202:
+            break
+
+        status_url = submitted.headers['Location']
+        while True:
+            poll_start = time.perf_counter()
+            polled = client.get(status_url)
+            poll_body = polled.get_data()
+            polls.append((time.perf_counter() - poll_start) * 1000)
+            if polled.get_json()['state'] in FINISHED_STATES:
+                break
+            time.sleep(JOB_POLL_SECONDS)
+        runs.append((time.perf_counter() - start) * 1000)
+
+        result_url = f"{status_url}/result?limit={JOB_RESULT_LIMIT}"
+        result_start = time.perf_counter()
+        result = client.get(result_url)
+        result_body = result.get_data()
+        results.append((time.perf_counter() - result_start) * 1000)
+
+    name = f"POST /jobs {query}"
+    timings = {name: summarize(submits, submitted, submit_body, None)}
+    if submitted.status_code != 202:
+        return timings
+
+    start = time.perf_counter()
+    client.get(result_url).get_data()
+    timings.update({
+        f"GET /jobs/<id> {query}": summarize(polls, polled, poll_body, None),
+        f"job {query} (submit to done)": summarize(runs, polled, poll_body, None),
+        f"GET /jobs/<id>/result?limit={JOB_RESULT_LIMIT} {query}":
+            summarize(results, result, result_body, (time.perf_counter() - start) * 1000),
+    })
+    return timings
+
+
+def print_timing(route, window, timing):
+    """Print one line of the results"""
+    cached = f"{timing['cached_ms']:>8.2f} ms" if timing['cached_ms'] is not None else f"{'-':>8}   "
+    print(f"{route:<62} {window:>4} {timing['status']} p50 {timing['p50_ms']:>9.2f} ms  "
+          f"p99 {timing['p99_ms']:>9.2f} ms  cached {cached}")
+
+
+def run_routes(root, repeat):
+    """
+    Import the app on a dataset, wait for the warm-up and time every route and window.
+
+    Parameters:
+    root (str): Folder containing the data folder, becomes the working directory.
+    repeat (int): Cold requests per route and window.
+
+    Returns:
+    dict: Warm-up seconds, peak RSS and the timings per route and window
+    """
+    os.chdir(root)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    from utils.dataProcessing import query_cache, get_firewall_store, get_intrusion_detection_store
+
+    start = time.perf_counter()
+    main.start_warm_up()
+    while main.warm_up.warming_up:
+        time.sleep(0.05)
+    warm_up = {'seconds': round(time.perf_counter() - start, 3), 'status': main.warm_up.status}
+
+    partitions = get_firewall_store().partitions
+    windows = get_windows(partitions[0]['start'], partitions[-1]['end'])
+    stores = (get_firewall_store(), get_intrusion_detection_store())
+
+    def clear_caches():
+        # Rollups and heavy hitter summaries too, or /aggregatedByTime and /topK would be timed warm
+        query_cache.clear()
+        for store in stores:
+            store.summary_cache.clear()
+
+    client = main.app.test_client()
+    routes = {}
+    for route in ROUTES:
+        for name, window in windows.items():
+            timing = time_route(client, route.format(window=window), repeat, clear_caches)
+            routes.setdefault(route, {})[name] = timing
+            print_timing(route, name, timing)
+    for query, params in JOB_QUERIES:
+        for name, window in windows.items():
+            for route, timing in time_job(client, query, dict(parse_qsl(window), **params), repeat, clear_caches).items():
+                routes.setdefault(route, {})[name] = timing
+                print_timing(route, name, timing)
+    for route in STATIC_ROUTES:
+        timing = time_route(client, route, repeat, clear_caches)
+        routes[route] = {'none': timing}
+        print_timing(route, 'none', timing)
+    return {'warm_up': warm_up, 'peak_rss_mb': get_peak_rss(), 'routes': routes}
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare the route latencies with an earlier run.
+
+    Parameters:
+    results (dict): Result of this run.
+    baseline (dict): Result of an earlier run.
+    tolerance (float): Allowed slowdown factor of the p50 latency.
+
+    Returns:
+    list: Descriptions of the routes and windows that got slower
+    """
+    regressions = []
+    for route, windows in results['routes'].items():
+        for name, timing in windows.items():
+            before = baseline.get('routes', {}).get(route, {}).get(name)
+            if before and timing['p50_ms'] > before['p50_ms'] * tolerance:
+                regressions.append(f"{route} [{name}]: p50 {before['p50_ms']} ms -> {timing['p50_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingest and routes on synthetic data.')
+    parser.add_argument('--rows', type=int, default=200000, help='Firewall rows per day')
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=10, help='Cold requests per route and window')
+    parser.add_argument('--data-root', default=None,
+                        help='Folder with an existing data folder to use instead of generating one')
+    parser.add_argument('--output', default=None, help='Write the results as JSON')
+    parser.add_argument('--baseline', default=None, help='Results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Allowed p50 slowdown factor')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # Only warnings and errors of the server, the status lines would interleave with the results
+    from utils.metrics import configure_logging
+    configure_logging('WARNING')
+    root = args.data_root or tempfile.mkdtemp(prefix='hpdav-benchmark-')
+    results = {'rows_per_day': args.rows, 'days': args.days}
+    try:
+        if args.data_root is None:
+            from utils.syntheticData import generate_dataset
+            start = time.perf_counter()
+            generate_dataset(os.path.join(root, 'data', 'firewall'), os.path.join(root, 'data', 'intrusion-detection'),
+                             args.rows, args.days)
+            print(f"Generated {args.days} day(s) of {args.rows} firewall rows in {time.perf_counter() - start:.1f}s")
+
+        # A fresh process, so the peak RSS is the one of the ingest alone
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results['ingest'] = executor.submit(run_ingest, root).result()
+        print(f"Ingest: {results['ingest']}")
+
+        results.update(run_routes(root, args.repeat))
+        print(f"Warm-up: {results['warm_up']}, peak RSS {results['peak_rss_mb']} MB")
+    finally:
+        if args.data_root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
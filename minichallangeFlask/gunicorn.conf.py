@@ -0,0 +1,40 @@
+"""
+Production serving: gunicorn -c gunicorn.conf.py main:app
+
+Every worker process runs its own warm-up (see utils.warmup) and query caches,
+but the partitions are memory-mapped from shared files (see utils.sharedStore),
+so N workers share one copy of the numeric and categorical columns. The master
+ingests the CSVs and writes the shared files once before the workers start.
+"""
+
+import os
+
+# Must be set before the workers import the app
+os.environ.setdefault('HPDAV_SHARED_STORE', '1')
+
+bind = os.environ.get('HPDAV_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('HPDAV_WORKERS', os.cpu_count() or 1))
+
+# Threads per worker, requests of one worker share its caches
+worker_class = 'gthread'
+threads = int(os.environ.get('HPDAV_THREADS', '4'))
+
+# Wide windows over the full dataset can take a while on a cold cache
+timeout = 300
+
+# Every worker imports the app and starts its own warm-up thread, see post_fork
+preload_app = False
+
+
+def on_starting(server):
+    """Build the partition caches and shared files once, in the master"""
+    from utils.metrics import configure_logging
+    from utils.dataProcessing import build_shared_store
+    configure_logging()
+    build_shared_store()
+
+
+def post_fork(server, worker):
+    """Start the warm-up of a worker, threads don't survive a fork so it can't run in the master"""
+    from main import start_warm_up
+    start_warm_up()
@@ -1,11 +1,150 @@
-from flask import Flask, jsonify, request
+import os
+from flask import Flask, Response, jsonify, request, g, url_for
 from flask_cors import CORS
-from utils.dataProcessing import get_firewall_category_traffic,get_ids_category_traffic, categorize_ip_addresses,get_aggregated_data_by_ip_and_port, get_first_10_rows_firewall, get_first_10_rows_intrusion_detection, get_firewall_data_by_datetime,  get_intrusion_detection_data_by_datetime 
+from utils.responses import frame_response, get_output_format, tables_response
+from utils.connections import get_prefix
+from utils.centrality import DEFAULT_SAMPLES
+from utils.warmup import WarmUp, RETRY_AFTER_SECONDS
+from utils.metrics import start_request, finish_request, render_metrics, get_recorded, configure_logging
+from utils.jobs import JobQueue, QueueFullError
+from utils.httpCache import get_etag, get_encoded_etag, get_matching_etag, get_encoding, is_compressible, get_compressed, get_cached_compressed
+from utils.dataProcessing import get_firewall_category_traffic,get_ids_category_traffic, categorize_ip_addresses, get_cache_statistics, get_memory_report, get_aggregated_data_by_time, get_connections, get_correlated_data, get_centrality, get_graph, get_histogram, get_top_values, get_warm_up_steps, get_metric_samples, get_dataset_tag, check_job_query, run_job_query, get_firewall_data_slices_by_datetime, get_intrusion_detection_data_slices_by_datetime
 
 
+configure_logging()
+
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'X-Centrality-Exact', 'X-TopK-Exact', 'Retry-After', 'Server-Timing', 'ETag', 'Location'])
+
+# Loads the data in the background, so the port opens right away, see start_warm_up
+warm_up = WarmUp(get_warm_up_steps())
+
+# Runs wide queries in the background, see the /jobs routes, its threads start with the first job
+job_queue = JobQueue()
+
+def start_warm_up():
+    """
+    Start the background warm-up of the serving process, does nothing once started
+    Called on the first request (see start_warm_up_on_first_request) instead of
+    at import, so processes that only import the app (the reloader's watcher,
+    the gunicorn master) don't load the data. The __main__ block and the
+    gunicorn post_fork hook start it before the first request.
+    """
+    return warm_up.start()
+
+def warming_up_response():
+    """503 with the warm-up progress, telling the client when to retry"""
+    response = jsonify(dict(warm_up.get_status(), error="Server is warming up, retry later"))
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
+@app.before_request
+def start_timing():
+    """Collect the stage timings of the request, see utils.metrics"""
+    start_request()
+
+@app.before_request
+def start_warm_up_on_first_request():
+    """Start the warm-up under any server, e.g. flask run or without the reloader"""
+    start_warm_up()
+
+@app.before_request
+def reject_while_warming_up():
+    """Answer data requests with 503 until the warm-up is done"""
+    if warm_up.warming_up and request.endpoint not in ('health', 'ready', 'metrics'):
+        return warming_up_response()
+
+# Endpoints answered without ETags, their responses don't only depend on the data
+# (job results are kept per job id and removed after HPDAV_JOB_TTL)
+UNCACHED_ENDPOINTS = ('health', 'ready', 'metrics', 'cache_stats', 'memory_report', 'job_status', 'job_result', 'static')
+
+def compressed_response(compressed, etag, encoding):
+    """Build a response from a body cached by utils.httpCache.get_compressed"""
+    response = Response(compressed['body'], 200, content_type=compressed['content_type'], headers=compressed['headers'])
+    response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = f'"{get_encoded_etag(etag, encoding)}"'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+@app.before_request
+def answer_from_http_cache():
+    """
+    Answer with 304 when the client's If-None-Match holds the current ETag, or
+    with the cached compressed body of a hot query, before any data is touched
+    """
+    g.etag = None
+    if request.method != 'GET' or request.endpoint in UNCACHED_ENDPOINTS or request.endpoint is None:
+        return None
+    if request.endpoint == 'graph' and request.args.get('layout', 'false').lower() == 'true':
+        # Layouts depend on the layouts computed before (see utils.layout), not only on the data
+        return None
+    try:
+        output_format = get_output_format(request.args, request.accept_mimetypes)
+        g.etag = get_etag(get_dataset_tag(), request.path, request.args, output_format)
+    except ValueError:
+        # Invalid window or format, the view answers with 400
+        return None
+
+    matching = get_matching_etag(request.if_none_match, g.etag)
+    if matching:
+        response = Response(status=304)
+        response.headers['ETag'] = f'"{matching}"'
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        return response
+
+    encoding = get_encoding(request.accept_encodings)
+    compressed = get_cached_compressed(g.etag, encoding) if encoding else None
+    if compressed is not None:
+        return compressed_response(compressed, g.etag, encoding)
+    return None
+
+@app.after_request
+def add_server_timing(response):
+    """Send the stage timings, row count and payload size as a Server-Timing header"""
+    payload_bytes = None if response.is_streamed else response.calculate_content_length()
+    server_timing = finish_request(request.endpoint, response.status_code, payload_bytes)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+@app.after_request
+def add_etag_and_compress(response):
+    """
+    Send the ETag of successful responses and compress large bodies, see utils.httpCache.
+    Registered after add_server_timing so it runs before it (Flask runs them in reverse),
+    which then reports the compressed size.
+    """
+    etag = g.get('etag')
+    if etag is None or response.status_code != 200 or 'ETag' in response.headers:
+        return response
+
+    encoding = get_encoding(request.accept_encodings)
+    if encoding and is_compressible(response, get_recorded('rows')):
+        response.set_data(get_compressed(etag, encoding, response)['body'])
+        response.headers['Content-Encoding'] = encoding
+    else:
+        encoding = None
+    response.headers['ETag'] = f'"{get_encoded_etag(etag, encoding)}"'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Liveness probe, answers as soon as the server runs, with the warm-up progress
+    """
+    return jsonify(warm_up.get_status()), 200
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe, 200 once the data is loaded, 503 with Retry-After before
+    """
+    if not warm_up.ready:
+        return warming_up_response()
+    return jsonify(warm_up.get_status()), 200
 
 # Define a route
 @app.route('/dataTemplate', methods=['GET'])
@@ -18,6 +157,17 @@ def data_template():
 
 @app.route('/firewallDataByDateTime', methods=['GET'])
 def firewall_data_by_date_time():
+    """
+    Get the raw firewall rows within a datetime window
+    Query parameters:
+    - start_datetime: Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime: End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - format (optional): 'json' (default), 'ndjson' to stream one record per line or 'arrow'
+      for an Arrow IPC stream; without it the Accept header picks the format
+    - fields (optional): Comma separated columns to return, e.g. 'DateTime,SourceIP,DestinationIP'
+    - limit (optional): Maximum number of rows to return
+    - cursor (optional): X-Next-Cursor header of the previous page
+    """
     start_datetime = request.args.get('start_datetime')
     end_datetime = request.args.get('end_datetime')
 
@@ -31,14 +181,14 @@ def firewall_data_by_date_time():
         print(f"Start datetime: {start_datetime}")
         print(f"End datetime: {end_datetime}")
 
-        # Fetch and filter data
-        data = get_firewall_data_by_datetime(start_datetime, end_datetime)
+        # Fetch and filter data, one slice per partition so wide windows are not copied
+        data = get_firewall_data_slices_by_datetime(start_datetime, end_datetime)
 
         # Ensure non-empty data
-        if data.empty:
+        if not data:
             return jsonify({"error": "No data found for the given date range"}), 404
 
-        return data.to_json(orient='records', date_format='iso'), 200
+        return frame_response(data, request.args, request.accept_mimetypes)
     except ValueError as ve:
         return jsonify({"error": f"Invalid datetime format: {str(ve)}"}), 400
     except KeyError as ke:
@@ -51,6 +201,17 @@ def firewall_data_by_date_time():
 # Route for IDS data by date range
 @app.route('/idsDataByDateTime', methods=['GET'])
 def ids_data_by_date_time():
+    """
+    Get the raw intrusion detection rows within a datetime window
+    Query parameters:
+    - start_datetime: Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime: End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - format (optional): 'json' (default), 'ndjson' to stream one record per line or 'arrow'
+      for an Arrow IPC stream; without it the Accept header picks the format
+    - fields (optional): Comma separated columns to return, e.g. 'DateTime,SourceIP,DestinationIP'
+    - limit (optional): Maximum number of rows to return
+    - cursor (optional): X-Next-Cursor header of the previous page
+    """
     start_datetime = request.args.get('start_datetime')
     end_datetime = request.args.get('end_datetime')
 
@@ -64,14 +225,14 @@ def ids_data_by_date_time():
         print(f"Start datetime: {start_datetime}")
         print(f"End datetime: {end_datetime}")
 
-        # Fetch and filter IDS data
-        data = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+        # Fetch and filter IDS data, one slice per partition so wide windows are not copied
+        data = get_intrusion_detection_data_slices_by_datetime(start_datetime, end_datetime)
 
         # Ensure non-empty data
-        if data.empty:
+        if not data:
             return jsonify({"error": "No data found for the given date range"}), 404
 
-        return data.to_json(orient='records', date_format='iso'), 200
+        return frame_response(data, request.args, request.accept_mimetypes)
     except ValueError as ve:
         return jsonify({"error": f"Invalid datetime format: {str(ve)}"}), 400
     except KeyError as ke:
@@ -126,10 +287,11 @@ def get_category_traffic_endpoint(source, category):
     Get traffic data for a specific category from firewall or IDS
     Path parameters:
     - source: 'firewall' or 'ids'
-    - category: Category name ('Anomalies', 'Firewalls', etc.)
+    - category: Category name ('Anomalies', 'Firewalls', etc.), or several comma separated names
     Query parameters:
     - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
     - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
     """
     try:
         start_datetime = request.args.get('start_datetime')
@@ -153,25 +315,376 @@ def get_category_traffic_endpoint(source, category):
         else:
             data = get_ids_category_traffic(category, start_datetime, end_datetime)
 
-        # Return empty if no data
-        if data.empty:
+        # Return empty if no data, as null when answering with JSON
+        if data.empty and get_output_format(request.args, request.accept_mimetypes) == 'json':
             return jsonify(None), 200
 
-        return data.to_json(orient='records', date_format='iso'), 200
+        return frame_response(data, request.args, request.accept_mimetypes)
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/aggregatedByTime', methods=['GET'])
+def aggregated_by_time():
+    """
+    Get firewall and IDS counts per time interval for the histograms and the timeline
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - interval (optional): Interval length, a whole number of minutes such as '1min' (default), '5min' or '1h'
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+        interval = request.args.get('interval', '1min')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        data = get_aggregated_data_by_time(start_datetime, end_datetime, interval)
+        return frame_response(data, request.args, request.accept_mimetypes)
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/connections/<source>', methods=['GET'])
+def connections(source):
+    """
+    Get the deduplicated connections (graph edges) of firewall or IDS traffic
+    Path parameters:
+    - source: 'firewall' or 'ids'
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - source_prefix (optional): Group source IPs by subnet prefix length, e.g. 24 (default 32, single IPs)
+    - destination_prefix (optional): Group destination IPs by subnet prefix length (default 32)
+    - by_port (optional): Whether connections to different destination ports are kept apart (default: false)
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        data = get_connections(
+            source.lower(),
+            start_datetime,
+            end_datetime,
+            source_prefix=get_prefix(request.args.get('source_prefix'), 'source_prefix'),
+            destination_prefix=get_prefix(request.args.get('destination_prefix'), 'destination_prefix'),
+            by_port=request.args.get('by_port', 'false').lower() == 'true',
+        )
+        return frame_response(data, request.args, request.accept_mimetypes)
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/correlatedData', methods=['GET'])
+def correlated_data():
+    """
+    Get the firewall rows of a window joined with the matching IDS alerts
+    (same SourceIP and DestinationIP, less than 60 seconds apart)
+    Query parameters:
+    - start_datetime: Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime: End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - matched_only (optional): Only return firewall rows with a matching alert (default: false)
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime,
+      fields=FirewallIndex,IDSIndex returns just the match indices
+    """
+    start_datetime = request.args.get('start_datetime')
+    end_datetime = request.args.get('end_datetime')
+
+    if not start_datetime or not end_datetime:
+        return jsonify({
+            "error": "Please provide start_datetime and end_datetime query parameters in 'YYYY-MM-DDTHH:MM:SS' format"
+        }), 400
+
+    try:
+        matched_only = request.args.get('matched_only', 'false').lower() == 'true'
+        data = get_correlated_data(start_datetime, end_datetime, matched_only)
+        return frame_response(data, request.args, request.accept_mimetypes)
+    except ValueError as ve:
+        return jsonify({"error": f"Invalid datetime format: {str(ve)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/centrality', methods=['GET'])
+def centrality():
+    """
+    Get degree, eigenvector, closeness and betweenness centrality of every IP in a window
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - source (optional): Build the graph from 'firewall', 'ids' or 'all' (default) connections
+    - samples (optional): Search sources for closeness and betweenness on large graphs (default 256)
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
+    Response headers:
+    - X-Centrality-Exact: 'false' when closeness and betweenness are sampled estimates
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        data = get_centrality(
+            start_datetime,
+            end_datetime,
+            source=request.args.get('source', 'all').lower(),
+            samples=int(request.args.get('samples', DEFAULT_SAMPLES)),
+        )
+        response = frame_response(data, request.args, request.accept_mimetypes)
+        if not isinstance(response, tuple):
+            response.headers['X-Centrality-Exact'] = str(data.attrs.get('exact', True)).lower()
+        return response
+
+    except ImportError as ie:
+        return jsonify({"error": str(ie)}), 501
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/graph', methods=['GET'])
+def graph():
+    """
+    Get the communication graph of a window with categories and /24 subnets as super-nodes
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - source (optional): Connections from 'firewall', 'ids' or 'all' (default)
+    - level (optional): 'category' (default), 'subnet' or 'ip'
+    - expand (optional): Comma separated ids of nodes to show as their members,
+      e.g. 'Workstations' or 'Workstations:172.23.1.0/24'
+    - layout (optional): 'true' to add X and Y node coordinates between 0 and 1 (default: false),
+      warm started from earlier layouts, so these responses have no ETag
+    Returns {"nodes": [...], "edges": [...]}, edges reference the node ids
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        expand = [node_id.strip() for node_id in request.args.get('expand', '').split(',') if node_id.strip()]
+        nodes, edges = get_graph(
+            request.args.get('source', 'all').lower(),
+            start_datetime,
+            end_datetime,
+            level=request.args.get('level', 'category').lower(),
+            expand=expand,
+            layout=request.args.get('layout', 'false').lower() == 'true',
+        )
+        return tables_response({'nodes': nodes, 'edges': edges})
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/histogram/<source>/<attribute>', methods=['GET'])
+def histogram(source, attribute):
+    """
+    Count how often every value of an attribute occurs in firewall or IDS traffic
+    Path parameters:
+    - source: 'firewall' or 'ids'
+    - attribute: Column to count, e.g. 'Protocol', 'DestinationPort' or 'Classification'
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - category (optional): Only count traffic involving IPs of this category (comma separated for several)
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        data = get_histogram(source.lower(), attribute, start_datetime, end_datetime,
+                             category=request.args.get('category'))
+        return frame_response(data, request.args, request.accept_mimetypes)
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/topK/<source>/<attribute>', methods=['GET'])
+def top_k(source, attribute):
+    """
+    Get the most frequent values of an attribute (e.g. SourceIP, DestinationPort,
+    DestinationService or Classification) from the per-minute summaries
+    Path parameters:
+    - source: 'firewall' or 'ids'
+    - attribute: Column to count, anything but DateTime
+    Query parameters:
+    - start_datetime (optional): Start datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - end_datetime (optional): End datetime in 'YYYY-MM-DDTHH:MM:SS' format
+    - k (optional): Number of values (default 10)
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime
+    Response headers:
+    - X-TopK-Exact: 'false' when Count is an upper bound, the true count is at least Count - Error
+    """
+    try:
+        start_datetime = request.args.get('start_datetime')
+        end_datetime = request.args.get('end_datetime')
+
+        # Validate dates if provided
+        if (start_datetime and not end_datetime) or (end_datetime and not start_datetime):
+            return jsonify({
+                "error": "Both start_datetime and end_datetime must be provided together"
+            }), 400
+
+        try:
+            k = int(request.args.get('k', 10))
+        except ValueError:
+            return jsonify({"error": "k must be an integer"}), 400
+
+        data = get_top_values(source.lower(), attribute, start_datetime, end_datetime, k)
+        response = frame_response(data, request.args, request.accept_mimetypes)
+        if not isinstance(response, tuple):
+            response.headers['X-TopK-Exact'] = str(data.attrs.get('exact', True)).lower()
+        return response
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Run a wide query in the background instead of holding the request
+    JSON body:
+    - query: 'firewallDataByDateTime', 'idsDataByDateTime' or 'categoryTraffic'
+    - params: Query parameters of that route, e.g. {"start_datetime": ..., "end_datetime": ...},
+      plus "source" and "category" for categoryTraffic
+    Answers 202 with the job status and its URL in the Location header,
+    429 with Retry-After when too many jobs are queued
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        query = body.get('query')
+        params = body.get('params') or {}
+        if not isinstance(params, dict):
+            return jsonify({"error": "params must be an object"}), 400
+
+        checked = check_job_query(query, params)
+        status = job_queue.submit(query, checked, lambda progress: run_job_query(checked, progress))
+        response = jsonify(status)
+        response.headers['Location'] = url_for('job_status', job_id=status['id'])
+        return response, 202
+
+    except QueueFullError as qe:
+        response = jsonify({"error": str(qe)})
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response, 429
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Get the state ('queued', 'running', 'done', 'failed' or 'cancelled') and
+    progress (partitions done of total) of a job
+    """
+    status = job_queue.get_status(job_id)
+    if status is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(status), 200
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel a job, a running one stops before its next partition
+    """
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(status), 200
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """
+    Get the rows of a finished job, 409 while it is not done
+    Query parameters:
+    - format, fields, limit, cursor (optional): See /firewallDataByDateTime, page
+      through the result with limit and the X-Next-Cursor header
+    """
+    try:
+        status = job_queue.get_status(job_id)
+        if status is None:
+            return jsonify({"error": f"Unknown job: {job_id}"}), 404
+        if status['state'] != 'done':
+            return jsonify(dict(status, error=f"Job is {status['state']}")), 409
+
+        return frame_response(job_queue.get_result(job_id), request.args, request.accept_mimetypes)
 
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics: request and stage latency histograms, cache hit rates and memory use
+    """
+    samples = get_metric_samples() + [
+        ('hpdav_ready', 'gauge', '1 once the warm-up is done.', (), [((), int(warm_up.ready))]),
+    ]
+    return Response(render_metrics(samples), 200, mimetype='text/plain; version=0.0.4')
+
+@app.route('/cacheStats', methods=['GET'])
+def cache_stats():
+    """
+    Get the hit/miss/eviction counters of the windowed query cache
+    """
+    return jsonify(get_cache_statistics()), 200
+
+@app.route('/memoryReport', methods=['GET'])
+def memory_report():
+    """
+    Get the memory used by the cached firewall and IDS frames, per column
+    """
+    return jsonify(get_memory_report()), 200
 
-print("Preloading data...")
-print(get_first_10_rows_firewall())
-print(get_first_10_rows_intrusion_detection())
-print("Data preloaded!")
 
 
 # Run the server
 if __name__ == '__main__':
+    # The reloader runs this module in a watching process too, only the serving child sets WERKZEUG_RUN_MAIN
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
     app.run(debug=True)
     
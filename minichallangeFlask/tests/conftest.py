@@ -0,0 +1,34 @@
+"""
+Fixtures shared by the tests: a small synthetic dataset (see utils.syntheticData)
+the module level stores of utils.dataProcessing are pointed at.
+"""
+
+import os
+
+import pytest
+
+from utils import dataProcessing
+from utils.syntheticData import generate_dataset
+
+# Firewall rows per day of the synthetic dataset, two days give two partitions
+ROWS_PER_DAY = 20000
+DAYS = 2
+
+
+def reset_stores():
+    """Drop the loaded stores and every cached query"""
+    dataProcessing.firewall_store = dataProcessing.intrusion_detection_store = None
+    dataProcessing.clear_ip_categories_cache()
+
+
+@pytest.fixture(scope='session')
+def synthetic_data(tmp_path_factory):
+    """Work in a folder holding a synthetic dataset, returns its root"""
+    root = tmp_path_factory.mktemp('hpdav')
+    generate_dataset(str(root / 'data' / 'firewall'), str(root / 'data' / 'intrusion-detection'), ROWS_PER_DAY, DAYS)
+    cwd = os.getcwd()
+    os.chdir(root)
+    reset_stores()
+    yield root
+    os.chdir(cwd)
+    reset_stores()
@@ -0,0 +1,68 @@
+import ipaddress
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.ipCategories import ip_to_uint32, uint32_to_ip
+from utils.dataProcessing import (
+    create_ip_categories,
+    compute_ip_categories,
+    categorize_ip_addresses,
+    get_firewall_data_by_datetime,
+    get_intrusion_detection_data_by_datetime,
+    get_firewall_data,
+    get_intrusion_detection_data,
+)
+
+# Addresses at the edges of every rule
+EDGE_IPS = [
+    '10.32.0.1', '10.32.0.2', '10.32.0.100', '172.23.0.1', '172.25.0.1', '10.99.99.2', '10.99.99.3',
+    '172.23.213.255', '172.23.214.0', '172.23.229.255', '172.23.230.0', '172.23.0.10', '172.23.0.2',
+    '10.32.0.200', '10.32.0.201', '10.32.0.210', '10.32.0.211', '10.32.1.200', '10.32.1.201', '10.32.1.206',
+    '10.32.1.207', '10.32.5.0', '10.32.5.1', '10.32.5.254', '10.32.5.255', '10.32.1.100', '10.32.1.101',
+    '172.22.255.255', '172.23.0.0', '172.23.255.255', '172.24.0.0', '0.0.0.0', '255.255.255.255',
+]
+
+
+def reference_categories(ips):
+    """The categorization before the interval tables: ipaddress objects compared rule by rule"""
+    result = {category: set() for category in create_ip_categories()}
+    result['Anomalies'] = set()
+    for ip in ips:
+        address = ipaddress.ip_address(ip)
+        found = False
+        for category, rules in create_ip_categories().items():
+            if (address in rules.get('ips', set()) or address in rules.get('single_ips', set())
+                    or any(address in network for network in rules.get('networks', []))
+                    or any(start <= address <= end for start, end in rules.get('ranges', []))):
+                result[category].add(ip)
+                found = True
+        if not found:
+            result['Anomalies'].add(ip)
+    return result
+
+
+def get_ips(*frames):
+    values = np.concatenate([df[column].to_numpy(np.uint32) for df in frames for column in ('SourceIP', 'DestinationIP')])
+    return set(uint32_to_ip(np.unique(values)))
+
+
+def test_edge_addresses():
+    ip_ints, valid = ip_to_uint32(np.array(EDGE_IPS, dtype=object))
+    assert valid.all()
+    df = pd.DataFrame({'SourceIP': ip_ints, 'DestinationIP': ip_ints})
+    assert compute_ip_categories(df, df.iloc[0:0]) == reference_categories(EDGE_IPS)
+
+
+def test_dataset_categories(synthetic_data):
+    df_fw, df_ids = get_firewall_data(), get_intrusion_detection_data()
+    assert categorize_ip_addresses(use_cache=False) == reference_categories(get_ips(df_fw, df_ids))
+
+
+@pytest.mark.parametrize('start, end', [('2012-04-05T03:00:00', '2012-04-05T04:30:00'),
+                                        ('2012-04-05T23:00:00', '2012-04-06T01:00:00')])
+def test_window_categories(synthetic_data, start, end):
+    df_fw = get_firewall_data_by_datetime(start, end)
+    df_ids = get_intrusion_detection_data_by_datetime(start, end)
+    assert categorize_ip_addresses(start, end) == reference_categories(get_ips(df_fw, df_ids))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dataProcessing import get_centrality, get_firewall_data_by_datetime, get_intrusion_detection_data_by_datetime
+
+nx = pytest.importorskip('networkx')
+
+WINDOW = ('2012-04-05T10:00:00', '2012-04-05T10:30:00')
+
+
+def test_centrality_matches_networkx(synthetic_data):
+    frames = [get_firewall_data_by_datetime(*WINDOW), get_intrusion_detection_data_by_datetime(*WINDOW)]
+    graph = nx.Graph()
+    for df in frames:
+        graph.add_edges_from(zip(df['SourceIP'].to_numpy(np.uint32).tolist(), df['DestinationIP'].to_numpy(np.uint32).tolist()))
+    graph.remove_edges_from(nx.selfloop_edges(graph))
+
+    result = get_centrality(*WINDOW, samples=10 ** 6)
+    assert result.attrs['exact']
+    assert len(result) == graph.number_of_nodes()
+    result = result.set_index(result['IP'].astype(np.int64))
+    nodes = sorted(graph.nodes)
+
+    assert result.loc[nodes, 'Degree'].tolist() == [graph.degree(node) for node in nodes]
+    expected = pd.DataFrame({
+        'Closeness': nx.closeness_centrality(graph),
+        'Betweenness': nx.betweenness_centrality(graph),
+    }).loc[nodes]
+    np.testing.assert_allclose(result.loc[nodes, 'Closeness'], expected['Closeness'], atol=1e-9)
+    np.testing.assert_allclose(result.loc[nodes, 'Betweenness'], expected['Betweenness'], atol=1e-9)
+
+    # The eigenvector is only determined on the largest component, compare its ranking there
+    largest = max(nx.connected_components(graph), key=len)
+    eigenvector = nx.eigenvector_centrality(graph.subgraph(largest), max_iter=1000, tol=1e-10)
+    members = sorted(largest)
+    np.testing.assert_allclose(result.loc[members, 'Eigenvector'] / np.linalg.norm(result.loc[members, 'Eigenvector']),
+                               [eigenvector[node] for node in members], atol=1e-3)
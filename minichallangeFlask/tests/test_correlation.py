@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.correlation import match_rows
+from utils.dataProcessing import get_correlated_data, get_firewall_data_by_datetime, get_intrusion_detection_data_by_datetime
+
+WINDOW = ('2012-04-05T06:00:00', '2012-04-05T07:30:00')
+
+
+def make_rows(times, unit):
+    times = pd.to_datetime(times).to_numpy().astype(f'datetime64[{unit}]')
+    return pd.DataFrame({'DateTime': times, 'SourceIP': np.uint32(1), 'DestinationIP': np.uint32(2)})
+
+
+@pytest.mark.parametrize('unit', ['s', 'ms', 'us', 'ns'])
+@pytest.mark.parametrize('offset, matches', [(-60, False), (-59, True), (0, True), (59, True), (60, False)])
+def test_tolerance_is_exclusive(unit, offset, matches):
+    firewall = make_rows(['2012-04-05 10:00:00'], 'us')
+    ids = make_rows([pd.Timestamp('2012-04-05 10:00:00') + pd.Timedelta(seconds=offset)], unit)
+    assert (match_rows(firewall, ids)[0] == 0) == matches
+
+
+def reference_match(df_firewall, df_ids):
+    """The matching of the frontend: first IDS row with the same addresses less than 60 seconds apart"""
+    ids = df_ids.reset_index(drop=True)
+    positions = []
+    for row in df_firewall.itertuples():
+        candidates = ids[(ids['SourceIP'] == row.SourceIP) & (ids['DestinationIP'] == row.DestinationIP)
+                         & ((ids['DateTime'] - row.DateTime).abs() < pd.Timedelta(seconds=60))]
+        positions.append(candidates.index[0] if len(candidates) else -1)
+    return np.array(positions, dtype=np.int64)
+
+
+def make_traffic(rng, n, unit):
+    """Rows over ten minutes between a few addresses, so many pairs are less than 60 seconds apart"""
+    seconds = np.sort(rng.integers(0, 600, n))
+    times = (pd.Timestamp('2012-04-05 10:00:00') + pd.to_timedelta(seconds, unit='s')).to_numpy()
+    return pd.DataFrame({
+        'DateTime': times.astype(f'datetime64[{unit}]'),
+        'SourceIP': rng.integers(1, 4, n).astype(np.uint32),
+        'DestinationIP': rng.integers(1, 4, n).astype(np.uint32),
+    })
+
+
+@pytest.mark.parametrize('unit', ['s', 'us'])
+def test_match_rows_matches_reference(unit):
+    rng = np.random.default_rng(0)
+    df_fw, df_ids = make_traffic(rng, 500, 'us'), make_traffic(rng, 100, unit)
+    expected = reference_match(df_fw, df_ids)
+    assert (expected >= 0).any() and (expected < 0).any()
+    assert match_rows(df_fw, df_ids).tolist() == expected.tolist()
+
+
+def test_correlated_data_matches_reference(synthetic_data):
+    df_fw = get_firewall_data_by_datetime(*WINDOW)
+    df_ids = get_intrusion_detection_data_by_datetime(*WINDOW)
+    merged = get_correlated_data(*WINDOW)
+    assert len(merged) == len(df_fw)
+    assert merged['IDSIndex'].tolist() == reference_match(df_fw, df_ids).tolist()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.heavyHitters import build_summary, get_window_counters, get_top_k, is_exact
+from utils.dataProcessing import get_top_values, get_firewall_store, get_intrusion_detection_store
+
+# Windows longer than HPDAV_TOPK_EXACT_MINUTES with partial minutes at both ends
+WINDOWS = [
+    ('2012-04-05T03:17:31', '2012-04-05T09:45:10'),
+    ('2012-04-05T22:59:59', '2012-04-06T01:00:00'),
+    ('2012-04-05T00:00:00', '2012-04-06T23:59:59'),
+]
+
+
+def make_frame(n=50000, values=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('2012-04-05') + pd.to_timedelta(np.sort(rng.integers(0, 24 * 3600, n)), unit='s')
+    return pd.DataFrame({'DateTime': times, 'Value': rng.zipf(1.3, n) % values})
+
+
+def test_whole_partition_is_exact():
+    df = make_frame()
+    summary = build_summary(df, 'Value', capacity=4)
+    counters, floor = get_window_counters(summary)
+    assert floor > 0
+
+    top = get_top_k(counters, floor, 5)
+    expected = df['Value'].value_counts()
+    assert (top['Error'] == 0).all()
+    assert top['Count'].tolist() == expected.loc[top['Value']].tolist()
+    assert top['Value'].tolist() == expected.index[:5].tolist()
+    assert is_exact(top, floor, 5)
+
+
+def test_partial_window_bounds():
+    df = make_frame()
+    summary = build_summary(df, 'Value', capacity=4)
+    start, end = pd.Timestamp('2012-04-05T03:17'), pd.Timestamp('2012-04-05T15:42')
+    counters, floor = get_window_counters(summary, start, end)
+    top = get_top_k(counters, floor, 20)
+
+    window = df[(df['DateTime'] >= start) & (df['DateTime'] < end + pd.Timedelta(minutes=1))]
+    expected = window['Value'].value_counts()
+    true = expected.reindex(top['Value'], fill_value=0).to_numpy()
+    assert (top['Count'] - top['Error'] <= true).all()
+    assert (true <= top['Count']).all()
+    assert expected.iloc[0] <= top['Count'].iloc[0]
+
+
+@pytest.mark.parametrize('source, attribute', [('firewall', 'SourceIP'), ('ids', 'Classification')])
+@pytest.mark.parametrize('start, end', WINDOWS + [(None, None)])
+def test_top_values_match_value_counts(synthetic_data, source, attribute, start, end):
+    store = get_firewall_store() if source == 'firewall' else get_intrusion_detection_store()
+    expected = store.slice(start, end)[attribute].astype(str).value_counts()
+
+    top = get_top_values(source, attribute, start, end, k=20)
+    true = expected.reindex(top[attribute].astype(str), fill_value=0).to_numpy()
+    assert (top['Count'] - top['Error'] <= true).all()
+    assert (true <= top['Count']).all()
+    assert expected.iloc[0] <= top['Count'].iloc[0]
+    if top.attrs['exact']:
+        assert (top['Error'] == 0).all()
+        assert top['Count'].tolist() == expected.iloc[:len(top)].tolist()
+
+
+def test_whole_partition_window_is_exact(synthetic_data):
+    # Far more source ports than counters, so the partition has a floor
+    start, end = '2012-04-05T00:00:00', '2012-04-06T00:00:00'
+    expected = get_firewall_store().slice(start, end)['SourcePort'].value_counts()
+    top = get_top_values('firewall', 'SourcePort', start, end, k=20)
+    assert (top['Error'] == 0).all()
+    assert top['Count'].tolist() == expected.loc[top['SourcePort']].tolist()
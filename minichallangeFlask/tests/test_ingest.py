@@ -0,0 +1,23 @@
+import pandas as pd
+
+from utils.ingest import update_partition_cache, get_partition_index, read_partition
+from utils.schema import firewall_schema
+from utils.syntheticData import generate_dataset
+
+
+def read_all(directory, manifest):
+    return pd.concat([read_partition(directory, 'firewall', partition) for partition in get_partition_index(manifest)],
+                     ignore_index=True)
+
+
+def test_worker_processes_match_serial_ingest(tmp_path):
+    directories = []
+    for name in ('serial', 'parallel'):
+        directory = str(tmp_path / name / 'firewall')
+        generate_dataset(directory, str(tmp_path / name / 'intrusion-detection'), rows=5000, days=3)
+        directories.append(directory)
+
+    serial = update_partition_cache(directories[0], 'firewall', firewall_schema, workers=1)
+    parallel = update_partition_cache(directories[1], 'firewall', firewall_schema, workers=2)
+    assert len(get_partition_index(parallel)) == 3
+    pd.testing.assert_frame_equal(read_all(directories[0], serial), read_all(directories[1], parallel))
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import main
+
+
+def wait_for_warm_up(timeout=60):
+    deadline = time.time() + timeout
+    while main.warm_up.warming_up and time.time() < deadline:
+        time.sleep(0.05)
+    assert main.warm_up.ready
+
+
+@pytest.fixture
+def client(synthetic_data):
+    return main.app.test_client()
+
+
+def test_first_request_starts_warm_up(client):
+    client.get('/health')
+    wait_for_warm_up()
+    assert client.get('/ready').status_code == 200
+    assert client.get('/ipCategories').status_code == 200
+
+
+def test_job_result_has_no_etag(client):
+    main.start_warm_up()
+    wait_for_warm_up()
+    submitted = client.post('/jobs', json={'query': 'idsDataByDateTime', 'params': {
+        'start_datetime': '2012-04-05T00:00:00', 'end_datetime': '2012-04-05T06:00:00'}})
+    assert submitted.status_code == 202
+    status_url = submitted.headers['Location']
+    while client.get(status_url).get_json()['state'] not in ('done', 'failed', 'cancelled'):
+        time.sleep(0.01)
+
+    result = client.get(f'{status_url}/result?limit=10', headers={'Accept-Encoding': 'gzip'})
+    assert result.status_code == 200
+    assert 'ETag' not in result.headers
+    assert 'Content-Encoding' not in result.headers
+
+
+def test_layout_responses_have_no_etag(client):
+    main.start_warm_up()
+    wait_for_warm_up()
+    window = 'start_datetime=2012-04-05T00:00:00&end_datetime=2012-04-05T06:00:00'
+    assert 'ETag' in client.get(f'/graph?{window}').headers
+    response = client.get(f'/graph?{window}&layout=true')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
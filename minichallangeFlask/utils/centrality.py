@@ -0,0 +1,204 @@
+"""
+Centrality metrics of the communication graph.
+
+The graph of a window has one node per IP address and one undirected edge per
+pair of addresses that communicated. It is held as a sparse adjacency matrix
+and every metric is computed with matrix products over all nodes at once:
+
+- Degree: number of distinct neighbours.
+- Eigenvector: power iteration on the adjacency matrix.
+- Closeness and betweenness: breadth first searches from a batch of source
+  nodes at a time (Brandes' algorithm, level by level). Small graphs use every
+  node as a source and the values are exact. Larger graphs use a fixed random
+  sample of sources and the values are estimates.
+
+The definitions and normalizations follow networkx (closeness with the
+Wasserman and Faust correction for disconnected graphs, normalized
+betweenness).
+"""
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:
+    sparse = csgraph = None
+
+# Graphs with at most this many nodes get exact closeness and betweenness
+EXACT_NODE_LIMIT = 1000
+
+# Sources of the breadth first searches on larger graphs
+DEFAULT_SAMPLES = 256
+
+# Source nodes searched at once, one column of the dense frontier matrices each
+BATCH_SIZE = 64
+
+EIGENVECTOR_MAX_ITER = 100
+EIGENVECTOR_TOLERANCE = 1e-6
+
+
+def build_graph(sources, destinations):
+    """
+    Build the undirected adjacency matrix of a list of edges.
+
+    Parameters:
+    sources (np.ndarray): Source node ids (e.g. uint32 IPs) per edge.
+    destinations (np.ndarray): Destination node ids per edge.
+
+    Returns:
+    tuple: (np.ndarray of sorted node ids, scipy CSR matrix with 1 between neighbours)
+    """
+    if sparse is None:
+        raise ImportError("scipy is required for the centrality metrics (pip install scipy)")
+
+    sources, destinations = np.asarray(sources), np.asarray(destinations)
+    nodes, codes = np.unique(np.concatenate([sources, destinations]), return_inverse=True)
+    row, col = codes[:len(sources)], codes[len(sources):]
+    keep = row != col  # Self loops don't count as neighbours
+    row, col = row[keep], col[keep]
+
+    n = len(nodes)
+    adjacency = sparse.coo_matrix((np.ones(2 * len(row)), (np.concatenate([row, col]), np.concatenate([col, row]))),
+                                  shape=(n, n)).tocsr()
+    adjacency.data[:] = 1.0  # Duplicate edges were summed
+    return nodes, adjacency
+
+
+def get_eigenvector_centrality(adjacency):
+    """
+    Eigenvector centrality by power iteration on A + I, normalized to unit length.
+
+    Parameters:
+    adjacency (scipy.sparse matrix): Symmetric adjacency matrix.
+
+    Returns:
+    np.ndarray: Centrality per node
+    """
+    n = adjacency.shape[0]
+    x = np.full(n, 1.0 / n)
+    for _ in range(EIGENVECTOR_MAX_ITER):
+        previous = x
+        x = adjacency @ x + x
+        norm = np.linalg.norm(x)
+        if norm == 0:
+            return np.zeros(n)
+        x = x / norm
+        if np.abs(x - previous).sum() < n * EIGENVECTOR_TOLERANCE:
+            break
+    return x
+
+
+def search_batch(adjacency, batch):
+    """
+    Breadth first searches with shortest path dependencies from a batch of sources.
+
+    Parameters:
+    adjacency (scipy.sparse matrix): Symmetric adjacency matrix.
+    batch (np.ndarray): Source node indices.
+
+    Returns:
+    tuple: (distances (n x len(batch), -1 where unreachable), dependencies (n x len(batch)))
+    """
+    n, columns = adjacency.shape[0], np.arange(len(batch))
+    distances = np.full((n, len(batch)), -1, dtype=np.int32)
+    paths = np.zeros((n, len(batch)))
+    distances[batch, columns] = 0
+    paths[batch, columns] = 1
+
+    # Forward: count the shortest paths level by level
+    frontier = paths.copy()
+    level = 0
+    while frontier.any():
+        reached = adjacency @ frontier
+        new = (distances < 0) & (reached > 0)
+        level += 1
+        distances[new] = level
+        paths[new] = reached[new]
+        frontier = np.where(new, paths, 0)
+
+    # Backward: accumulate the dependencies from the deepest level up
+    dependencies = np.zeros_like(paths)
+    for depth in range(level - 1, 0, -1):
+        below = np.where(distances == depth + 1, (1 + dependencies) / np.where(paths > 0, paths, 1), 0)
+        dependencies += np.where(distances == depth, paths * (adjacency @ below), 0)
+    return distances, dependencies
+
+
+def get_centralities(sources, destinations, samples=DEFAULT_SAMPLES, seed=0):
+    """
+    Compute the centrality metrics of a communication graph.
+
+    Parameters:
+    sources (np.ndarray): Source node ids per edge.
+    destinations (np.ndarray): Destination node ids per edge.
+    samples (int): Number of search sources on graphs larger than EXACT_NODE_LIMIT.
+    seed (int): Seed of the source sample, fixed so repeated queries agree.
+
+    Returns:
+    dict: 'Node' (node ids), 'Degree', 'Eigenvector', 'Closeness', 'Betweenness'
+    arrays and 'Exact' (False when closeness and betweenness are estimates)
+    """
+    nodes, adjacency = build_graph(sources, destinations)
+    n = len(nodes)
+    degree = np.diff(adjacency.indptr).astype(np.int64)
+    if n == 0:
+        empty = np.zeros(0)
+        return {'Node': nodes, 'Degree': degree, 'Eigenvector': empty, 'Closeness': empty,
+                'Betweenness': empty, 'Exact': True}
+
+    _, components = csgraph.connected_components(adjacency, directed=False)
+    component_sizes = np.bincount(components)
+
+    exact = n <= EXACT_NODE_LIMIT or samples >= n
+    if exact:
+        pivots = np.arange(n)
+    else:
+        pivots = np.sort(np.random.default_rng(seed).choice(n, size=samples, replace=False))
+        # Every component needs a pivot for the closeness estimate of its nodes
+        first_nodes = np.unique(components, return_index=True)[1]
+        uncovered = ~np.isin(np.arange(len(component_sizes)), components[pivots])
+        pivots = np.union1d(pivots, first_nodes[uncovered & (component_sizes > 1)])
+
+    betweenness = np.zeros(n)
+    distance_sums = np.zeros(n)
+    pivot_counts = np.zeros(n)
+    own_sums = np.zeros(n)
+    is_pivot = np.zeros(n, dtype=bool)
+    is_pivot[pivots] = True
+    for start in range(0, len(pivots), BATCH_SIZE):
+        batch = pivots[start:start + BATCH_SIZE]
+        distances, dependencies = search_batch(adjacency, batch)
+        dependencies[batch, np.arange(len(batch))] = 0
+        betweenness += dependencies.sum(axis=1)
+
+        reachable = distances > 0
+        distance_sums += np.where(reachable, distances, 0).sum(axis=1)
+        pivot_counts += reachable.sum(axis=1)
+        own_sums[batch] = np.where(reachable, distances, 0).sum(axis=0)
+
+    # Closeness: (r - 1) / (n - 1) / mean distance, r being the size of the component
+    reach = component_sizes[components] - 1
+    if exact:
+        mean_distance = np.where(reach > 0, distance_sums / np.maximum(reach, 1), 0)
+    else:
+        # A pivot knows its own distance sum, other nodes estimate the mean from the pivots
+        mean_distance = np.where(is_pivot, own_sums / np.maximum(reach, 1),
+                                 distance_sums / np.maximum(pivot_counts, 1))
+    closeness = np.where((reach > 0) & (mean_distance > 0),
+                         reach / max(n - 1, 1) / np.where(mean_distance > 0, mean_distance, 1), 0.0)
+
+    # Betweenness normalized like networkx, scaled up from the sampled sources
+    if n > 2:
+        betweenness *= (n / len(pivots)) / ((n - 1) * (n - 2))
+    else:
+        betweenness[:] = 0
+
+    return {
+        'Node': nodes,
+        'Degree': degree,
+        'Eigenvector': get_eigenvector_centrality(adjacency),
+        'Closeness': closeness,
+        'Betweenness': betweenness,
+        'Exact': exact,
+    }
@@ -0,0 +1,142 @@
+"""
+Aggregation of rows into deduplicated connections (graph edges).
+
+Rows are grouped by their uint32 source and destination addresses, optionally
+masked to a subnet prefix, so a flow graph receives one row per edge instead
+of one row per log line. Every slice of a window is aggregated on its own and
+the partial results are merged, the slices are never concatenated.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.rollups import get_most_common
+
+
+def get_prefix(value, name):
+    """
+    Read a subnet prefix length.
+
+    Parameters:
+    value (str or int or None): Prefix length, 32 (single addresses) when None.
+    name (str): Parameter name for the error message.
+
+    Returns:
+    int: Prefix length between 0 and 32
+    """
+    if value is None or value == '':
+        return 32
+    try:
+        prefix = int(value)
+    except (TypeError, ValueError):
+        prefix = -1
+    if not 0 <= prefix <= 32:
+        raise ValueError(f"{name} must be a prefix length between 0 and 32")
+    return prefix
+
+
+def mask_ips(ips, prefix):
+    """
+    Replace IPv4 addresses by the base address of their subnet.
+
+    Parameters:
+    ips (array-like): IPv4 addresses as uint32.
+    prefix (int): Prefix length, 24 maps 172.23.1.5 to 172.23.1.0.
+
+    Returns:
+    np.ndarray: Masked addresses as uint32
+    """
+    mask = np.uint32((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF)
+    return np.asarray(ips, dtype=np.uint32) & mask
+
+
+def aggregate_connections(df, source_prefix=32, destination_prefix=32, key_columns=(),
+                          sum_columns=(), mean_columns=(), breakdown_columns=()):
+    """
+    Aggregate the rows of one slice into connections.
+
+    Parameters:
+    df (pd.DataFrame): Rows with DateTime and uint32 SourceIP and DestinationIP columns.
+    source_prefix (int): Subnet prefix the source addresses are grouped by.
+    destination_prefix (int): Subnet prefix the destination addresses are grouped by.
+    key_columns (iterable): Further columns identifying a connection, e.g. DestinationPort.
+    sum_columns (iterable): Numeric columns summed per connection.
+    mean_columns (iterable): Numeric columns averaged, stored as '<column>Sum' and '<column>Count'.
+    breakdown_columns (iterable): Categorical columns counted per value as '<column>_<value>'.
+
+    Returns:
+    pd.DataFrame: Partial aggregate, one row per connection, indexed by the key columns
+    """
+    keys = [pd.Series(mask_ips(df['SourceIP'], source_prefix), index=df.index, name='SourceIP'),
+            pd.Series(mask_ips(df['DestinationIP'], destination_prefix), index=df.index, name='DestinationIP')]
+    keys += [df[column] for column in key_columns]
+    grouped = df.groupby(keys, sort=False, observed=True, dropna=False)
+
+    connections = pd.DataFrame({
+        'Count': grouped.size(),
+        'FirstSeen': grouped['DateTime'].min(),
+        'LastSeen': grouped['DateTime'].max(),
+    })
+    for column in sum_columns:
+        connections[column] = grouped[column].sum().astype(np.int64)
+    for column in mean_columns:
+        connections[f'{column}Sum'] = grouped[column].sum().astype(np.float64)
+        connections[f'{column}Count'] = grouped[column].count()
+    for column in breakdown_columns:
+        counts = df.groupby(keys + [df[column]], sort=False, observed=True, dropna=False).size()
+        counts = counts.unstack(fill_value=0)
+        counts.columns = [f'{column}_{value}' for value in counts.columns]
+        connections = connections.join(counts)
+
+    return connections
+
+
+def merge_connections(parts):
+    """
+    Merge the partial aggregates of several slices.
+
+    Parameters:
+    parts (list): Results of aggregate_connections with the same key columns.
+
+    Returns:
+    pd.DataFrame: One row per connection
+    """
+    parts = [part for part in parts if not part.empty]
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return pd.DataFrame()
+
+    merged = pd.concat(parts)
+    counters = [column for column in merged.columns if column not in ('FirstSeen', 'LastSeen')]
+    merged[counters] = merged[counters].fillna(0)
+    aggregations = {column: 'sum' for column in counters}
+    aggregations.update({'FirstSeen': 'min', 'LastSeen': 'max'})
+    return merged.groupby(level=list(range(merged.index.nlevels)), sort=False, dropna=False).agg(aggregations)
+
+
+def finish_connections(connections, mean_columns=(), breakdown_columns=()):
+    """
+    Turn merged partial aggregates into the final connection rows.
+
+    Parameters:
+    connections (pd.DataFrame): Result of merge_connections.
+    mean_columns (iterable): Columns passed as mean_columns before, averaged here.
+    breakdown_columns (iterable): Columns passed as breakdown_columns before,
+    replaced by their most common value.
+
+    Returns:
+    pd.DataFrame: One row per connection, most frequent first
+    """
+    if connections.empty:
+        return connections
+    for column in mean_columns:
+        count = connections.pop(f'{column}Count')
+        connections[column] = connections.pop(f'{column}Sum') / count.where(count > 0)
+    for column in breakdown_columns:
+        most_common = get_most_common(connections, column)
+        connections = connections.drop(columns=[name for name in connections.columns
+                                                if name.startswith(f'{column}_')])
+        connections[column] = most_common
+    connections['Count'] = connections['Count'].astype(np.int64)
+    return connections.sort_values('Count', ascending=False, kind='stable').reset_index()
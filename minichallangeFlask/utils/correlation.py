@@ -0,0 +1,94 @@
+"""
+Correlation of firewall rows with IDS alerts.
+
+A firewall row matches the first IDS alert with the same SourceIP and
+DestinationIP less than a tolerance (60 seconds) apart. Both frames are
+sorted by DateTime, so the match is found with a keyed merge_asof in
+O((n + m) log m) instead of comparing every pair of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Firewall and IDS rows further apart than this do not match
+MATCH_TOLERANCE = pd.Timedelta(seconds=60)
+
+# Both sides are compared at this resolution, one tick of it makes the tolerance exclusive
+TIME_UNIT = 'datetime64[ns]'
+TIME_RESOLUTION = pd.Timedelta(nanoseconds=1)
+
+
+def match_rows(df_firewall, df_ids, tolerance=MATCH_TOLERANCE):
+    """
+    Find the IDS alert matching every firewall row.
+
+    Of all IDS rows with the same SourceIP and DestinationIP strictly less
+    than tolerance apart, the earliest one matches (the first one in time
+    order, like the matching the frontend did before).
+
+    Parameters:
+    df_firewall (pd.DataFrame): Firewall rows sorted by DateTime.
+    df_ids (pd.DataFrame): IDS rows sorted by DateTime.
+    tolerance (pd.Timedelta): Exclusive maximum time difference.
+
+    Returns:
+    np.ndarray: Position of the matching IDS row for every firewall row, -1 where there is none
+    """
+    if df_firewall.empty or df_ids.empty:
+        return np.full(len(df_firewall), -1, dtype=np.int64)
+
+    # The frames may come at different resolutions (e.g. datetime64[s] from Parquet), casting
+    # the shifted firewall times to a coarser one would truncate them and widen the window
+    firewall_times = df_firewall['DateTime'].to_numpy().astype(TIME_UNIT)
+    ids_times = df_ids['DateTime'].to_numpy().astype(TIME_UNIT)
+
+    keys = ['SourceIP', 'DestinationIP']
+    left = pd.DataFrame({
+        # Earliest IDS time that is still strictly within the tolerance
+        'MatchStart': firewall_times - (tolerance - TIME_RESOLUTION).to_timedelta64(),
+        'SourceIP': df_firewall['SourceIP'].to_numpy(),
+        'DestinationIP': df_firewall['DestinationIP'].to_numpy(),
+    })
+    right = pd.DataFrame({
+        'MatchTime': ids_times,
+        'SourceIP': df_ids['SourceIP'].to_numpy(),
+        'DestinationIP': df_ids['DestinationIP'].to_numpy(),
+        'Position': np.arange(len(df_ids), dtype=np.int64),
+    })
+
+    matched = pd.merge_asof(left, right, left_on='MatchStart', right_on='MatchTime', by=keys,
+                            direction='forward', allow_exact_matches=True)
+
+    positions = matched['Position'].to_numpy(dtype=np.float64, na_value=np.nan)
+    within = matched['MatchTime'].to_numpy() < firewall_times + tolerance.to_timedelta64()
+    return np.where(~np.isnan(positions) & within, np.nan_to_num(positions, nan=-1), -1).astype(np.int64)
+
+
+def join_matches(df_firewall, df_ids, positions, columns, override_columns=()):
+    """
+    Join the columns of the matching IDS rows to the firewall rows.
+
+    Parameters:
+    df_firewall (pd.DataFrame): Firewall rows.
+    df_ids (pd.DataFrame): IDS rows.
+    positions (np.ndarray): Result of match_rows.
+    columns (dict): IDS column -> name in the result, missing where there is no match.
+    override_columns (iterable): Columns of both frames taken from the IDS row
+    where there is a match and from the firewall row otherwise.
+
+    Returns:
+    pd.DataFrame: The firewall rows with the IDS columns added
+    """
+    ids = df_ids.reset_index(drop=True)
+    matched = positions >= 0
+    joined = {}
+    for column, name in columns.items():
+        values = ids[column]
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iu':
+            # Nullable integers, so rows without a match don't turn the column into floats
+            values = values.astype(f"{'UInt' if values.dtype.kind == 'u' else 'Int'}{values.dtype.itemsize * 8}")
+        joined[name] = values.reindex(positions).set_axis(df_firewall.index)
+    for column in override_columns:
+        ids_values = ids[column].take(np.maximum(positions, 0)).set_axis(df_firewall.index)
+        joined[column] = ids_values.where(matched, df_firewall[column])
+    return df_firewall.assign(**joined)
@@ -1,90 +1,70 @@
 import os
-import glob
+import zlib
+import logging
 import pandas as pd
 import numpy as np
 import ipaddress 
 
-"""
-Heading Information for Firewall Data and Intrusion Detection Data
-
-Firewall Data:
-    | Field                | Description                  |
-    |----------------------|------------------------------|
-    | Date/time            | 06/Apr/2012 17:40:02         |
-    | Syslog priority      | Info (not only)              |
-    | Operation            | Built or Teardown            |
-    | Message code         | ASA-6-302015 (or others)     |
-    | Protocol             | TCP or UDP                   |
-    | Source IP            | IPV4 address                 |
-    | Destination IP       | IPV4 address                 |
-    | Source hostname      | (empty) maybe others         |
-    | Destination hostname | (empty) maybe others         |
-    | Source port          | some number                  |
-    | Destination port     | some number                  |
-    | Destination service  | http or other things         |
-    | Direction            | Inbound or Outbound          |
-    | Connections built    | 0 or 1                       |
-    | Connections torn down| 0 or 1                       |
-"""
-    
-# For consistency, the column names in the DataFrame should be:
-field_mapping_firewall = {
-        'Date/time': 'DateTime',
-        'Syslog priority': 'SyslogPriority',
-        'Operation': 'Operation',
-        'Message code': 'MessageCode',
-        'Protocol': 'Protocol',
-        'Source IP': 'SourceIP',
-        'Destination IP': 'DestinationIP',
-        'Source hostname': 'SourceHostname',
-        'Destination hostname': 'DestinationHostname',
-        'Source port': 'SourcePort',
-        'Destination port': 'DestinationPort',
-        'Destination service': 'DestinationService',
-        'Direction': 'Direction',
-        'Connections built': 'ConnectionsBuilt',
-        'Connections torn down': 'ConnectionsTornDown'
-    }
+from utils.schema import field_mapping_firewall, field_mapping_intrusion_detection, firewall_schema, intrusion_detection_schema
+from utils.partitions import PartitionedDataset
+from utils.ingest import concat_frames, normalize_column_types
+from utils.ipCategories import uint32_to_ip, compile_ip_categories, categorize_ips
+from utils.queryCache import QueryCache, normalize_window
+from utils.graphLevels import LEVELS, LEVEL_SHIFT, CATEGORY_SHIFT, get_primary_categories, build_level_index, get_level_graph, get_node_ids, parse_node_id
+from utils.layout import LayoutMemory, compute_layout
+from utils.centrality import get_centralities, DEFAULT_SAMPLES
+from utils.correlation import match_rows, join_matches
+from utils.connections import aggregate_connections, merge_connections, finish_connections
+from utils.histograms import count_values, merge_counts
+from utils.heavyHitters import build_summary, get_window_counters, counts_to_counters, get_top_k, is_exact
+from utils.metrics import timed
+from utils.httpCache import compressed_cache
+from utils.watcher import PollingWatcher, get_interval as get_watch_interval
+from utils.rollups import ROLLUP_FREQ, get_interval, build_rollup, merge_rollups, slice_rollup, resample_rollup, get_breakdown, get_most_common
 
+logger = logging.getLogger(__name__)
+
+# Global variables holding the partitioned datasets, created on first use
+firewall_store = None
+intrusion_detection_store = None
 
-"""
-Intrusion Detection Data:
-    | Field          | Description             |
-    |----------------|-------------------------|
-    | time           | 4/6/2012 17:23          |
-    | sourceIP       | IPV4 address            |
-    | sourcePort     | some number             |
-    | destIP         | IPV4 address            |
-    | destPort       | some number             |
-    | classification | Text with information   |
-    | priority       | number                  |
-    | label          |                         |
-    | packet info    |                         |
-    | packet info cont'd|                      |
-    | xref           |                         |
-"""
-field_mapping_intrusion_detection = {
-    'time': 'DateTime',
-    ' sourceIP': 'SourceIP',
-    ' sourcePort': 'SourcePort',
-    ' destIP': 'DestinationIP',
-    ' destPort': 'DestinationPort',
-    ' classification': 'Classification',
-    ' priority': 'Priority',
-    ' label': 'Label',
-    ' packet info': 'PacketInfo',
-    ' packet info cont\'d': 'PacketInfoContd',
-    ' xref': 'Xref'
-}
 
-# Global variables to cache the data
-firewall_data_cache = None
-intrusion_detection_data_cache = None
+def get_firewall_store(directory='./data/firewall/'):
+    """
+    Get the partitioned firewall dataset, see utils.partitions.
+    
+    Parameters:
+    directory (str): The directory containing the firewall CSV files.
+    
+    Returns:
+    PartitionedDataset: The firewall dataset
+    """
+    global firewall_store
+    if firewall_store is None or firewall_store.directory != directory:
+        firewall_store = PartitionedDataset('firewall', directory, firewall_schema, prepare=add_category_columns)
+    return firewall_store
 
+def get_intrusion_detection_store(directory='./data/intrusion-detection/'):
+    """
+    Get the partitioned intrusion detection dataset, see utils.partitions.
+    
+    Parameters:
+    directory (str): The directory containing the intrusion detection CSV files.
+    
+    Returns:
+    PartitionedDataset: The intrusion detection dataset
+    """
+    global intrusion_detection_store
+    if intrusion_detection_store is None or intrusion_detection_store.directory != directory:
+        intrusion_detection_store = PartitionedDataset('intrusion-detection', directory, intrusion_detection_schema,
+                                                       prepare=add_category_columns)
+    return intrusion_detection_store
 
 def get_firewall_data(directory='./data/firewall/'):
     """
     Function to get firewall data from CSV files in the specified directory.
+    The parsed data is kept in an on-disk partition cache, see utils.ingest.
+    Prefer get_firewall_data_by_datetime, which only loads the partitions it needs.
     
     Parameters:
     directory (str): The directory containing the firewall CSV files.
@@ -92,31 +72,13 @@ def get_firewall_data(directory='./data/firewall/'):
     Returns:
     pd.DataFrame: A DataFrame containing the concatenated data from all CSV files.
     """
-    global firewall_data_cache
-    if firewall_data_cache is not None:
-        return firewall_data_cache
-    
-    csv_files = glob.glob(os.path.join(directory, '*.csv'))
-    data_frames = []
-
-    for file in csv_files:
-        df = pd.read_csv(file, low_memory=False)
-        df.rename(columns=field_mapping_firewall, inplace=True)
-        
-        # Remove rows with "(empty)" IP addresses
-        df = df[(df['SourceIP'] != '(empty)') & (df['DestinationIP'] != '(empty)') & (df['Direction'] != '(empty)')]
-        data_frames.append(df)
-
-    if data_frames:
-        firewall_data_cache = pd.concat(data_frames, ignore_index=True)
-    else:
-        firewall_data_cache = pd.DataFrame()
-        
-    return firewall_data_cache
+    return get_firewall_store(directory).get_frame()
     
 def get_intrusion_detection_data(directory='./data/intrusion-detection/'):
     """
     Function to get intrusion detection data from CSV files in the specified directory.
+    The parsed data is kept in an on-disk partition cache, see utils.ingest.
+    Prefer get_intrusion_detection_data_by_datetime, which only loads the partitions it needs.
     
     Parameters:
     directory (str): The directory containing the intrusion detection CSV files.
@@ -124,25 +86,7 @@ def get_intrusion_detection_data(directory='./data/intrusion-detection/'):
     Returns:
     pd.DataFrame: A DataFrame containing the concatenated data from all CSV files.
     """
-    global intrusion_detection_data_cache
-    if intrusion_detection_data_cache is not None:
-        return intrusion_detection_data_cache
-
-    csv_files = glob.glob(os.path.join(directory, '*.csv'))
-    data_frames = []
-
-    for file in csv_files:
-        df = pd.read_csv(file, low_memory=False)
-        df.rename(columns=field_mapping_intrusion_detection, inplace=True)
-        df = df[(df['SourceIP'] != '(empty)') & (df['DestinationIP'] != '(empty)')]
-        data_frames.append(df)
-
-    if data_frames:
-        intrusion_detection_data_cache = pd.concat(data_frames, ignore_index=True)
-    else:
-        intrusion_detection_data_cache = pd.DataFrame()
-        
-    return intrusion_detection_data_cache
+    return get_intrusion_detection_store(directory).get_frame()
 
 
 def get_first_10_rows_firewall():
@@ -155,8 +99,7 @@ def get_first_10_rows_firewall():
     Returns:
     pd.DataFrame: A DataFrame containing the first 10 rows from the concatenated data of all CSV files.
     """
-    df = get_firewall_data()
-    return df.head(10)
+    return to_public_frame(get_firewall_store().head(10))
 
 def get_first_10_rows_intrusion_detection():
     """
@@ -168,8 +111,7 @@ def get_first_10_rows_intrusion_detection():
     Returns:
     pd.DataFrame: A DataFrame containing the first 10 rows from the concatenated data of all CSV files.
     """
-    df = get_intrusion_detection_data()
-    return df.head(10)
+    return to_public_frame(get_intrusion_detection_store().head(10))
 
 def get_firewall_data_by_datetime(start_datetime, end_datetime):
     """
@@ -182,14 +124,7 @@ def get_firewall_data_by_datetime(start_datetime, end_datetime):
     Returns:
     pd.DataFrame: Filtered firewall data.
     """
-    df = get_firewall_data()
-    
-    # Convert to datetime because the data is a string in the CSV
-    if df['DateTime'].dtype != 'datetime64[ns]':
-        df['DateTime'] = pd.to_datetime(df['DateTime'], errors='coerce')
-    
-    mask = (df['DateTime'] >= pd.to_datetime(start_datetime)) & (df['DateTime'] <= pd.to_datetime(end_datetime))
-    return df.loc[mask]
+    return get_firewall_store().slice(start_datetime, end_datetime)
 
 def get_intrusion_detection_data_by_datetime(start_datetime, end_datetime):
     """
@@ -202,51 +137,93 @@ def get_intrusion_detection_data_by_datetime(start_datetime, end_datetime):
     Returns:
     pd.DataFrame: Filtered intrusion detection data.
     """
-    df = get_intrusion_detection_data()
+    return get_intrusion_detection_store().slice(start_datetime, end_datetime)
+
+
+def get_firewall_data_slices_by_datetime(start_datetime, end_datetime):
+    """
+    Retrieve firewall data within a specific datetime range without concatenating partitions.
+    
+    Parameters:
+    start_datetime (str or pd.Timestamp): Start datetime in 'YYYY-MM-DD HH:MM:SS' format.
+    end_datetime (str or pd.Timestamp): End datetime in 'YYYY-MM-DD HH:MM:SS' format.
+    
+    Returns:
+    list: Filtered firewall data, one DataFrame per partition in time order.
+    """
+    return list(get_firewall_store().iter_slices(start_datetime, end_datetime))
+
+def get_intrusion_detection_data_slices_by_datetime(start_datetime, end_datetime):
+    """
+    Retrieve intrusion detection data within a specific datetime range without concatenating partitions.
+    
+    Parameters:
+    start_datetime (str or pd.Timestamp): Start datetime in 'YYYY-MM-DD HH:MM:SS' format.
+    end_datetime (str or pd.Timestamp): End datetime in 'YYYY-MM-DD HH:MM:SS' format.
     
-    # Convert to datetime because the data is a string in the CSV
-    if df['DateTime'].dtype != 'datetime64[ns]':
-        df['DateTime'] = pd.to_datetime(df['DateTime'], errors='coerce')
+    Returns:
+    list: Filtered intrusion detection data, one DataFrame per partition in time order.
+    """
+    return list(get_intrusion_detection_store().iter_slices(start_datetime, end_datetime))
 
-    mask = (df['DateTime'] >= pd.to_datetime(start_datetime)) & (df['DateTime'] <= pd.to_datetime(end_datetime))
-    return df.loc[mask]
 
+def get_firewall_rollup(df):
+    """Build the per-minute cube of a firewall partition, see utils.rollups"""
+    return build_rollup(df, sum_columns=['ConnectionsBuilt', 'ConnectionsTornDown'],
+                        breakdown_columns=['Protocol', 'Direction'])
 
-def get_aggregated_data_by_time(start_datetime, end_datetime, interval="1min"):
+def get_intrusion_detection_rollup(df):
+    """Build the per-minute cube of an intrusion detection partition, see utils.rollups"""
+    return build_rollup(df, mean_columns=['Priority'])
+
+def get_aggregated_data_by_time(start_datetime=None, end_datetime=None, interval="1min"):
     """
     Aggregate firewall and IDS data by time intervals.
 
+    The counts are read from per-minute rollup cubes built once per partition,
+    so the window is applied at minute resolution (rounded out to whole minutes).
+
     Parameters:
-    - start_datetime: Start datetime
-    - end_datetime: End datetime
-    - interval: Resampling interval (e.g., '1min', '5min')
+    - start_datetime (optional): Start datetime
+    - end_datetime (optional): End datetime
+    - interval: Resampling interval, a whole number of minutes (e.g., '1min', '5min', '1h')
 
     Returns:
-    - pd.DataFrame: Aggregated data
+    - pd.DataFrame: One row per interval with the connection and alert counts,
+      built/torn down sums, most common protocol, mean IDS priority and one
+      'Protocol_<value>' and 'Direction_<value>' count column per value
     """
-    df_firewall = get_firewall_data_by_datetime(start_datetime, end_datetime)
-    df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+    interval = get_interval(interval)
+    firewall = merge_rollups(get_firewall_store().get_summaries(
+        'rollup', get_firewall_rollup, start_datetime, end_datetime))
+    ids = merge_rollups(get_intrusion_detection_store().get_summaries(
+        'rollup', get_intrusion_detection_rollup, start_datetime, end_datetime))
 
-    # Combine datasets
-    combined_df = pd.concat([df_firewall, df_ids], ignore_index=True)
+    firewall = slice_rollup(firewall, start_datetime, end_datetime).add_prefix('Firewall')
+    ids = slice_rollup(ids, start_datetime, end_datetime).add_prefix('IDS')
+    cube = resample_rollup(firewall.join(ids, how='outer').fillna(0), interval)
 
-    # Convert DateTime to pandas datetime
-    combined_df['DateTime'] = pd.to_datetime(combined_df['DateTime'], errors='coerce')
-    combined_df = combined_df.dropna(subset=['DateTime'])
+    firewall_count = cube.get('FirewallCount', pd.Series(0, index=cube.index))
+    ids_count = cube.get('IDSCount', pd.Series(0, index=cube.index))
+    priority_sum = cube.get('IDSPrioritySum', pd.Series(0.0, index=cube.index))
+    priority_count = cube.get('IDSPriorityCount', pd.Series(0, index=cube.index))
+    protocols = get_breakdown(cube, 'FirewallProtocol')
+    directions = get_breakdown(cube, 'FirewallDirection')
 
-    # Resample data based on the time interval
-    combined_df.set_index('DateTime', inplace=True)
-    aggregated_data = combined_df.resample(interval).agg({
-        'SourceIP': 'count',  # Total number of connections
-        'DestinationIP': 'count',
-        'Protocol': lambda x: x.mode()[0] if not x.empty else None,  # Most common protocol
-        'Priority': 'mean'  # Average priority (if applicable)
-    })
-
-    aggregated_data.rename(columns={'SourceIP': 'TotalConnections'}, inplace=True)
-    aggregated_data = aggregated_data.reset_index()
+    aggregated_data = pd.DataFrame({
+        'TotalConnections': (firewall_count + ids_count).astype(np.int64),
+        'FirewallConnections': firewall_count.astype(np.int64),
+        'IDSAlerts': ids_count.astype(np.int64),
+        'ConnectionsBuilt': cube.get('FirewallConnectionsBuilt', pd.Series(0, index=cube.index)).astype(np.int64),
+        'ConnectionsTornDown': cube.get('FirewallConnectionsTornDown', pd.Series(0, index=cube.index)).astype(np.int64),
+        'Protocol': get_most_common(cube, 'FirewallProtocol'),  # Most common protocol
+        'Priority': priority_sum / priority_count.where(priority_count > 0),  # Average IDS priority
+    }, index=cube.index)
+    aggregated_data = aggregated_data.join(protocols.add_prefix('Protocol_').astype(np.int64))
+    aggregated_data = aggregated_data.join(directions.add_prefix('Direction_').astype(np.int64))
 
-    return aggregated_data
+    aggregated_data.index.name = 'DateTime'
+    return aggregated_data.reset_index()
 
 def create_ip_categories():
     """Define IP address categories using network objects"""
@@ -287,33 +264,357 @@ def create_ip_categories():
     }
     return categories
 
+compiled_ip_categories = None
+
+def get_compiled_ip_categories():
+    """Get the categories of create_ip_categories compiled into interval tables"""
+    global compiled_ip_categories
+    if compiled_ip_categories is None:
+        compiled_ip_categories = compile_ip_categories(create_ip_categories())
+    return compiled_ip_categories
+
+
+def get_category_bits(category_names=None):
+    """
+    Get the bitmask of one or more categories in the category columns
+    
+    Every category of create_ip_categories gets one bit in the order it is
+    defined, followed by 'Anomalies' for IPs that match no category.
+    
+    Parameters:
+    category_names (str or list, optional): Category name, list of names or comma
+    separated names. All categories when omitted.
+    
+    Returns:
+    int: Bitmask with the bits of the requested categories set
+    """
+    names = list(get_compiled_ip_categories()) + ['Anomalies']
+    if category_names is None:
+        category_names = names
+    elif isinstance(category_names, str):
+        category_names = [name.strip() for name in category_names.split(',')]
+
+    bits = 0
+    for category_name in category_names:
+        if category_name not in names:
+            raise ValueError(f"Invalid category: {category_name}")
+        bits |= 1 << names.index(category_name)
+    return bits
+
+def get_ip_category_bits(ips):
+    """
+    Compute the category bitmask of every IP
+    
+    Parameters:
+    ips (array-like): IPv4 addresses as uint32
+    
+    Returns:
+    np.ndarray: uint8 bitmask per IP, see get_category_bits
+    """
+    # Only categorize each distinct address once
+    codes, ip_ints = pd.factorize(np.asarray(ips, dtype=np.uint32))
+    masks = categorize_ips(ip_ints, get_compiled_ip_categories())
+
+    bits = np.zeros(len(ip_ints), dtype=np.uint8)
+    for bit, category_mask in enumerate(masks.values()):
+        bits |= (category_mask.astype(np.uint8) << bit)
+    bits[bits == 0] = get_category_bits('Anomalies')
+    return bits[codes]
+
+# IP columns are stored as uint32 and rendered as strings by to_public_frame
+ip_columns = ['SourceIP', 'DestinationIP', 'IP']
 
-def get_aggregated_data_by_ip_and_port(start_datetime, end_datetime):
+# Category bitmask columns added to the frames at load, not part of the API output
+category_columns = ['SourceCategories', 'DestinationCategories']
+
+def add_category_columns(df):
+    """
+    Add the category bitmasks of the source and destination IP to a frame
+    
+    Categories only depend on the IP, so they are computed once at load and a
+    category query becomes an integer mask instead of matching IP strings.
+    
+    Parameters:
+    df (pd.DataFrame): Firewall or intrusion detection data
+    
+    Returns:
+    pd.DataFrame: The frame with SourceCategories and DestinationCategories
+    """
+    if df.empty:
+        return df
+    with timed('categorize'):
+        df['SourceCategories'] = get_ip_category_bits(df['SourceIP'])
+        df['DestinationCategories'] = get_ip_category_bits(df['DestinationIP'])
+    return df
+
+def to_public_frame(df):
+    """
+    Prepare a frame to be returned by the API
+    
+    Drops the internal columns and renders the uint32 IP columns as dotted strings.
+    
+    Parameters:
+    df (pd.DataFrame): Firewall or intrusion detection data
+    
+    Returns:
+    pd.DataFrame: The frame as the frontend expects it
+    """
+    df = df.drop(columns=category_columns, errors='ignore')
+    rendered = {
+        column: uint32_to_ip(df[column].to_numpy())
+        for column in ip_columns
+        if column in df.columns and pd.api.types.is_integer_dtype(df[column].dtype)
+    }
+    return df.assign(**rendered) if rendered else df
+
+def get_memory_report():
+    """
+    Report the memory used by the loaded firewall and IDS partitions
+    
+    Returns:
+    dict: Per dataset the rows on disk and in memory, and dtype and bytes of every loaded column
+    """
+    return {
+        name: store.get_memory_report() if store is not None else None
+        for name, store in (('firewall', firewall_store), ('ids', intrusion_detection_store))
+    }
+
+# How the rows of each source are aggregated into connections, see utils.connections
+connection_aggregations = {
+    'firewall': {
+        'sum_columns': ['ConnectionsBuilt', 'ConnectionsTornDown'],
+        'breakdown_columns': ['Protocol'],
+    },
+    'ids': {
+        'mean_columns': ['Priority'],
+        'breakdown_columns': ['Classification'],
+    },
+}
+
+def get_connections(source, start_datetime=None, end_datetime=None, source_prefix=32,
+                    destination_prefix=32, by_port=False):
+    """
+    Aggregate firewall or IDS rows into deduplicated connections (graph edges)
+    
+    Parameters:
+    source (str): 'firewall' or 'ids'
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    source_prefix (int): Group source addresses by subnet, e.g. 24; 32 keeps single addresses
+    destination_prefix (int): Group destination addresses by subnet
+    by_port (bool): Whether the destination port is part of a connection
+    
+    Returns:
+    pd.DataFrame: One row per connection with SourceIP, DestinationIP (subnet base
+    addresses when grouped), Count, FirstSeen, LastSeen and, for the firewall,
+    built/torn down sums and the most common Protocol, for the IDS the mean
+    Priority and most common Classification. Most frequent connections first.
+    """
+    if source not in connection_aggregations:
+        raise ValueError("Source must be either 'firewall' or 'ids'")
+    aggregation = connection_aggregations[source]
+    key_columns = ['DestinationPort'] if by_port else []
+
+    def compute():
+        if source == 'firewall':
+            slices = get_firewall_data_slices_by_datetime(start_datetime, end_datetime)
+        else:
+            slices = get_intrusion_detection_data_slices_by_datetime(start_datetime, end_datetime)
+        parts = [aggregate_connections(df, source_prefix, destination_prefix, key_columns, **aggregation)
+                 for df in slices]
+        return finish_connections(merge_connections(parts),
+                                  aggregation.get('mean_columns', ()), aggregation.get('breakdown_columns', ()))
+
+    key = ('connections', source, source_prefix, destination_prefix, by_port) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
+
+# IDS columns added to the correlated firewall rows, Label is kept apart from the firewall columns
+correlation_columns = {
+    'DateTime': 'IDSDateTime',
+    'Classification': 'Classification',
+    'Priority': 'Priority',
+    'Label': 'Label',
+    'PacketInfo': 'PacketInfo',
+    'PacketInfoContd': 'PacketInfoContd',
+    'Xref': 'Xref',
+}
+
+def get_correlated_data(start_datetime, end_datetime, matched_only=False):
+    """
+    Correlate the firewall rows of a window with the IDS alerts, see utils.correlation
+    
+    A firewall row matches the first IDS alert with the same SourceIP and
+    DestinationIP less than 60 seconds apart.
+    
+    Parameters:
+    start_datetime (str): Start datetime
+    end_datetime (str): End datetime
+    matched_only (bool): Only return the firewall rows with a matching alert
+    
+    Returns:
+    pd.DataFrame: The firewall rows with the IDS columns of the match (missing
+    without a match) and the ports of the IDS alert where there is one, plus
+    FirewallIndex and IDSIndex, the positions of the rows within the window
+    (IDSIndex is -1 without a match)
     """
-    Aggregate data by Source IP, Destination IP, and Port.
+    def compute():
+        df_fw = get_firewall_data_by_datetime(start_datetime, end_datetime)
+        df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+        positions = match_rows(df_fw, df_ids)
+        merged = join_matches(df_fw, df_ids, positions, correlation_columns,
+                              override_columns=['SourcePort', 'DestinationPort'])
+        merged = merged.assign(FirewallIndex=np.arange(len(merged), dtype=np.int64), IDSIndex=positions)
+        return merged.reset_index(drop=True)
+
+    key = ('correlation',) + normalize_window(start_datetime, end_datetime)
+    merged = query_cache.get_or_compute(key, compute)
+    return merged[merged['IDSIndex'] >= 0] if matched_only else merged
+
+def get_centrality(start_datetime=None, end_datetime=None, source='all', samples=DEFAULT_SAMPLES):
+    """
+    Compute the centrality of every IP in the communication graph of a window, see utils.centrality
+    
+    Parameters:
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    source (str): Edges from 'firewall', 'ids' or 'all' (both)
+    samples (int): Search sources used for closeness and betweenness on large graphs
+    
+    Returns:
+    pd.DataFrame: One row per IP with Degree, Eigenvector, Closeness and Betweenness,
+    most connected first. df.attrs['exact'] is False when closeness and betweenness are estimates.
     """
-    df_firewall = get_firewall_data_by_datetime(start_datetime, end_datetime)
-    df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+    if source not in ('firewall', 'ids', 'all'):
+        raise ValueError("Source must be 'firewall', 'ids' or 'all'")
+    if samples <= 0:
+        raise ValueError("samples must be positive")
+
+    def compute():
+        sources = ['firewall', 'ids'] if source == 'all' else [source]
+        edges = [get_connections(name, start_datetime, end_datetime) for name in sources]
+        edges = [df for df in edges if not df.empty]
+        ips = [np.concatenate([df['SourceIP'].to_numpy(np.uint32) for df in edges]) if edges else np.zeros(0, np.uint32),
+               np.concatenate([df['DestinationIP'].to_numpy(np.uint32) for df in edges]) if edges else np.zeros(0, np.uint32)]
+        metrics = get_centralities(*ips, samples=samples)
+        df = pd.DataFrame({
+            'IP': metrics['Node'].astype(np.uint32),
+            'Degree': metrics['Degree'],
+            'Eigenvector': metrics['Eigenvector'],
+            'Closeness': metrics['Closeness'],
+            'Betweenness': metrics['Betweenness'],
+        }).sort_values(['Degree', 'IP'], ascending=[False, True], kind='stable').reset_index(drop=True)
+        df.attrs['exact'] = metrics['Exact']
+        return df
+
+    key = ('centrality', source, samples) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
 
-    # Combine datasets
-    combined_df = pd.concat([df_firewall, df_ids], ignore_index=True)
+def get_graph_index(source, start_datetime=None, end_datetime=None):
+    """
+    Get the level of detail tables of the connections of a window, see utils.graphLevels
+    
+    Parameters:
+    source (str): Connections from 'firewall', 'ids' or 'all' (both)
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    
+    Returns:
+    dict: Result of build_level_index
+    """
+    if source not in ('firewall', 'ids', 'all'):
+        raise ValueError("Source must be 'firewall', 'ids' or 'all'")
 
-    # Group by IPs and Ports
-    aggregated_data = combined_df.groupby(['SourceIP', 'DestinationIP', 'SourcePort', 'DestinationPort']).agg({
-        'DateTime': ['min', 'max'],  # First and last time of connections
-        'Protocol': 'first',
-        'ConnectionsBuilt': 'sum',
-        'ConnectionsTornDown': 'sum'
-    }).reset_index()
+    def compute():
+        sources = ['firewall', 'ids'] if source == 'all' else [source]
+        columns = ['SourceIP', 'DestinationIP', 'Count', 'FirstSeen', 'LastSeen']
+        frames = [df[columns] for df in (get_connections(name, start_datetime, end_datetime) for name in sources)
+                  if not df.empty]
+        if not frames:
+            connections = pd.DataFrame({'SourceIP': np.zeros(0, np.uint32), 'DestinationIP': np.zeros(0, np.uint32),
+                                        'Count': np.zeros(0, np.int64), 'FirstSeen': pd.to_datetime([]),
+                                        'LastSeen': pd.to_datetime([])})
+        else:
+            connections = pd.concat(frames).groupby(['SourceIP', 'DestinationIP'], sort=False).agg(
+                {'Count': 'sum', 'FirstSeen': 'min', 'LastSeen': 'max'}).reset_index()
+        return build_level_index(connections,
+                                 get_primary_categories(get_ip_category_bits(connections['SourceIP'])),
+                                 get_primary_categories(get_ip_category_bits(connections['DestinationIP'])))
 
-    # Rename columns
-    aggregated_data.columns = ['SourceIP', 'DestinationIP', 'SourcePort', 'DestinationPort',
-                               'StartTime', 'EndTime', 'Protocol', 'ConnectionsBuilt', 'ConnectionsTornDown']
+    key = ('graphIndex', source) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
 
-    return aggregated_data
+# Last layout position of every node, per source, see utils.layout
+layout_memories = {source: LayoutMemory() for source in ('firewall', 'ids', 'all')}
+
+def get_graph(source='all', start_datetime=None, end_datetime=None, level='category', expand=(), layout=False):
+    """
+    Get the communication graph of a window at a level of detail
+    
+    Categories contain /24 subnets, which contain IPs. The graph starts at the
+    given level and the nodes in expand are replaced by their members.
+    
+    Parameters:
+    source (str): Connections from 'firewall', 'ids' or 'all' (both)
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    level (str): 'category', 'subnet' or 'ip'
+    expand (list): Ids of category or subnet nodes to expand, e.g. 'Workstations'
+    or 'Workstations:172.23.1.0/24'
+    layout (bool): Add X and Y node coordinates between 0 and 1. Layouts start
+    from the positions the nodes had in the last layout (e.g. of the previous
+    window), see utils.layout, so they depend on the graphs laid out before.
+    They are cached per graph, repeated requests get the same coordinates
+    until the cache entry is evicted
+    
+    Returns:
+    tuple: (nodes, edges) DataFrames. Nodes have Id, Level, Category, Parent,
+    Members, Count, InternalCount, Expandable and with layout X and Y; edges
+    have Source, Target, Count, FirstSeen, LastSeen and Connections.
+    """
+    if level not in LEVELS:
+        raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+    category_names = list(get_compiled_ip_categories()) + ['Anomalies']
+    expanded = [parse_node_id(node_id, category_names) for node_id in expand]
+
+    nodes, edges = get_level_graph(
+        get_graph_index(source, start_datetime, end_datetime),
+        level,
+        expanded_categories=[value for kind, value in expanded if kind == 'category'],
+        expanded_subnets=[value for kind, value in expanded if kind == 'subnet'],
+    )
+
+    keys = nodes['Key'].to_numpy()
+    levels = keys >> LEVEL_SHIFT
+    nodes = pd.DataFrame({
+        'Id': get_node_ids(keys, category_names),
+        'Level': np.asarray(LEVELS, dtype=object)[levels],
+        'Category': np.asarray(category_names, dtype=object)[(keys >> CATEGORY_SHIFT) & 0xFF],
+        'Parent': get_node_ids(nodes['Parent'].to_numpy(), category_names),
+        'Members': nodes['Members'],
+        'Count': nodes['Count'],
+        'InternalCount': nodes['InternalCount'],
+        'Expandable': levels < 2,
+    })
+    edges = edges.assign(Source=get_node_ids(edges['Source'].to_numpy(), category_names),
+                         Target=get_node_ids(edges['Target'].to_numpy(), category_names))
+
+    if layout:
+        def compute():
+            ids = pd.Index(nodes['Id'])
+            return compute_layout(list(ids), ids.get_indexer(edges['Source']), ids.get_indexer(edges['Target']),
+                                  parents=list(nodes['Parent'].where(nodes['Parent'].notna(), None)),
+                                  memory=layout_memories[source])
+
+        key = ('graphLayout', source, level, tuple(sorted(expand))) + normalize_window(start_datetime, end_datetime)
+        positions = query_cache.get_or_compute(key, compute)
+        nodes = nodes.assign(X=positions[:, 0], Y=positions[:, 1])
+    return nodes, edges
 
 categorized_ips_cache = None
 
+# Results of windowed queries, the full dataset categories stay in categorized_ips_cache
+query_cache = QueryCache('queries', int(os.environ.get('HPDAV_QUERY_CACHE_MB', '256')) * 1024 * 1024)
+
 def categorize_ip_addresses(start_datetime=None, end_datetime=None, use_cache=True):
     """
     Categorize IP addresses with caching support
@@ -321,7 +622,7 @@ def categorize_ip_addresses(start_datetime=None, end_datetime=None, use_cache=Tr
     Parameters:
     start_datetime (str, optional): Start datetime
     end_datetime (str, optional): End datetime
-    use_cache (bool): Whether to use cached results for full dataset
+    use_cache (bool): Whether to use cached results (full dataset and windows)
     
     Returns:
     dict: Categories containing sets of IP addresses
@@ -334,65 +635,189 @@ def categorize_ip_addresses(start_datetime=None, end_datetime=None, use_cache=Tr
     
     # Get data based on whether dates are specified
     if start_datetime and end_datetime:
-        df_fw = get_firewall_data_by_datetime(start_datetime, end_datetime)
-        df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
-    else:
-        df_fw = get_firewall_data()
-        df_ids = get_intrusion_detection_data()
-    
-    # Combine unique IPs
-    all_ips = pd.concat([
-        pd.Series(pd.concat([df_fw['SourceIP'], df_fw['DestinationIP']]).unique()),
-        pd.Series(pd.concat([df_ids['SourceIP'], df_ids['DestinationIP']]).unique())
-    ]).unique()
-    
-    # Convert to IP objects once
-    ip_objects = np.array([ipaddress.ip_address(ip) for ip in all_ips])
-    categories = create_ip_categories()
+        def compute():
+            return compute_ip_categories(
+                get_firewall_data_by_datetime(start_datetime, end_datetime),
+                get_intrusion_detection_data_by_datetime(start_datetime, end_datetime))
+
+        if not use_cache:
+            return compute()
+        key = ('ipCategories',) + normalize_window(start_datetime, end_datetime)
+        return query_cache.get_or_compute(key, compute)
+
+    result = compute_ip_categories(get_firewall_data(), get_intrusion_detection_data())
+    categorized_ips_cache = result
+    return result
+
+def compute_ip_categories(df_fw, df_ids):
+    """
+    Categorize the IP addresses seen in a firewall and an IDS frame
     
-    result = {
-        category: set() for category in categories.keys()
-    }
-    result['Anomalies'] = set()
+    Parameters:
+    df_fw (pd.DataFrame): Firewall data
+    df_ids (pd.DataFrame): Intrusion detection data
     
-    # Create boolean masks for each category
-    for category, rules in categories.items():
-        category_mask = np.zeros(len(ip_objects), dtype=bool)
-        
-        if 'ips' in rules:
-            for ip in rules['ips']:
-                category_mask |= (ip_objects == ip)
-        
-        if 'networks' in rules:
-            for network in rules['networks']:
-                network_mask = np.array([ip in network for ip in ip_objects])
-                category_mask |= network_mask
-        
-        if 'ranges' in rules:
-            for start, end in rules['ranges']:
-                range_mask = (ip_objects >= start) & (ip_objects <= end)
-                category_mask |= range_mask
-                
-        if 'single_ips' in rules:
-            for ip in rules['single_ips']:
-                category_mask |= (ip_objects == ip)
+    Returns:
+    dict: Categories containing sets of IP addresses
+    """
+    with timed('categorize'):
+        # Combine unique IPs, they are stored as uint32 so no parsing is needed
+        ip_ints = pd.unique(np.concatenate([
+            df[column].to_numpy(dtype=np.uint32)
+            for df in (df_fw, df_ids) if not df.empty
+            for column in ('SourceIP', 'DestinationIP')
+        ] or [np.array([], dtype=np.uint32)]))
+        all_ips = uint32_to_ip(ip_ints)
         
-        result[category].update(set(all_ips[category_mask]))
-    
-    # Add remaining IPs to anomalies
-    categorized = set().union(*[ips for cat, ips in result.items() if cat != 'Anomalies'])
-    result['Anomalies'].update(set(all_ips) - categorized)
-    
-    # Cache results if no date filtering
-    if not start_datetime and not end_datetime:
-        categorized_ips_cache = result
+        # Match against the compiled interval tables
+        category_masks = categorize_ips(ip_ints, get_compiled_ip_categories())
+
+        result = {}
+        categorized = np.zeros(len(all_ips), dtype=bool)
+        for category, category_mask in category_masks.items():
+            result[category] = set(all_ips[category_mask])
+            categorized |= category_mask
+
+        # Add remaining IPs to anomalies
+        result['Anomalies'] = set(all_ips[~categorized])
     
     return result
 
 def clear_ip_categories_cache():
-    """Clear the IP categories cache"""
+    """Clear the IP categories cache and every cached windowed query depending on it"""
     global categorized_ips_cache
     categorized_ips_cache = None
+    query_cache.clear()
+
+# Bumped whenever rows are ingested while the server runs
+dataset_version = 0
+
+data_watcher = None
+
+# (partition lists, tag), see get_dataset_tag
+dataset_tag = (None, None)
+
+def window_overlaps(key, ranges):
+    """Whether the window at the end of a query cache key overlaps any (start, end) range"""
+    start, end = key[-2], key[-1]
+    if start is None or end is None:
+        return True
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return any(range_start <= end and range_end >= start for range_start, range_end in ranges)
+
+def refresh_datasets():
+    """
+    Ingest new and appended CSV files of the loaded datasets
+    
+    Only the partitions the new rows fall into are loaded again (with their
+    category columns and rollups), and only the cached queries whose window
+    overlaps them are dropped. Requests being served keep their data.
+    
+    Returns:
+    int: Number of changed partitions
+    """
+    global dataset_version, categorized_ips_cache
+    ranges, changed = [], 0
+    for store in (firewall_store, intrusion_detection_store):
+        if store is not None:
+            partitions = store.refresh()
+            ranges += [(partition['start'], partition['end']) for partition in partitions]
+            changed += len({partition['name'] for partition in partitions})
+    if not changed:
+        return 0
+
+    query_cache.invalidate(lambda key: window_overlaps(key, ranges))
+    categorized_ips_cache = None
+    dataset_version += 1
+    logger.info("Ingested new rows into %d partition(s), dataset version %d", changed, dataset_version)
+    return changed
+
+def start_data_watcher(interval=None):
+    """
+    Start polling the data directories for new and appended CSV files, see refresh_datasets
+    
+    Parameters:
+    interval (float, optional): Seconds between polls, defaults to HPDAV_WATCH_INTERVAL (0 disables it)
+    
+    Returns:
+    PollingWatcher: The running watcher, None when watching is disabled
+    """
+    global data_watcher
+    interval = get_watch_interval(interval)
+    if interval <= 0 or data_watcher is not None:
+        return data_watcher
+    directories = [store.directory for store in (get_firewall_store(), get_intrusion_detection_store())]
+    data_watcher = PollingWatcher(directories, refresh_datasets, interval)
+    data_watcher.start()
+    return data_watcher
+
+def get_dataset_tag():
+    """
+    Get a tag of the ingested data, for the ETags of the responses
+    
+    Unlike dataset_version it's derived from the partition versions on disk,
+    so every server process (see gunicorn.conf.py) has the same tag for the same data.
+    
+    Returns:
+    str: Hash of the partition versions of both datasets
+    """
+    global dataset_tag
+    stores = (get_firewall_store(), get_intrusion_detection_store())
+    # refresh swaps in new partition lists, so their identity tells whether the tag is current
+    partitions = tuple(store.partitions for store in stores)
+    if dataset_tag[0] is None or any(old is not new for old, new in zip(dataset_tag[0], partitions)):
+        versions = [(store.name, partition['name'], partition['version']) for store in stores for partition in store.partitions]
+        dataset_tag = (partitions, f"{zlib.crc32(repr(versions).encode()):08x}")
+    return dataset_tag[1]
+
+def get_cache_statistics():
+    """Get the hit/miss/eviction counters of the query cache and the dataset version"""
+    return dict(query_cache.get_statistics(), dataset_version=dataset_version)
+
+def get_process_memory():
+    """Resident memory of the process in bytes, None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def get_metric_samples():
+    """
+    Get the cache counters and memory figures exposed by /metrics, see utils.metrics.render_metrics
+    
+    Returns:
+    list: (name, type, help, label names, [(label values, value), ...]) per metric
+    """
+    caches = [query_cache.get_statistics(), compressed_cache.get_statistics()]
+    stores = [store for store in (firewall_store, intrusion_detection_store) if store is not None]
+    for store in stores:
+        caches += [store.partition_cache.get_statistics(), store.summary_cache.get_statistics()]
+
+    samples = [
+        (f'hpdav_cache_{counter}_total', 'counter', f'Lookups of a cache that were {counter}.', ('cache',),
+         [((cache['name'],), cache[counter]) for cache in caches])
+        for counter in ('hits', 'misses', 'coalesced', 'evictions')
+    ]
+    samples += [
+        ('hpdav_cache_hit_ratio', 'gauge', 'Share of the lookups answered without computing.', ('cache',),
+         [((cache['name'],), cache['hit_rate']) for cache in caches]),
+        ('hpdav_cache_bytes', 'gauge', 'Estimated memory of the cached values.', ('cache',),
+         [((cache['name'],), cache['bytes']) for cache in caches]),
+        ('hpdav_cache_entries', 'gauge', 'Number of cached values.', ('cache',),
+         [((cache['name'],), cache['entries']) for cache in caches]),
+        ('hpdav_loaded_rows', 'gauge', 'Rows of the partitions in memory.', ('dataset',),
+         [((store.name,), sum(len(df) for df in store.partition_cache.values())) for store in stores]),
+        ('hpdav_dataset_rows', 'gauge', 'Rows of all partitions on disk.', ('dataset',),
+         [((store.name,), store.rows) for store in stores]),
+        ('hpdav_dataset_version', 'gauge', 'Bumped whenever rows are ingested while running.', (),
+         [((), dataset_version)]),
+    ]
+    memory = get_process_memory()
+    if memory is not None:
+        samples.append(('hpdav_process_resident_bytes', 'gauge', 'Resident memory of the server process.', (),
+                        [((), memory)]))
+    return samples
 
 def get_category_statistics(categories):
     """Get statistics for each category"""
@@ -401,10 +826,37 @@ def get_category_statistics(categories):
         for category, ips in categories.items()
     }
 
-categories = categorize_ip_addresses()
-stats = get_category_statistics(categories)
+def build_shared_store():
+    """
+    Ingest both datasets and write the shared memory-mapped partitions, see utils.sharedStore
+    
+    Run once by the gunicorn master before the workers start, the datasets are
+    released afterwards so the workers don't inherit them.
+    """
+    global firewall_store, intrusion_detection_store
+    for store in (get_firewall_store(), get_intrusion_detection_store()):
+        if store.shared:
+            logger.info("Wrote %d shared %s partition(s)", store.write_shared_partitions(), store.name)
+    firewall_store = intrusion_detection_store = None
 
-print(stats)
+def get_warm_up_steps():
+    """
+    Get the steps of the background warm-up, see utils.warmup
+    
+    Returns:
+    list: (name, function) pairs loading both datasets, categorizing the IPs,
+    building the rollups and heavy hitter summaries of every partition and
+    starting the data watcher
+    """
+    # The results are only computed to fill the caches
+    return [
+        ('firewall', get_first_10_rows_firewall),
+        ('intrusion-detection', get_first_10_rows_intrusion_detection),
+        ('ip-categories', lambda: logger.debug("IPs per category: %s", get_category_statistics(categorize_ip_addresses()))),
+        ('rollups', get_aggregated_data_by_time),
+        ('top-k', build_top_k_summaries),
+        ('watcher', start_data_watcher),
+    ]
 
 def get_firewall_anomaly_traffic(start_datetime=None, end_datetime=None):
     """
@@ -417,42 +869,27 @@ def get_firewall_anomaly_traffic(start_datetime=None, end_datetime=None):
     Returns:
     pd.DataFrame: Firewall traffic data where source or destination is an anomalous IP
     """
-    # Get categorized IPs and extract anomalies
-    categories = categorize_ip_addresses(start_datetime, end_datetime)
-    anomaly_ips = categories['Anomalies']
-    
-    # Get firewall data based on date range
-    if start_datetime and end_datetime:
-        df_fw = get_firewall_data_by_datetime(start_datetime, end_datetime)
-    else:
-        df_fw = get_firewall_data()
-    
-    # Filter for traffic involving anomalous IPs
-    anomaly_mask = (df_fw['SourceIP'].isin(anomaly_ips) | 
-                   df_fw['DestinationIP'].isin(anomaly_ips))
-    
-    return df_fw[anomaly_mask]
+    return get_firewall_category_traffic('Anomalies', start_datetime, end_datetime)
 
-def get_category_traffic(df, category_name, categories):
+def get_category_traffic(df, category_name):
     """
     Base function to filter traffic data for a specific category
     
     Parameters:
-    df (pd.DataFrame): DataFrame containing traffic data
-    category_name (str): Name of the category to filter for
-    categories (dict): Dictionary of categorized IPs
+    df (pd.DataFrame): DataFrame with the category columns of add_category_columns
+    category_name (str or list): Name of the category to filter for, or several
+    names (list or comma separated) to get the traffic of any of them
     
     Returns:
     pd.DataFrame: Traffic data filtered by category
     """
-    if category_name not in categories:
-        raise ValueError(f"Invalid category: {category_name}")
-        
-    category_ips = categories[category_name]
-    category_mask = (df['SourceIP'].isin(category_ips) | 
-                    df['DestinationIP'].isin(category_ips))
-    
-    return df[category_mask]
+    bits = get_category_bits(category_name)
+    if df.empty:
+        return df
+
+    with timed('filter'):
+        category_mask = ((df['SourceCategories'].to_numpy() | df['DestinationCategories'].to_numpy()) & bits) != 0
+        return df[category_mask]
 
 def get_firewall_category_traffic(category_name, start_datetime=None, end_datetime=None):
     """
@@ -466,15 +903,16 @@ def get_firewall_category_traffic(category_name, start_datetime=None, end_dateti
     Returns:
     pd.DataFrame: Firewall traffic data filtered by category
     """
-    categories = categorize_ip_addresses(start_datetime, end_datetime)
-    
-    if start_datetime and end_datetime:
-        print("Getting firewall data by datetime")
-        df_fw = get_firewall_data_by_datetime(start_datetime, end_datetime)
-    else:
-        df_fw = get_firewall_data()
-    
-    return get_category_traffic(df_fw, category_name, categories)
+    def compute():
+        if start_datetime and end_datetime:
+            df_fw = get_firewall_data_by_datetime(start_datetime, end_datetime)
+        else:
+            df_fw = get_firewall_data()
+        
+        return get_category_traffic(df_fw, category_name)
+
+    key = ('categoryTraffic', 'firewall', category_name) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
 
 def get_ids_category_traffic(category_name, start_datetime=None, end_datetime=None):
     """
@@ -488,14 +926,218 @@ def get_ids_category_traffic(category_name, start_datetime=None, end_datetime=No
     Returns:
     pd.DataFrame: IDS traffic data filtered by category
     """
-    categories = categorize_ip_addresses(start_datetime, end_datetime)
+    def compute():
+        if start_datetime and end_datetime:
+            df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+        else:
+            df_ids = get_intrusion_detection_data()
+        
+        return get_category_traffic(df_ids, category_name)
+
+    key = ('categoryTraffic', 'ids', category_name) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
+
+# Queries that can run as jobs, see utils.jobs, named after their routes
+JOB_QUERIES = ('firewallDataByDateTime', 'idsDataByDateTime', 'categoryTraffic')
+
+def check_job_query(query, params):
+    """
+    Validate the query of a job before it is queued
     
-    if start_datetime and end_datetime:
-        df_ids = get_intrusion_detection_data_by_datetime(start_datetime, end_datetime)
+    Parameters:
+    query (str): One of JOB_QUERIES
+    params (dict): Query parameters of the route: start_datetime and end_datetime,
+    plus source ('firewall' or 'ids') and category for categoryTraffic
+    
+    Returns:
+    dict: The parameters run_job_query takes
+    """
+    if query not in JOB_QUERIES:
+        raise ValueError(f"query must be one of {', '.join(JOB_QUERIES)}")
+    start_datetime, end_datetime = params.get('start_datetime'), params.get('end_datetime')
+    if bool(start_datetime) != bool(end_datetime):
+        raise ValueError("Both start_datetime and end_datetime must be provided together")
+    # Raises ValueError for invalid datetimes
+    normalize_window(start_datetime, end_datetime)
+
+    if query == 'categoryTraffic':
+        source = str(params.get('source', '')).lower()
+        if source not in ('firewall', 'ids'):
+            raise ValueError("Source must be either 'firewall' or 'ids'")
+        if not params.get('category'):
+            raise ValueError("category must be provided")
+        get_category_bits(params['category'])
+        category = params['category']
     else:
-        df_ids = get_intrusion_detection_data()
+        if not start_datetime:
+            raise ValueError("Please provide start_datetime and end_datetime in 'YYYY-MM-DDTHH:MM:SS' format")
+        source = 'firewall' if query == 'firewallDataByDateTime' else 'ids'
+        category = None
+    return {'source': source, 'category': category, 'start_datetime': start_datetime, 'end_datetime': end_datetime}
+
+def run_job_query(params, progress=None):
+    """
+    Run the query of a job partition by partition, so it can report progress and be cancelled
     
-    return get_category_traffic(df_ids, category_name, categories)
+    Parameters:
+    params (dict): Result of check_job_query
+    progress (callable, optional): Called with (done, total) partitions, raises to cancel
     
-    return df_ids[anomaly_mask]
-    
\ No newline at end of file
+    Returns:
+    pd.DataFrame: The rows of the route the query stands for
+    """
+    store = get_firewall_store() if params['source'] == 'firewall' else get_intrusion_detection_store()
+    frames = []
+    for df in store.iter_slices(params['start_datetime'], params['end_datetime'], progress=progress):
+        if params['category']:
+            df = get_category_traffic(df, params['category'])
+        if not df.empty:
+            frames.append(df)
+    if not frames:
+        return store.head(0)
+    return normalize_column_types(concat_frames(frames))
+
+def check_attribute(source, attribute):
+    """
+    Validate the source and the column to count of /histogram and /topK
+    
+    Parameters:
+    source (str): 'firewall' or 'ids'
+    attribute (str): Column of the source, anything but DateTime
+    """
+    if source == 'firewall':
+        columns = field_mapping_firewall.values()
+    elif source == 'ids':
+        columns = field_mapping_intrusion_detection.values()
+    else:
+        raise ValueError("Source must be either 'firewall' or 'ids'")
+    if attribute == 'DateTime':
+        raise ValueError("DateTime can't be counted, use /aggregatedByTime for counts over time")
+    if attribute not in columns:
+        raise ValueError(f"Invalid attribute: {attribute}")
+
+def get_histogram(source, attribute, start_datetime=None, end_datetime=None, category=None):
+    """
+    Count how often every value of an attribute occurs in firewall or IDS traffic
+    
+    Parameters:
+    source (str): 'firewall' or 'ids'
+    attribute (str): Column to count, e.g. 'Protocol' or 'DestinationPort'
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    category (str, optional): Only count traffic involving IPs of this category
+    (or any of several comma separated ones)
+    
+    Returns:
+    pd.DataFrame: One row per value with the attribute and Count, numeric values
+    in ascending order, other values most frequent first
+    """
+    check_attribute(source, attribute)
+    if category:
+        get_category_bits(category)  # Reject unknown categories before any work
+
+    def compute():
+        if source == 'firewall':
+            slices = get_firewall_data_slices_by_datetime(start_datetime, end_datetime)
+        else:
+            slices = get_intrusion_detection_data_slices_by_datetime(start_datetime, end_datetime)
+        if category:
+            slices = [get_category_traffic(df, category) for df in slices]
+        counts = merge_counts([count_values(df[attribute]) for df in slices])
+
+        histogram = pd.DataFrame({attribute: counts.index, 'Count': counts.to_numpy(dtype=np.int64)})
+        if pd.api.types.is_numeric_dtype(histogram[attribute].infer_objects()):
+            histogram[attribute] = histogram[attribute].infer_objects()
+            histogram = histogram.sort_values(attribute, kind='stable')
+        else:
+            histogram = histogram.sort_values('Count', ascending=False, kind='stable')
+        return histogram.reset_index(drop=True)
+
+    key = ('histogram', source, attribute, category) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
+
+# Windows up to this long are counted exactly from the rows instead of the summaries
+TOP_K_EXACT_WINDOW = pd.Timedelta(minutes=int(os.environ.get('HPDAV_TOPK_EXACT_MINUTES', '60')))
+
+MAX_TOP_K = 1000
+
+# Columns whose summaries are built during the warm-up, others on first use
+TOP_K_WARM_UP = {'firewall': ['SourceIP', 'DestinationPort'], 'ids': ['Classification']}
+
+def get_top_k_summaries(source, attribute, start_datetime=None, end_datetime=None):
+    """Get the per-minute heavy hitter summaries of the partitions overlapping a window, see utils.heavyHitters"""
+    store = get_firewall_store() if source == 'firewall' else get_intrusion_detection_store()
+    return store.get_summaries(f'topK-{attribute}', lambda df: build_summary(df, attribute),
+                               start_datetime, end_datetime)
+
+def get_top_values(source, attribute, start_datetime=None, end_datetime=None, k=10):
+    """
+    Get the most frequent values of an attribute in firewall or IDS traffic
+    
+    Wide windows are answered from the per-minute summaries, the rows of
+    partial minutes at the edges of the window are counted exactly. Windows up
+    to HPDAV_TOPK_EXACT_MINUTES (60) are counted exactly from the rows.
+    
+    Parameters:
+    source (str): 'firewall' or 'ids'
+    attribute (str): Column to count, e.g. 'SourceIP' or 'Classification'
+    start_datetime (str, optional): Start datetime
+    end_datetime (str, optional): End datetime
+    k (int): Number of values, at most MAX_TOP_K
+    
+    Returns:
+    pd.DataFrame: The attribute, Count (an upper bound) and Error, the true
+    count being at least Count - Error, highest Count first.
+    df.attrs['exact'] is False when the counts are estimates.
+    """
+    check_attribute(source, attribute)
+    if not 0 < k <= MAX_TOP_K:
+        raise ValueError(f"k must be between 1 and {MAX_TOP_K}")
+    store = get_firewall_store() if source == 'firewall' else get_intrusion_detection_store()
+
+    def count_exactly(start, end, before=None):
+        slices = store.iter_slices(start, end)
+        if before is not None:
+            slices = (df[df['DateTime'] < before] for df in slices)
+        counts = merge_counts([count_values(df[attribute]) for df in slices])
+        return counts_to_counters(counts)
+
+    def compute():
+        if start_datetime and end_datetime:
+            start, end = pd.Timestamp(start_datetime), pd.Timestamp(end_datetime)
+            # First and last whole minute of the window
+            first = start.ceil(ROLLUP_FREQ)
+            last = (end + pd.Timedelta(1, 'ns')).floor(ROLLUP_FREQ) - pd.Timedelta(ROLLUP_FREQ)
+            if end - start <= TOP_K_EXACT_WINDOW or last < first:
+                top = get_top_k([count_exactly(start, end)], 0, k)
+                floor = 0
+            else:
+                # Whole minutes come from the summaries, the partial ones at the edges from the rows
+                counters, floor = [], 0
+                for summary in get_top_k_summaries(source, attribute, first, last):
+                    summary_counters, summary_floor = get_window_counters(summary, first, last)
+                    counters += summary_counters
+                    floor += summary_floor
+                if start < first:
+                    counters.append(count_exactly(start, first, before=first))
+                if last + pd.Timedelta(ROLLUP_FREQ) <= end:
+                    counters.append(count_exactly(last + pd.Timedelta(ROLLUP_FREQ), end))
+                top = get_top_k(counters, floor, k)
+        else:
+            summaries = [get_window_counters(summary) for summary in get_top_k_summaries(source, attribute)]
+            floor = sum(summary_floor for _, summary_floor in summaries)
+            top = get_top_k([counters for summary_counters, _ in summaries for counters in summary_counters], floor, k)
+
+        top = top.rename(columns={'Value': attribute})
+        top[attribute] = top[attribute].infer_objects()
+        top.attrs['exact'] = is_exact(top, floor, k)
+        return top
+
+    key = ('topK', source, attribute, k) + normalize_window(start_datetime, end_datetime)
+    return query_cache.get_or_compute(key, compute)
+
+def build_top_k_summaries():
+    """Build the heavy hitter summaries of the TOP_K_WARM_UP columns for every partition"""
+    for source, attributes in TOP_K_WARM_UP.items():
+        for attribute in attributes:
+            get_top_k_summaries(source, attribute)
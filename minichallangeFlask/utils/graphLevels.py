@@ -0,0 +1,293 @@
+"""
+Level of detail communication graphs.
+
+Every IP belongs to one category (the first of create_ip_categories it
+matches, see get_primary_categories) and to one /24 subnet within it, which
+gives a three level hierarchy: category -> subnet -> IP. A graph is requested
+at a level and single super-nodes can be expanded into their members.
+
+For a window the connections are aggregated once per level (see
+build_level_index): the subnet level table answers everything that is not
+expanded down to IPs, and the IP level table is sorted by subnet so the rows
+of an expanded subnet are found with binary searches. An expansion therefore
+only touches the rows it reveals.
+
+Nodes are identified internally by int64 keys: the level in bits 40 and up,
+the category in bits 32-39 and the subnet or IP address in the low 32 bits.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.ipCategories import uint32_to_ip
+
+LEVELS = ('category', 'subnet', 'ip')
+
+SUBNET_PREFIX = 24
+SUBNET_MASK = np.uint32((0xFFFFFFFF << (32 - SUBNET_PREFIX)) & 0xFFFFFFFF)
+
+LEVEL_SHIFT = 40
+CATEGORY_SHIFT = 32
+
+# Index of the lowest set bit of every uint8 bitmask
+_LOWEST_BIT = np.array([(value & -value).bit_length() - 1 if value else 0 for value in range(256)], dtype=np.int64)
+
+
+def get_primary_categories(bits):
+    """
+    Get the category index of IPs from their category bitmasks.
+
+    Parameters:
+    bits (np.ndarray): uint8 category bitmasks, see get_category_bits.
+
+    Returns:
+    np.ndarray: Index of the first category the IP belongs to
+    """
+    return _LOWEST_BIT[np.asarray(bits, dtype=np.uint8)]
+
+
+def get_subnet_keys(ips, categories):
+    """
+    Get the key of the subnet (within its category) of IPs.
+
+    Parameters:
+    ips (np.ndarray): IPv4 addresses as uint32.
+    categories (np.ndarray): Category index per IP.
+
+    Returns:
+    np.ndarray: int64 keys, category in the high bits and subnet address in the low 32 bits
+    """
+    subnets = (np.asarray(ips, dtype=np.uint32) & SUBNET_MASK).astype(np.int64)
+    return (np.asarray(categories, dtype=np.int64) << CATEGORY_SHIFT) | subnets
+
+
+def aggregate_edges(sources, destinations, counts, first_seen, last_seen, connections):
+    """
+    Sum up edges with the same endpoints.
+
+    Parameters:
+    sources, destinations (np.ndarray): Endpoint keys per edge.
+    counts (np.ndarray): Rows per edge.
+    first_seen, last_seen (np.ndarray): Time of the first and last row per edge.
+    connections (np.ndarray): IP level connections per edge.
+
+    Returns:
+    pd.DataFrame: One row per pair of endpoints
+    """
+    edges = pd.DataFrame({
+        'Source': sources, 'Target': destinations, 'Count': counts,
+        'FirstSeen': first_seen, 'LastSeen': last_seen, 'Connections': connections,
+    })
+    return edges.groupby(['Source', 'Target'], sort=False).agg(
+        {'Count': 'sum', 'FirstSeen': 'min', 'LastSeen': 'max', 'Connections': 'sum'}).reset_index()
+
+
+def build_level_index(connections, source_categories, destination_categories):
+    """
+    Precompute the per level tables of the connections of a window.
+
+    Parameters:
+    connections (pd.DataFrame): IP level connections with uint32 SourceIP and
+    DestinationIP, Count, FirstSeen and LastSeen (see utils.connections).
+    source_categories (np.ndarray): Category index of every SourceIP.
+    destination_categories (np.ndarray): Category index of every DestinationIP.
+
+    Returns:
+    dict: 'ip_edges' (sorted by source subnet), 'by_destination' (positions
+    sorted by destination subnet), 'subnet_edges', 'ips' (distinct IPs with
+    category and subnet, sorted by subnet)
+    """
+    source_subnets = get_subnet_keys(connections['SourceIP'].to_numpy(), source_categories)
+    destination_subnets = get_subnet_keys(connections['DestinationIP'].to_numpy(), destination_categories)
+    ip_edges = pd.DataFrame({
+        'SourceIP': connections['SourceIP'].to_numpy(dtype=np.uint32),
+        'DestinationIP': connections['DestinationIP'].to_numpy(dtype=np.uint32),
+        'SourceCategory': np.asarray(source_categories, dtype=np.int64),
+        'DestinationCategory': np.asarray(destination_categories, dtype=np.int64),
+        'SourceSubnet': source_subnets,
+        'DestinationSubnet': destination_subnets,
+        'Count': connections['Count'].to_numpy(dtype=np.int64),
+        'FirstSeen': connections['FirstSeen'].to_numpy(),
+        'LastSeen': connections['LastSeen'].to_numpy(),
+    }).sort_values('SourceSubnet', kind='stable').reset_index(drop=True)
+
+    subnet_edges = aggregate_edges(ip_edges['SourceSubnet'], ip_edges['DestinationSubnet'], ip_edges['Count'],
+                                   ip_edges['FirstSeen'], ip_edges['LastSeen'], np.ones(len(ip_edges), dtype=np.int64))
+
+    ips = pd.DataFrame({
+        'IP': np.concatenate([ip_edges['SourceIP'], ip_edges['DestinationIP']]),
+        'Category': np.concatenate([ip_edges['SourceCategory'], ip_edges['DestinationCategory']]),
+        'Subnet': np.concatenate([ip_edges['SourceSubnet'], ip_edges['DestinationSubnet']]),
+    }).drop_duplicates('IP').sort_values(['Subnet', 'IP'], kind='stable').reset_index(drop=True)
+
+    return {
+        'ip_edges': ip_edges,
+        'by_destination': np.argsort(ip_edges['DestinationSubnet'].to_numpy(), kind='stable'),
+        'subnet_edges': subnet_edges,
+        'ips': ips,
+    }
+
+
+def find_sorted(values, keys):
+    """
+    Find the positions of the values equal to any of the keys in a sorted array.
+
+    Parameters:
+    values (np.ndarray): Sorted array.
+    keys (np.ndarray): Values to look for.
+
+    Returns:
+    np.ndarray: Positions into values
+    """
+    starts = np.searchsorted(values, keys, side='left')
+    ends = np.searchsorted(values, keys, side='right')
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+
+def map_subnets(subnet_keys, depth, expanded_categories):
+    """Get the node keys of subnets, the category node unless the category is expanded"""
+    categories = subnet_keys >> CATEGORY_SHIFT
+    shown = (depth >= 1) | np.isin(categories, expanded_categories)
+    return np.where(shown, (1 << LEVEL_SHIFT) | subnet_keys, categories << CATEGORY_SHIFT)
+
+
+def map_ips(ips, categories, subnet_keys, depth, expanded_categories, expanded_subnets):
+    """Get the node keys of IPs, the subnet or category node unless that is expanded"""
+    shown = (depth >= 2) | np.isin(subnet_keys, expanded_subnets)
+    ip_keys = (2 << LEVEL_SHIFT) | (np.asarray(categories, dtype=np.int64) << CATEGORY_SHIFT) | ips.astype(np.int64)
+    return np.where(shown, ip_keys, map_subnets(subnet_keys, depth, expanded_categories))
+
+
+def get_level_graph(index, level='category', expanded_categories=(), expanded_subnets=()):
+    """
+    Get the graph of a window at a level of detail.
+
+    Parameters:
+    index (dict): Result of build_level_index.
+    level (str): Initial level, one of LEVELS.
+    expanded_categories (iterable): Category indices shown as their subnets.
+    expanded_subnets (iterable): Subnet keys (see get_subnet_keys) shown as their IPs,
+    their categories are expanded as well.
+
+    Returns:
+    tuple: (nodes, edges) DataFrames. Nodes have Key, Parent, Members (IPs),
+    Count (rows of the incident connections) and InternalCount (rows between
+    members of the node). Edges have Source, Target, Count, FirstSeen, LastSeen
+    and Connections (IP level connections merged into the edge).
+    """
+    depth = LEVELS.index(level)
+    expanded_subnets = np.unique(np.asarray(list(expanded_subnets), dtype=np.int64))
+    expanded_categories = np.union1d(np.asarray(list(expanded_categories), dtype=np.int64),
+                                     expanded_subnets >> CATEGORY_SHIFT)
+    ip_edges, subnet_edges, ips = index['ip_edges'], index['subnet_edges'], index['ips']
+
+    # Connections revealed by an expanded subnet come from the IP level table
+    if depth >= 2:
+        revealed = np.arange(len(ip_edges))
+        coarse = subnet_edges.iloc[0:0]
+    else:
+        revealed = np.union1d(find_sorted(ip_edges['SourceSubnet'].to_numpy(), expanded_subnets),
+                              index['by_destination'][find_sorted(
+                                  ip_edges['DestinationSubnet'].to_numpy()[index['by_destination']], expanded_subnets)])
+        coarse = subnet_edges[~(subnet_edges['Source'].isin(expanded_subnets) |
+                                subnet_edges['Target'].isin(expanded_subnets))]
+    fine = ip_edges.iloc[revealed]
+
+    edges = aggregate_edges(
+        np.concatenate([map_subnets(coarse['Source'].to_numpy(), depth, expanded_categories),
+                        map_ips(fine['SourceIP'].to_numpy(), fine['SourceCategory'].to_numpy(), fine['SourceSubnet'].to_numpy(),
+                                depth, expanded_categories, expanded_subnets)]),
+        np.concatenate([map_subnets(coarse['Target'].to_numpy(), depth, expanded_categories),
+                        map_ips(fine['DestinationIP'].to_numpy(), fine['DestinationCategory'].to_numpy(),
+                                fine['DestinationSubnet'].to_numpy(), depth, expanded_categories, expanded_subnets)]),
+        np.concatenate([coarse['Count'].to_numpy(), fine['Count'].to_numpy()]),
+        np.concatenate([coarse['FirstSeen'].to_numpy(), fine['FirstSeen'].to_numpy()]),
+        np.concatenate([coarse['LastSeen'].to_numpy(), fine['LastSeen'].to_numpy()]),
+        np.concatenate([coarse['Connections'].to_numpy(), np.ones(len(fine), dtype=np.int64)]),
+    )
+
+    # Nodes: every IP mapped to the node it is shown as
+    node_keys = map_ips(ips['IP'].to_numpy(), ips['Category'].to_numpy(), ips['Subnet'].to_numpy(),
+                        depth, expanded_categories, expanded_subnets)
+    nodes = pd.DataFrame({'Key': node_keys}).groupby('Key', sort=True).size().rename('Members').reset_index()
+
+    internal = edges['Source'] == edges['Target']
+    incident = pd.concat([edges.loc[~internal, ['Source', 'Count']].set_axis(['Key', 'Count'], axis=1),
+                          edges.loc[~internal, ['Target', 'Count']].set_axis(['Key', 'Count'], axis=1)])
+    nodes['Count'] = nodes['Key'].map(incident.groupby('Key')['Count'].sum()).fillna(0).astype(np.int64)
+    nodes['InternalCount'] = nodes['Key'].map(
+        edges[internal].set_index('Source')['Count']).fillna(0).astype(np.int64)
+    nodes['Parent'] = get_parent_keys(nodes['Key'].to_numpy())
+
+    edges = edges[~internal].sort_values('Count', ascending=False, kind='stable').reset_index(drop=True)
+    return nodes, edges
+
+
+def get_parent_keys(keys):
+    """
+    Get the key of the super-node of nodes.
+
+    Parameters:
+    keys (np.ndarray): Node keys.
+
+    Returns:
+    np.ndarray: Parent keys, -1 for categories
+    """
+    levels = keys >> LEVEL_SHIFT
+    low = keys & ((1 << LEVEL_SHIFT) - 1)
+    categories = low >> CATEGORY_SHIFT
+    subnets = (categories << CATEGORY_SHIFT) | ((low & 0xFFFFFFFF) & int(SUBNET_MASK))
+    return np.select([levels == 2, levels == 1], [(1 << LEVEL_SHIFT) | subnets, categories << CATEGORY_SHIFT], -1)
+
+
+def get_node_ids(keys, category_names):
+    """
+    Render node keys as ids: the category name, '<category>:<subnet>/24' or the IP.
+
+    Parameters:
+    keys (np.ndarray): Node keys, -1 for no node.
+    category_names (list): Category names by index.
+
+    Returns:
+    np.ndarray: Node ids (object dtype), None for -1
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    levels = keys >> LEVEL_SHIFT
+    categories = (keys >> CATEGORY_SHIFT) & 0xFF
+    addresses = uint32_to_ip((keys & 0xFFFFFFFF).astype(np.uint32))
+    names = np.asarray(category_names, dtype=object)[np.minimum(categories, len(category_names) - 1)]
+    ids = np.where(levels == 2, addresses, names + ':' + addresses + f'/{SUBNET_PREFIX}')
+    ids = np.where(levels == 0, names, ids)
+    return np.where(keys < 0, None, ids)
+
+
+def parse_node_id(node_id, category_names):
+    """
+    Parse the id of an expandable node.
+
+    Parameters:
+    node_id (str): Category name or '<category>:<subnet>/24'.
+    category_names (list): Category names by index.
+
+    Returns:
+    tuple: ('category', category index) or ('subnet', subnet key)
+
+    Raises:
+    ValueError: If the id is not a category or subnet node
+    """
+    name, _, subnet = node_id.partition(':')
+    if name not in category_names:
+        raise ValueError(f"Invalid node: {node_id}, only categories and subnets can be expanded")
+    category = category_names.index(name)
+    if not subnet:
+        return 'category', category
+
+    address, _, prefix = subnet.partition('/')
+    octets = address.split('.')
+    if prefix != str(SUBNET_PREFIX) or len(octets) != 4 or not all(o.isdigit() and int(o) <= 255 for o in octets):
+        raise ValueError(f"Invalid node: {node_id}, subnets look like '{name}:172.23.1.0/{SUBNET_PREFIX}'")
+    ip = np.array([(int(octets[0]) << 24) | (int(octets[1]) << 16) | (int(octets[2]) << 8) | int(octets[3])],
+                  dtype=np.uint32)
+    return 'subnet', int(get_subnet_keys(ip, [category])[0])
@@ -0,0 +1,226 @@
+"""
+Top-K heavy hitters from per-minute Space-Saving summaries.
+
+For every partition and column a summary keeps, per minute, the capacity
+most frequent values with their exact counts (the counters of a
+Space-Saving sketch fed with that minute) and the floor of the minute: the
+largest count that was dropped, so no value missing from the minute
+occurred more often. Every hour and the whole partition get larger
+summaries of the same kind. Summaries are built once per partition (see
+PartitionedDataset.get_partition_summary). A window merges the summaries of
+the partitions it covers entirely, of its whole hours and of the remaining
+minutes.
+
+Merged, a value's counted occurrences are a lower bound of its count, and
+adding the floors of the minutes it is missing from gives an upper bound.
+Like Space-Saving the upper bound is reported as Count with the difference
+as Error, the true count lies within [Count - Error, Count]. Minutes where
+nothing was dropped add no error, so quiet windows come out exact.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.rollups import ROLLUP_FREQ
+
+# Counters kept per minute, hours keep HOUR_CAPACITY_FACTOR and whole
+# partitions PARTITION_CAPACITY_FACTOR times more
+DEFAULT_CAPACITY = int(os.environ.get('HPDAV_TOPK_CAPACITY', '64'))
+HOUR_CAPACITY_FACTOR = 4
+PARTITION_CAPACITY_FACTOR = 16
+
+HOUR_FREQ = '1h'
+
+COUNTER_COLUMNS = ['Value', 'Count', 'Floor']
+
+
+def summarize(counts, capacity):
+    """
+    Keep the most frequent values of every period of exact counts.
+
+    Parameters:
+    counts (pd.DataFrame): Time (start of the period), Value and exact Count.
+    capacity (int): Counters kept per period.
+
+    Returns:
+    dict: 'times' (period of every counter), 'counters' (COUNTER_COLUMNS, Floor
+    being the floor of the period), 'periods' and 'floor_sums' (cumulative
+    floors, one more than periods), both sorted by time
+    """
+    counts = counts.sort_values(['Time', 'Count'], ascending=[True, False], kind='stable')
+    rank = counts.groupby('Time', sort=False).cumcount().to_numpy()
+    kept = counts[rank < capacity]
+    floors = counts[rank >= capacity].groupby('Time')['Count'].max()
+    floors = floors.reindex(kept['Time'].unique(), fill_value=0).astype(np.int64).sort_index()
+    return {
+        'times': pd.DatetimeIndex(kept['Time']),
+        'counters': pd.DataFrame({'Value': kept['Value'].to_numpy(), 'Count': kept['Count'].to_numpy(dtype=np.int64),
+                                  'Floor': floors.reindex(kept['Time']).to_numpy()}),
+        'periods': pd.DatetimeIndex(floors.index),
+        'floor_sums': np.concatenate([[0], np.cumsum(floors.to_numpy())]),
+    }
+
+
+def build_summary(df, column, capacity=DEFAULT_CAPACITY):
+    """
+    Build the per-minute and per-hour summaries of a column of a partition.
+
+    Parameters:
+    df (pd.DataFrame): Rows with a DateTime column.
+    column (str): Column to count.
+    capacity (int): Counters kept per minute.
+
+    Returns:
+    dict: 'minutes' and 'hours' (results of summarize), 'total'
+    (counters of the whole partition), 'floor' (floor of the whole partition),
+    'first' and 'last' minute
+    """
+    minutes = df['DateTime'].dt.floor(ROLLUP_FREQ)
+    counts = (pd.DataFrame({'Time': minutes.to_numpy(), 'Value': df[column].to_numpy()})
+              .groupby(['Time', 'Value'], observed=True, sort=False).size())
+    counts = counts[counts > 0].reset_index(name='Count')
+    hour_counts = (counts.assign(Time=counts['Time'].dt.floor(HOUR_FREQ))
+                   .groupby(['Time', 'Value'], sort=False)['Count'].sum().reset_index())
+
+    # The whole partition is counted exactly as well
+    totals = counts.groupby('Value', sort=False)['Count'].sum().sort_values(ascending=False, kind='stable')
+    total_capacity = capacity * PARTITION_CAPACITY_FACTOR
+    floor = int(totals.iloc[total_capacity]) if len(totals) > total_capacity else 0
+    minute_summary = summarize(counts, capacity)
+    return {
+        'minutes': minute_summary,
+        'hours': summarize(hour_counts, capacity * HOUR_CAPACITY_FACTOR),
+        # The kept counters are exact, like in summarize their Floor is the floor of the period
+        'total': counts_to_counters(totals.head(total_capacity), floor),
+        'floor': floor,
+        'first': minute_summary['periods'].min() if len(totals) else None,
+        'last': minute_summary['periods'].max() if len(totals) else None,
+    }
+
+
+def merge_counters(counters):
+    """
+    Add up counters by value.
+
+    Parameters:
+    counters (list): Frames with the COUNTER_COLUMNS, Floor being the floors of
+    the minutes the counter was present in.
+
+    Returns:
+    pd.DataFrame: One row per value with the COUNTER_COLUMNS
+    """
+    counters = [frame for frame in counters if not frame.empty]
+    if not counters:
+        return pd.DataFrame({'Value': pd.Series(dtype=object), 'Count': pd.Series(dtype=np.int64),
+                             'Floor': pd.Series(dtype=np.int64)})
+    merged = pd.concat(counters, ignore_index=True) if len(counters) > 1 else counters[0]
+    return merged.groupby('Value', sort=False, observed=True)[['Count', 'Floor']].sum().reset_index()
+
+
+def select_periods(level, start, end):
+    """
+    Get the counters of the periods of one level of a summary within [start, end].
+
+    Parameters:
+    level (dict): Result of summarize.
+    start (pd.Timestamp): Start of the first period.
+    end (pd.Timestamp): Start of the last period.
+
+    Returns:
+    tuple: (counters with the COUNTER_COLUMNS, sum of the floors of the periods)
+    """
+    if start > end:
+        return level['counters'].iloc[0:0], 0
+    # Both sorted by time, so the periods of the window are contiguous
+    first, last = level['times'].searchsorted(start, 'left'), level['times'].searchsorted(end, 'right')
+    first_period, last_period = level['periods'].searchsorted(start, 'left'), level['periods'].searchsorted(end, 'right')
+    return level['counters'].iloc[first:last], int(level['floor_sums'][last_period] - level['floor_sums'][first_period])
+
+
+def get_window_counters(summary, start=None, end=None):
+    """
+    Get the counters of the whole minutes of a summary within a window.
+
+    Whole hours of the window come from the hourly counters, the minutes
+    before the first and after the last whole hour from the minute counters.
+
+    Parameters:
+    summary (dict): Result of build_summary.
+    start (pd.Timestamp, optional): First minute.
+    end (pd.Timestamp, optional): Last minute.
+
+    Returns:
+    tuple: (list of counters with the COUNTER_COLUMNS, sum of their floors)
+    """
+    if summary['first'] is None:
+        return [], 0
+    if (start is None or start <= summary['first']) and (end is None or end >= summary['last']):
+        return [summary['total']], summary['floor']
+
+    minute, hour = pd.Timedelta(ROLLUP_FREQ), pd.Timedelta(HOUR_FREQ)
+    first_hour = start.ceil(HOUR_FREQ)
+    last_hour = (end + minute).floor(HOUR_FREQ) - hour
+    if first_hour > last_hour:
+        parts = [select_periods(summary['minutes'], start, end)]
+    else:
+        parts = [
+            select_periods(summary['minutes'], start, first_hour - minute),
+            select_periods(summary['hours'], first_hour, last_hour),
+            select_periods(summary['minutes'], last_hour + hour, end),
+        ]
+    return [counters for counters, _ in parts], sum(floor for _, floor in parts)
+
+
+def counts_to_counters(counts, floor=0):
+    """
+    Turn exact value counts into counters without error.
+
+    Parameters:
+    counts (pd.Series): Value -> count, see utils.histograms.count_values.
+    floor (int): Floor of the period the counts cover, 0 when every value was counted.
+
+    Returns:
+    pd.DataFrame: Counters with the COUNTER_COLUMNS
+    """
+    return pd.DataFrame({'Value': counts.index.to_numpy(), 'Count': counts.to_numpy(dtype=np.int64),
+                         'Floor': np.full(len(counts), floor, dtype=np.int64)})
+
+
+def get_top_k(counters, floor, k):
+    """
+    Get the values with the highest counts and their error bounds.
+
+    Parameters:
+    counters (list): Frames with the COUNTER_COLUMNS of a window.
+    floor (int): Sum of the floors of every minute of the window.
+    k (int): Number of values.
+
+    Returns:
+    pd.DataFrame: Value, Count (upper bound) and Error, highest Count first
+    """
+    merged = merge_counters(counters)
+    lower = merged['Count'].to_numpy(dtype=np.int64)
+    error = floor - merged['Floor'].to_numpy(dtype=np.int64)
+    top = pd.DataFrame({'Value': merged['Value'].to_numpy(), 'Count': lower + error, 'Lower': lower, 'Error': error})
+    top = top.sort_values(['Count', 'Lower'], ascending=False, kind='stable').head(k)
+    return top.drop(columns='Lower').reset_index(drop=True)
+
+
+def is_exact(top, floor, k):
+    """
+    Check whether a top-k result holds the true top values with their true counts.
+
+    Parameters:
+    top (pd.DataFrame): Result of get_top_k.
+    floor (int): Floor passed to get_top_k.
+    k (int): Number of values asked for.
+
+    Returns:
+    bool: True when every Error is 0 and no value left out can count more than the last one
+    """
+    if (top['Error'] != 0).any():
+        return False
+    # A value missing from every counter occurred at most floor times
+    return floor == 0 or (len(top) == k and floor <= top['Count'].iloc[-1])
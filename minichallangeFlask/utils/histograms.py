@@ -0,0 +1,47 @@
+"""
+Value counts of single columns for the histogram views.
+
+Categorical columns are counted with np.bincount over their integer codes,
+other columns with value_counts. Every partition slice of a window is
+counted on its own and the counts are added up by value.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def count_values(values):
+    """
+    Count how often every value occurs in a column.
+
+    Parameters:
+    values (pd.Series): Column of a frame.
+
+    Returns:
+    pd.Series: Value -> count, missing values are not counted
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+        counts = pd.Series(counts, index=values.cat.categories.astype(object))
+        return counts[counts > 0]
+    counts = values.value_counts(dropna=True, sort=False)
+    counts.index = counts.index.astype(object)
+    return counts
+
+
+def merge_counts(counts):
+    """
+    Add up the value counts of several slices.
+
+    Parameters:
+    counts (list): Results of count_values.
+
+    Returns:
+    pd.Series: Value -> count (int64)
+    """
+    counts = [part for part in counts if len(part)]
+    if not counts:
+        return pd.Series(dtype=np.int64)
+    merged = pd.concat(counts)
+    return merged.groupby(level=0, sort=False).sum().astype(np.int64)
@@ -0,0 +1,171 @@
+"""
+Conditional requests and compression of responses.
+
+A response only depends on the dataset, the path and the query, so its
+strong ETag is a hash of the dataset tag (changes whenever rows are
+ingested), the path, the query with a normalized window and the negotiated
+format. It can be computed before any data is touched, so a request whose
+If-None-Match holds the ETag is answered with 304 right away.
+
+Large bodies are compressed with brotli (when the brotli package is
+installed) or gzip, whichever the client accepts. Streamed ndjson and Arrow
+responses are buffered and compressed when their page is bounded (at most
+MAX_BUFFERED_ROWS rows, see the limit parameter), larger ones are streamed
+uncompressed so their first rows go out right away. Compressed bodies are kept
+in a memory bounded cache keyed by ETag and encoding, so a hot window is
+served from there without computing or compressing anything. Every encoding
+has its own ETag (ETag-<encoding>), as strong ETags must differ between
+encodings.
+"""
+
+import os
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from utils.queryCache import QueryCache, normalize_window
+
+# Smaller bodies are sent as they are
+MIN_COMPRESS_BYTES = 1024
+
+# Streamed responses with more rows are sent uncompressed instead of being buffered
+MAX_BUFFERED_ROWS = int(os.environ.get('HPDAV_MAX_BUFFERED_ROWS', '100000'))
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/vnd.apache.arrow.stream')
+
+# Preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Response headers stored with a compressed body
+CACHED_HEADERS = ('X-Total-Count', 'X-Next-Cursor', 'X-Centrality-Exact', 'X-TopK-Exact')
+
+compressed_cache = QueryCache('compressed', int(os.environ.get('HPDAV_COMPRESSED_CACHE_MB', '64')) * 1024 * 1024)
+
+
+def get_etag(dataset_tag, path, args, output_format=None):
+    """
+    Get the ETag of the identity encoded response of a request.
+
+    Parameters:
+    dataset_tag (str): Changes whenever the data changes.
+    path (str): Request path.
+    args (MultiDict): Query parameters, the datetime window is normalized.
+    output_format (str, optional): Format negotiated from the Accept header.
+
+    Returns:
+    str: ETag value without quotes
+    """
+    start, end = normalize_window(args.get('start_datetime'), args.get('end_datetime'))
+    query = sorted((key, tuple(values)) for key, values in args.lists()
+                   if key not in ('start_datetime', 'end_datetime'))
+    key = repr((dataset_tag, path, start, end, query, output_format))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def get_encoded_etag(etag, encoding):
+    """Get the ETag of an encoding of a response, see get_etag"""
+    return etag if encoding is None else f'{etag}-{encoding}'
+
+
+def get_matching_etag(if_none_match, etag):
+    """
+    Check whether the client holds a current copy, in any encoding.
+
+    Parameters:
+    if_none_match (ETags): Parsed If-None-Match header.
+    etag (str): Result of get_etag.
+
+    Returns:
+    str or None: The ETag of the copy, to send with a 304, None when the client has none
+    """
+    if not if_none_match:
+        return None
+    for encoding in (None,) + ENCODINGS:
+        encoded = get_encoded_etag(etag, encoding)
+        if if_none_match.contains_weak(encoded):
+            return encoded
+    return None
+
+
+def get_encoding(accept_encodings):
+    """
+    Pick the compression of a response.
+
+    Parameters:
+    accept_encodings (Accept): Parsed Accept-Encoding header.
+
+    Returns:
+    str or None: 'br' or 'gzip', None to send the body as it is
+    """
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    """
+    Compress a body.
+
+    Parameters:
+    body (bytes): Response body.
+    encoding (str): 'br' or 'gzip'.
+
+    Returns:
+    bytes: Compressed body
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def is_compressible(response, rows=None):
+    """
+    Whether a response is worth compressing.
+
+    Parameters:
+    response (Response): Uncompressed response.
+    rows (int, optional): Rows in the body, streamed responses are only
+    compressed (and buffered for it) when it is at most MAX_BUFFERED_ROWS.
+
+    Returns:
+    bool: True to compress the body with get_compressed
+    """
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return False
+    if response.is_streamed:
+        # The size is unknown before the body is buffered
+        return rows is not None and rows <= MAX_BUFFERED_ROWS
+    return (response.calculate_content_length() or 0) >= MIN_COMPRESS_BYTES
+
+
+def get_compressed(etag, encoding, response):
+    """
+    Get the compressed body of a response, compressing it once per ETag and encoding.
+
+    Parameters:
+    etag (str): Result of get_etag.
+    encoding (str): 'br' or 'gzip'.
+    response (Response): Uncompressed response, a streamed body is buffered.
+
+    Returns:
+    dict: 'body', 'content_type' and the CACHED_HEADERS of the response
+    """
+    return compressed_cache.get_or_compute((etag, encoding), lambda: {
+        'body': compress(response.get_data(), encoding),
+        'content_type': response.content_type,
+        'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+    })
+
+
+def get_cached_compressed(etag, encoding):
+    """Get a compressed body stored by get_compressed, None when it is not cached"""
+    return compressed_cache.get((etag, encoding))
@@ -0,0 +1,751 @@
+"""
+Ingest of the raw CSV logs with a persistent columnar cache.
+
+Parsing the multi-day CSVs takes minutes, so the prepared rows (renamed,
+"(empty)" rows removed, compact column types from utils.schema applied,
+DateTime parsed and sorted) are written once to a ".cache" folder next to the
+CSVs. The cache is partitioned by time (one folder per day by default) with
+one Parquet file per source CSV in each partition, so the server can load only
+the partitions a query touches (see utils.partitions).
+
+A manifest records the size and mtime of every source file. Only files that
+are new or changed since the last run are parsed again. Files that only grew
+(log files being appended to) are not parsed again: the rows after the last
+parsed byte are read and merged into the partitions they fall into.
+
+New and changed files are parsed in parallel worker processes, as the IP
+parsing and typing of the chunks hold the GIL, and streamed in chunks that are
+filtered and typed right away. Appends are small and parsed in the calling
+process. Run "python -m utils.ingest" to build the caches before starting
+the server.
+"""
+
+import io
+import os
+import csv
+import zlib
+import glob
+import json
+import time
+import logging
+import shutil
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+from utils.schema import firewall_schema, intrusion_detection_schema
+from utils.ipCategories import ip_to_uint32
+from utils.metrics import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the prepared frame layout changes so old caches get rebuilt
+CACHE_VERSION = 4
+
+CACHE_DIR_NAME = '.cache'
+
+# CSV text parsed per chunk
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Bytes before the end of the parsed part of a file compared to detect appends
+TAIL_BYTES = 4096
+
+# Partitions are stored as Parquet, or pickled frames when pyarrow is missing
+CACHE_FORMAT = 'parquet' if pa is not None else 'pkl'
+
+
+def get_cache_dir(directory, dataset):
+    """
+    Get the folder holding the partition cache of a dataset.
+
+    Parameters:
+    directory (str): The directory containing the CSV files.
+    dataset (str): Name of the dataset ('firewall' or 'intrusion-detection').
+
+    Returns:
+    str: Path of the cache folder
+    """
+    return os.path.join(directory, CACHE_DIR_NAME, dataset)
+
+
+def get_partition_freq(freq=None):
+    """
+    Get the time span of one partition.
+
+    Parameters:
+    freq (str, optional): Pandas frequency, defaults to HPDAV_PARTITION_FREQ or one day.
+
+    Returns:
+    str: Pandas frequency string ('D' for days, 'h' for hours)
+    """
+    return freq or os.environ.get('HPDAV_PARTITION_FREQ', 'D')
+
+
+def get_source_fingerprint(csv_files):
+    """
+    Describe the source CSV files by size and modification time.
+
+    Parameters:
+    csv_files (list): Paths of the CSV files.
+
+    Returns:
+    dict: File name -> [size in bytes, mtime in ns]
+    """
+    fingerprint = {}
+    for file in sorted(csv_files):
+        stat = os.stat(file)
+        fingerprint[os.path.basename(file)] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def normalize_column_types(df):
+    """
+    Give every object column a single type so the frame can be stored as Parquet.
+
+    Columns holding only numbers (read as object because of mixed chunks) become
+    numeric, any other object column becomes strings with missing values kept.
+
+    Parameters:
+    df (pd.DataFrame): Frame to normalize in place.
+
+    Returns:
+    pd.DataFrame: The normalized frame.
+    """
+    for column in df.columns[df.dtypes == object]:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+def parse_datetime(values, datetime_format):
+    """
+    Parse a column of date strings.
+
+    The known format of the dataset is tried first because it is much faster
+    than letting pandas guess every value. If some rows do not follow it the
+    whole column is parsed again with inference.
+
+    Parameters:
+    values (pd.Series): Date strings.
+    datetime_format (str): Expected strptime format.
+
+    Returns:
+    pd.Series: Parsed datetimes, NaT where a value could not be parsed.
+    """
+    try:
+        return pd.to_datetime(values, format=datetime_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, errors='coerce')
+
+
+def to_unsigned(values, dtype=None):
+    """
+    Convert a column to unsigned integers.
+
+    Parameters:
+    values (pd.Series): Numbers, possibly as strings.
+    dtype (str, optional): Target type, the smallest unsigned type holding all
+    values when omitted.
+
+    Returns:
+    pd.Series: The converted column, with a nullable type if values are missing.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    if dtype is None:
+        maximum = numbers.max() if numbers.notna().any() else 0
+        dtype = next(t for t in ('uint8', 'uint16', 'uint32', 'uint64')
+                     if maximum <= np.iinfo(t).max)
+    if numbers.isna().any():
+        # Nullable integer types are spelled with a capital letter
+        return numbers.astype(dtype.capitalize())
+    return numbers.astype(dtype)
+
+
+def apply_column_types(df, schema):
+    """
+    Apply the compact column types of a dataset schema.
+
+    Rows whose IP columns do not hold an IPv4 address are removed, like the
+    "(empty)" rows, because they cannot be stored as uint32.
+
+    Parameters:
+    df (pd.DataFrame): Renamed and filtered frame.
+    schema (dict): Dataset schema from utils.schema.
+
+    Returns:
+    pd.DataFrame: The typed frame.
+    """
+    valid_rows = np.ones(len(df), dtype=bool)
+    for column, column_type in schema['column_types'].items():
+        if column not in df.columns:
+            continue
+        if column_type == 'category':
+            # Categories must have one type in every file, so store them as text
+            values = df[column]
+            df[column] = values.where(values.isna(), values.astype(str)).astype('category')
+        elif column_type == 'ipv4':
+            ip_ints, valid = ip_to_uint32(df[column].to_numpy())
+            df[column] = ip_ints
+            valid_rows &= valid
+        elif column_type == 'port':
+            df[column] = to_unsigned(df[column], 'uint16')
+        elif column_type == 'unsigned':
+            df[column] = to_unsigned(df[column])
+
+    if not valid_rows.all():
+        logger.info("Dropped %d rows without a valid IPv4 address", (~valid_rows).sum())
+        df = df[valid_rows].copy()
+    return df
+
+
+def concat_frames(data_frames):
+    """
+    Concatenate prepared frames without losing their categorical columns.
+
+    pd.concat turns categoricals with different categories into plain object
+    columns, so the categories of every frame are unified first.
+
+    Parameters:
+    data_frames (list): Prepared frames with the same columns.
+
+    Returns:
+    pd.DataFrame: The concatenated frame.
+    """
+    # Work on shallow copies, the inputs may be cached partitions shared with other requests
+    data_frames = [df.copy(deep=False) for df in data_frames]
+    if len(data_frames) > 1:
+        for column in data_frames[0].columns:
+            if not all(isinstance(df[column].dtype, pd.CategoricalDtype)
+                       for df in data_frames if column in df.columns):
+                continue
+            categories = union_categoricals(
+                [df[column] for df in data_frames if column in df.columns]).categories
+            for df in data_frames:
+                if column in df.columns:
+                    df[column] = df[column].cat.set_categories(categories)
+    return pd.concat(data_frames, ignore_index=True)
+
+
+def prepare_frame(df, schema):
+    """
+    Rename, filter and type a raw CSV frame.
+
+    Parameters:
+    df (pd.DataFrame): Frame as read from the CSV.
+    schema (dict): Dataset schema from utils.schema.
+
+    Returns:
+    pd.DataFrame: The prepared frame.
+    """
+    df = df.rename(columns=schema['field_mapping'])
+
+    # Remove rows with "(empty)" values
+    mask = pd.Series(True, index=df.index)
+    for column in schema['empty_filter_columns']:
+        mask &= df[column] != '(empty)'
+    df = df[mask].copy()
+
+    # Rows without a valid time can never match a time window
+    df['DateTime'] = parse_datetime(df['DateTime'], schema['datetime_format'])
+    df = df.dropna(subset=['DateTime'])
+
+    df = apply_column_types(df, schema)
+    return normalize_column_types(df)
+
+
+def sort_by_datetime(df):
+    """
+    Sort a prepared frame by time, so time windows can be found by binary search.
+
+    Parameters:
+    df (pd.DataFrame): Prepared frame.
+
+    Returns:
+    pd.DataFrame: The frame sorted by DateTime with a fresh index.
+    """
+    if df.empty:
+        return df
+    return df.sort_values('DateTime', kind='mergesort', ignore_index=True)
+
+
+def iter_csv_chunks(file, chunk_bytes=CHUNK_BYTES):
+    """
+    Stream a CSV file as frames of raw text columns.
+
+    With pyarrow the file is parsed by its multi-threaded streaming reader,
+    otherwise by the chunked pandas reader. Every value is read as text, so all
+    chunks look the same and the schema decides the final types.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    chunk_bytes (int): Approximate size of the CSV text behind each chunk.
+
+    Returns:
+    generator: pd.DataFrame per chunk
+    """
+    if pa_csv is not None:
+        with open(file, newline='') as f:
+            header = next(csv.reader(f), [])
+        reader = pa_csv.open_csv(
+            file,
+            read_options=pa_csv.ReadOptions(block_size=chunk_bytes, use_threads=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                strings_can_be_null=True))
+        for batch in reader:
+            yield batch.to_pandas()
+    else:
+        # Roughly 150 bytes per log line
+        yield from pd.read_csv(file, dtype=str, chunksize=max(chunk_bytes // 150, 1000))
+
+
+def read_csv_file(file, schema):
+    """
+    Read and prepare one CSV file chunk by chunk.
+
+    Each chunk is filtered and typed before the next one is read, so only the
+    compact prepared rows are kept in memory.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    schema (dict): Dataset schema from utils.schema.
+
+    Returns:
+    pd.DataFrame: The prepared rows of the file.
+    """
+    data_frames = [prepare_frame(chunk, schema) for chunk in iter_csv_chunks(file)]
+    if not data_frames:
+        return pd.DataFrame()
+    return concat_frames(data_frames)
+
+
+def get_tail_checksum(file, offset):
+    """
+    Checksum the bytes just before an offset of a file.
+
+    Parameters:
+    file (str): Path of the file.
+    offset (int): End of the checked bytes.
+
+    Returns:
+    int: CRC32 of the last TAIL_BYTES before offset, None if they don't end with a
+    line break (the parsed part ended in the middle of a line)
+    """
+    with open(file, 'rb') as f:
+        f.seek(max(0, offset - TAIL_BYTES))
+        tail = f.read(min(offset, TAIL_BYTES))
+    if not tail.endswith(b'\n'):
+        return None
+    return zlib.crc32(tail)
+
+
+def is_appended(file, entry, size):
+    """
+    Check whether a file only grew since it was parsed.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    entry (dict): Manifest entry of the file, None for a new file.
+    size (int): Current size of the file.
+
+    Returns:
+    bool: True when the parsed bytes are unchanged and new bytes follow them
+    """
+    if not entry or entry.get('tail') is None or size <= entry.get('offset', size):
+        return False
+    return get_tail_checksum(file, entry['offset']) == entry['tail']
+
+
+def read_csv_range(file, start, end, schema):
+    """
+    Read and prepare the complete lines within a byte range of a CSV file.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    start (int): Offset of the first line, after the header.
+    end (int): End of the range, a trailing incomplete line is left out.
+    schema (dict): Dataset schema from utils.schema.
+
+    Returns:
+    tuple: (prepared rows, offset after the last complete line)
+    """
+    with open(file, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    data = data[:data.rfind(b'\n') + 1]
+    if not data:
+        return pd.DataFrame(), start
+    df = pd.read_csv(io.BytesIO(header + data), dtype=str)
+    return prepare_frame(df, schema), start + len(data)
+
+
+def get_ingest_workers(workers=None):
+    """
+    Get the number of files parsed at the same time.
+
+    Parameters:
+    workers (int, optional): Explicit number, defaults to HPDAV_INGEST_WORKERS or the CPU count.
+
+    Returns:
+    int: Number of worker processes
+    """
+    if workers is None:
+        workers = int(os.environ.get('HPDAV_INGEST_WORKERS', os.cpu_count() or 1))
+    return max(1, workers)
+
+
+def write_frame(df, path):
+    """
+    Write a frame to the cache, under a temporary name first so a crash never
+    leaves a half written file behind.
+
+    Parameters:
+    df (pd.DataFrame): Frame to store.
+    path (str): Destination path.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if CACHE_FORMAT == 'parquet':
+        df.to_parquet(path + '.tmp', index=False)
+    else:
+        df.to_pickle(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def read_frame(path):
+    """
+    Read a frame written by write_frame.
+
+    Parameters:
+    path (str): Path of the cached file.
+
+    Returns:
+    pd.DataFrame: The stored frame.
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_pickle(path)
+
+
+def get_part_path(cache_dir, partition, file_name):
+    """Path of the rows of one source file within one partition"""
+    return os.path.join(cache_dir, partition, f'{file_name}.{CACHE_FORMAT}')
+
+
+def split_partitions(df, freq):
+    """
+    Split a frame sorted by DateTime into time partitions.
+
+    Parameters:
+    df (pd.DataFrame): Prepared frame sorted by DateTime.
+    freq (str): Time span of one partition.
+
+    Returns:
+    generator: (partition name, frame) pairs
+    """
+    if df.empty:
+        return
+    starts = df['DateTime'].dt.floor(freq)
+    # The frame is sorted, so each partition is a contiguous block of rows
+    boundaries = np.flatnonzero(starts.to_numpy()[1:] != starts.to_numpy()[:-1]) + 1
+    for begin, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(df)]):
+        yield starts.iloc[begin].strftime('%Y-%m-%dT%H%M'), df.iloc[begin:end]
+
+
+def ingest_file(file, cache_dir, schema, freq):
+    """
+    Parse one CSV file and write its rows into the partition cache.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    cache_dir (str): Folder of the partition cache.
+    schema (dict): Dataset schema from utils.schema.
+    freq (str): Time span of one partition.
+
+    Returns:
+    dict: Partition name -> {'rows', 'start', 'end'} for the rows of this file
+    """
+    file_name = os.path.basename(file)
+    df = sort_by_datetime(read_csv_file(file, schema))
+
+    partitions = {}
+    for partition, part in split_partitions(df, freq):
+        write_frame(part.reset_index(drop=True), get_part_path(cache_dir, partition, file_name))
+        partitions[partition] = {
+            'rows': len(part),
+            'start': part['DateTime'].iloc[0].isoformat(),
+            'end': part['DateTime'].iloc[-1].isoformat(),
+        }
+    return partitions
+
+
+def append_file(file, entry, cache_dir, schema, freq, size):
+    """
+    Parse the rows appended to a CSV file and merge them into the partition cache.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    entry (dict): Manifest entry of the file, see is_appended.
+    cache_dir (str): Folder of the partition cache.
+    schema (dict): Dataset schema from utils.schema.
+    freq (str): Time span of one partition.
+    size (int): Current size of the file.
+
+    Returns:
+    tuple: (partitions of the file as in ingest_file, offset after the parsed rows)
+    """
+    file_name = os.path.basename(file)
+    df, offset = read_csv_range(file, entry['offset'], size, schema)
+    df = sort_by_datetime(df)
+
+    partitions = {name: dict(info) for name, info in entry['partitions'].items()}
+    for partition, part in split_partitions(df, freq):
+        path = get_part_path(cache_dir, partition, file_name)
+        if partition in partitions and os.path.exists(path):
+            part = sort_by_datetime(normalize_column_types(concat_frames([read_frame(path), part])))
+        write_frame(part.reset_index(drop=True), path)
+        partitions[partition] = {
+            'rows': len(part),
+            'start': part['DateTime'].iloc[0].isoformat(),
+            'end': part['DateTime'].iloc[-1].isoformat(),
+        }
+    return partitions, offset
+
+
+def read_manifest(cache_dir):
+    """Read the manifest of a partition cache, None if it is missing or unreadable"""
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(cache_dir, manifest):
+    """Atomically replace the manifest of a partition cache"""
+    path = os.path.join(cache_dir, 'manifest.json')
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+def remove_file_parts(cache_dir, file_name, partitions):
+    """Delete the cached rows of one source file"""
+    for partition in partitions:
+        path = get_part_path(cache_dir, partition, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@contextmanager
+def cache_lock(directory, dataset):
+    """
+    Hold the lock of a partition cache, so server processes sharing the cache
+    (see utils.sharedStore) never ingest the same rows twice.
+
+    Parameters:
+    directory (str): The directory containing the CSV files.
+    dataset (str): Name of the dataset.
+    """
+    if fcntl is None:
+        # No file locks (Windows), only the single process dev server runs there
+        yield
+        return
+    os.makedirs(os.path.join(directory, CACHE_DIR_NAME), exist_ok=True)
+    with open(os.path.join(directory, CACHE_DIR_NAME, f'{dataset}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def update_partition_cache(directory, dataset, schema, freq=None, workers=None, rebuild=False):
+    """
+    Bring the partition cache of a dataset up to date with its CSV files.
+
+    New and changed files are parsed in parallel, rows of changed and deleted
+    files are removed. Of files that were appended to only the new rows are
+    parsed. Files that did not change are not touched.
+
+    Parameters:
+    directory (str): The directory containing the CSV files.
+    dataset (str): Name of the dataset, used for the cache folder.
+    schema (dict): Dataset schema from utils.schema.
+    freq (str, optional): Time span of one partition.
+    workers (int, optional): Number of files parsed at the same time.
+    rebuild (bool): Throw the existing cache away.
+
+    Returns:
+    dict: The manifest, see get_partition_index for the partitions it describes
+    """
+    with cache_lock(directory, dataset):
+        return refresh_partition_cache(directory, dataset, schema, get_partition_freq(freq), workers, rebuild)
+
+
+def update_file(file, entry, cache_dir, schema, freq, fingerprint):
+    """
+    Parse a new or appended CSV file into the partition cache, run in a worker process.
+
+    Parameters:
+    file (str): Path of the CSV file.
+    entry (dict or None): Manifest entry of an appended file, None to parse the whole file.
+    cache_dir (str): Folder of the partition cache.
+    schema (dict): Dataset schema from utils.schema.
+    freq (str): Time span of one partition.
+    fingerprint (tuple): Size and mtime of the file, see get_source_fingerprint.
+
+    Returns:
+    dict: The new manifest entry of the file
+    """
+    size = fingerprint[0]
+    ingested = time.time_ns()
+    if entry is not None:
+        partitions, offset = append_file(file, entry, cache_dir, schema, freq, size)
+        if offset == entry['offset'] or not partitions:
+            # Only an incomplete line was added, the partitions keep their version
+            ingested = entry.get('ingested', 0)
+    else:
+        partitions, offset = ingest_file(file, cache_dir, schema, freq), size
+    return {
+        # An incomplete last line keeps the file stale until it is completed
+        'fingerprint': fingerprint if offset == size else None,
+        'partitions': partitions,
+        'offset': offset,
+        'tail': get_tail_checksum(file, offset),
+        'ingested': ingested,
+    }
+
+
+def refresh_partition_cache(directory, dataset, schema, freq, workers, rebuild):
+    """Update the partition cache, see update_partition_cache, the cache lock must be held"""
+    cache_dir = get_cache_dir(directory, dataset)
+    layout = {'version': CACHE_VERSION, 'freq': freq, 'format': CACHE_FORMAT}
+
+    manifest = read_manifest(cache_dir)
+    if rebuild or manifest is None or any(manifest.get(k) != v for k, v in layout.items()):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        manifest = dict(layout, files={})
+
+    csv_files = sorted(glob.glob(os.path.join(directory, '*.csv')))
+    fingerprint = get_source_fingerprint(csv_files)
+    files = manifest['files']
+
+    stale = [file for file in csv_files
+             if files.get(os.path.basename(file), {}).get('fingerprint') != fingerprint[os.path.basename(file)]]
+    removed = [name for name in files if name not in fingerprint]
+    if not stale and not removed:
+        return manifest
+
+    appended = [file for file in stale
+                if is_appended(file, files.get(os.path.basename(file)), fingerprint[os.path.basename(file)][0])]
+    for file_name in removed + [os.path.basename(file) for file in stale if file not in appended]:
+        if file_name in files:
+            remove_file_parts(cache_dir, file_name, files.pop(file_name)['partitions'])
+
+    if stale:
+        logger.info("Ingesting %d new and %d appended %s file(s)", len(stale) - len(appended), len(appended), dataset)
+        tasks = [(file, files.get(os.path.basename(file)) if file in appended else None, cache_dir, schema, freq,
+                  fingerprint[os.path.basename(file)]) for file in stale]
+        workers = min(get_ingest_workers(workers), len(stale) - len(appended))
+        if workers > 1:
+            # Spawned, forking the threads of a running server could deadlock the children
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=configure_logging) as executor:
+                entries = list(executor.map(update_file, *zip(*tasks)))
+        else:
+            entries = [update_file(*task) for task in tasks]
+        for file, entry in zip(stale, entries):
+            files[os.path.basename(file)] = entry
+
+    write_manifest(cache_dir, manifest)
+    return manifest
+
+
+def get_partition_index(manifest):
+    """
+    Describe the partitions of a cache.
+
+    Parameters:
+    manifest (dict): Manifest from update_partition_cache.
+
+    Returns:
+    list: One dict per partition sorted by time, with 'name', 'start', 'end'
+    (pd.Timestamp), 'rows', 'files' (source files with rows in it) and
+    'version' (changes whenever rows of the partition are ingested)
+    """
+    partitions = {}
+    for file_name, entry in manifest['files'].items():
+        for name, info in entry['partitions'].items():
+            partition = partitions.setdefault(name, {
+                'name': name, 'start': pd.Timestamp(info['start']), 'end': pd.Timestamp(info['end']),
+                'rows': 0, 'files': [], 'version': ()})
+            partition['start'] = min(partition['start'], pd.Timestamp(info['start']))
+            partition['end'] = max(partition['end'], pd.Timestamp(info['end']))
+            partition['rows'] += info['rows']
+            partition['files'].append(file_name)
+            partition['version'] += ((file_name, entry.get('ingested', 0)),)
+    return sorted(partitions.values(), key=lambda partition: partition['start'])
+
+
+def read_partition(directory, dataset, partition):
+    """
+    Load one partition from the cache.
+
+    Parameters:
+    directory (str): The directory containing the CSV files.
+    dataset (str): Name of the dataset.
+    partition (dict): Entry of get_partition_index.
+
+    Returns:
+    pd.DataFrame: The rows of the partition sorted by DateTime
+    """
+    cache_dir = get_cache_dir(directory, dataset)
+    parts = [read_frame(get_part_path(cache_dir, partition['name'], file_name))
+             for file_name in sorted(partition['files'])]
+    if len(parts) == 1:
+        return parts[0]
+    return sort_by_datetime(normalize_column_types(concat_frames(parts)))
+
+
+def main():
+    """Build the ingest caches ahead of serving"""
+    parser = argparse.ArgumentParser(description='Parse the firewall and IDS CSVs and build the partition caches.')
+    parser.add_argument('--firewall-dir', default='./data/firewall/')
+    parser.add_argument('--ids-dir', default='./data/intrusion-detection/')
+    parser.add_argument('--workers', type=int, default=None, help='Number of files parsed at the same time')
+    parser.add_argument('--freq', default=None, help="Time span of one partition ('D' or 'h')")
+    parser.add_argument('--rebuild', action='store_true', help='Ignore existing caches')
+    args = parser.parse_args()
+    configure_logging()
+
+    for directory, dataset, schema in ((args.firewall_dir, 'firewall', firewall_schema),
+                                       (args.ids_dir, 'intrusion-detection', intrusion_detection_schema)):
+        start = time.perf_counter()
+        manifest = update_partition_cache(directory, dataset, schema, args.freq, args.workers, args.rebuild)
+        index = get_partition_index(manifest)
+        print(f"{dataset}: {sum(p['rows'] for p in index)} rows in {len(index)} partitions, "
+              f"{time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
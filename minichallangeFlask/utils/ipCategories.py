@@ -0,0 +1,139 @@
+"""
+Vectorized IP categorization.
+
+IPv4 addresses are handled as uint32 numbers and every category of
+create_ip_categories() is compiled into a sorted table of disjoint
+[start, end] intervals. Checking the membership of all IPs in a category is
+then one searchsorted over the table instead of a Python loop per address.
+"""
+
+import numpy as np
+import pandas as pd
+
+IPV4_PATTERN = r'^\s*(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})\s*$'
+
+
+def ip_to_uint32(values):
+    """
+    Convert dotted IPv4 strings to integers.
+
+    Parameters:
+    values (array-like): IPv4 address strings.
+
+    Returns:
+    tuple: (np.ndarray of uint32, np.ndarray of bool telling which values were valid IPv4)
+    """
+    # Logs repeat the same few thousand addresses, so only parse the unique ones
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    octets = pd.Series(uniques, dtype=object).astype(str).str.extract(IPV4_PATTERN)
+    octets = octets.apply(pd.to_numeric).to_numpy(dtype=np.float64).reshape(-1, 4)
+
+    unique_valid = ~np.isnan(octets).any(axis=1) & (np.nan_to_num(octets) <= 255).all(axis=1)
+    octets = np.where(unique_valid[:, None], octets, 0).astype(np.uint32)
+    unique_ints = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+    # Missing values get code -1 from factorize
+    missing = codes < 0
+    codes = np.where(missing, 0, codes)
+    if len(uniques) == 0:
+        return np.zeros(len(codes), dtype=np.uint32), np.zeros(len(codes), dtype=bool)
+    return unique_ints[codes], unique_valid[codes] & ~missing
+
+
+def uint32_to_ip(values):
+    """
+    Convert integers back to dotted IPv4 strings.
+
+    Parameters:
+    values (array-like): IPv4 addresses as integers.
+
+    Returns:
+    np.ndarray: IPv4 address strings (object dtype).
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=np.uint32))
+    uniques = np.asarray(uniques, dtype=np.uint32)
+    rendered = np.array([
+        f'{a}.{b}.{c}.{d}' for a, b, c, d in zip(
+            uniques >> 24, (uniques >> 16) & 255, (uniques >> 8) & 255, uniques & 255)
+    ], dtype=object)
+    return rendered[codes] if len(rendered) else np.array([], dtype=object)
+
+
+def compile_rules(rules):
+    """
+    Compile the rules of one category into sorted, disjoint intervals.
+
+    Parameters:
+    rules (dict): Category rules as defined in create_ip_categories.
+
+    Returns:
+    tuple: (np.ndarray of interval starts, np.ndarray of interval ends), both int64
+    """
+    intervals = []
+    for ip in rules.get('ips', set()) | rules.get('single_ips', set()):
+        intervals.append((int(ip), int(ip)))
+    for network in rules.get('networks', []):
+        intervals.append((int(network.network_address), int(network.broadcast_address)))
+    for start, end in rules.get('ranges', []):
+        intervals.append((int(start), int(end)))
+
+    # Merge overlapping and adjacent intervals so the starts are strictly increasing
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    table = np.array(merged, dtype=np.int64).reshape(-1, 2)
+    return table[:, 0], table[:, 1]
+
+
+def compile_ip_categories(categories):
+    """
+    Compile every category into an interval table.
+
+    Parameters:
+    categories (dict): Categories as returned by create_ip_categories.
+
+    Returns:
+    dict: Category name -> (interval starts, interval ends)
+    """
+    return {category: compile_rules(rules) for category, rules in categories.items()}
+
+
+def match_intervals(ips, table):
+    """
+    Check which IPs fall into an interval table.
+
+    Parameters:
+    ips (np.ndarray): IPv4 addresses as integers.
+    table (tuple): (interval starts, interval ends) from compile_rules.
+
+    Returns:
+    np.ndarray: Boolean mask, True where the IP is inside one of the intervals.
+    """
+    starts, ends = table
+    ips = np.asarray(ips, dtype=np.int64)
+    if len(starts) == 0:
+        return np.zeros(len(ips), dtype=bool)
+
+    # Index of the last interval starting at or before each IP
+    index = np.searchsorted(starts, ips, side='right') - 1
+    return (index >= 0) & (ips <= ends[np.maximum(index, 0)])
+
+
+def categorize_ips(ips, compiled_categories):
+    """
+    Compute the category masks of a list of IPs.
+
+    Parameters:
+    ips (np.ndarray): IPv4 addresses as integers.
+    compiled_categories (dict): Result of compile_ip_categories.
+
+    Returns:
+    dict: Category name -> boolean mask over ips
+    """
+    return {category: match_intervals(ips, table)
+            for category, table in compiled_categories.items()}
+
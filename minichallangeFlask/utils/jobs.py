@@ -0,0 +1,270 @@
+"""
+Asynchronous query jobs for wide windows.
+
+A multi-day query would hold a request thread for its whole run and time out
+in the browser. Submitted as a job it runs on a small thread pool instead:
+the client gets an id back right away, polls the progress (partitions done),
+can cancel it and fetches the result page by page once it is done.
+
+The pool has a fixed number of threads and a limit on the jobs waiting for
+one, so heavy queries can't take every thread of the server away from the
+interactive requests. Submitting beyond the limit fails with QueueFullError.
+
+Every job has a folder under the job directory (HPDAV_JOB_DIR) holding its
+status, a cancel marker and the result (Arrow IPC when pyarrow is installed,
+pickle otherwise), so with several server processes (see gunicorn.conf.py)
+any of them answers for a job started by another. The pool and its limits
+are per process. Finished jobs are removed after HPDAV_JOB_TTL seconds.
+"""
+
+import os
+import re
+import json
+import logging
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.queryCache import QueryCache
+from utils.sharedStore import write_shared, attach_shared, pa
+
+logger = logging.getLogger(__name__)
+
+STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+STATUS_FILE = 'status.json'
+CANCEL_FILE = 'cancel'
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is full"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+def get_job_dir(directory=None):
+    """Get the folder of the job folders, defaults to HPDAV_JOB_DIR"""
+    return directory or os.environ.get('HPDAV_JOB_DIR', './data/.jobs')
+
+
+def write_json(path, data):
+    """Write JSON atomically, readers never see half a file"""
+    temporary = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def get_result_path(path):
+    """Get the result file of a job folder"""
+    return os.path.join(path, 'result.arrow' if pa is not None else 'result.pkl')
+
+
+def write_result(df, path):
+    """Store the result of a job in its folder"""
+    if pa is not None:
+        write_shared(df, get_result_path(path))
+    else:
+        df.to_pickle(get_result_path(path))
+
+
+def read_result(path):
+    """Read the result of a job, memory mapped when it was written as Arrow"""
+    if pa is not None:
+        return attach_shared(get_result_path(path))
+    return pd.read_pickle(get_result_path(path))
+
+
+class Job:
+    """
+    A job folder and the status in it.
+
+    Parameters:
+    path (str): Folder of the job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.id = os.path.basename(path)
+        self._status = None
+
+    @property
+    def status_path(self):
+        return os.path.join(self.path, STATUS_FILE)
+
+    def read_status(self):
+        """
+        Read the status of the job.
+
+        Returns:
+        dict: id, query, params, state, progress, rows, error and the submitted,
+        started and finished times (seconds since the epoch), None when the job doesn't exist
+        """
+        try:
+            with open(self.status_path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        status['cancel_requested'] = self.is_cancel_requested()
+        return status
+
+    def write_status(self, **changes):
+        """Update the status, only called by the thread owning the job"""
+        if self._status is None:
+            self._status = self.read_status() or {}
+        self._status.update(changes)
+        self._status.pop('cancel_requested', None)
+        write_json(self.status_path, self._status)
+
+    def is_cancel_requested(self):
+        """Whether cancel was called, possibly by another process"""
+        return os.path.exists(os.path.join(self.path, CANCEL_FILE))
+
+    def report_progress(self, done, total):
+        """
+        Record the progress of a running job, see PartitionedDataset.iter_slices.
+
+        Parameters:
+        done (int): Partitions done.
+        total (int): Partitions of the query.
+        """
+        if self.is_cancel_requested():
+            raise JobCancelled()
+        self.write_status(progress={'done': done, 'total': total})
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded thread pool and keeps their folders.
+
+    Parameters:
+    directory (str, optional): Folder of the job folders, see get_job_dir.
+    workers (int, optional): Jobs running at once, defaults to HPDAV_JOB_WORKERS (2).
+    max_queued (int, optional): Jobs waiting for a thread, defaults to HPDAV_JOB_QUEUE (8).
+    ttl (float, optional): Seconds a finished job is kept, defaults to HPDAV_JOB_TTL (3600).
+    """
+
+    def __init__(self, directory=None, workers=None, max_queued=None, ttl=None):
+        self.directory = get_job_dir(directory)
+        self.workers = workers or int(os.environ.get('HPDAV_JOB_WORKERS', '2'))
+        self.max_queued = max_queued if max_queued is not None else int(os.environ.get('HPDAV_JOB_QUEUE', '8'))
+        self.ttl = ttl if ttl is not None else float(os.environ.get('HPDAV_JOB_TTL', '3600'))
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        # Results being paged through, memory mapped so they cost little
+        self.result_cache = QueryCache('job-results', int(os.environ.get('HPDAV_JOB_CACHE_MB', '256')) * 1024 * 1024)
+
+    def get_job(self, job_id):
+        """Get a job by id, None for ids that can't be jobs"""
+        if not isinstance(job_id, str) or not JOB_ID_PATTERN.match(job_id):
+            return None
+        return Job(os.path.join(self.directory, job_id))
+
+    def submit(self, query, params, run):
+        """
+        Queue a job.
+
+        Parameters:
+        query (str): Name of the query, reported in the status.
+        params (dict): Parameters of the query, reported in the status.
+        run (callable): Called with a progress callback (see Job.report_progress),
+        returns the result DataFrame.
+
+        Returns:
+        dict: Status of the queued job
+        """
+        self.remove_expired()
+        with self._lock:
+            active = sum(not future.done() for future in self._futures.values())
+            if active >= self.workers + self.max_queued:
+                raise QueueFullError(f"{active} jobs are queued or running, retry later")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hpdav-job')
+
+            job = Job(os.path.join(self.directory, uuid.uuid4().hex))
+            os.makedirs(job.path)
+            job.write_status(id=job.id, query=query, params=params, state='queued', progress=None, rows=None,
+                             error=None, submitted=time.time(), started=None, finished=None)
+            self._futures = {job_id: future for job_id, future in self._futures.items() if not future.done()}
+            self._futures[job.id] = self._executor.submit(self._run, job, run)
+        logger.info("Queued job %s: %s %s", job.id, query, params)
+        return job.read_status()
+
+    def _run(self, job, run):
+        """Run a job on a pool thread and record how it ended"""
+        if job.is_cancel_requested():
+            job.write_status(state='cancelled', finished=time.time())
+            return
+        job.write_status(state='running', started=time.time())
+        try:
+            result = run(job.report_progress)
+            write_result(result, job.path)
+            job.write_status(state='done', rows=len(result), finished=time.time())
+        except JobCancelled:
+            job.write_status(state='cancelled', finished=time.time())
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            job.write_status(state='failed', error=str(e), finished=time.time())
+
+    def get_status(self, job_id):
+        """Get the status of a job, see Job.read_status, None when it doesn't exist"""
+        job = self.get_job(job_id)
+        return job.read_status() if job is not None else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. A queued job of this process is dropped at once, a running
+        one (or one of another process) stops before its next partition.
+
+        Parameters:
+        job_id (str): Id of the job.
+
+        Returns:
+        dict: Status of the job, None when it doesn't exist
+        """
+        job = self.get_job(job_id)
+        status = job.read_status() if job is not None else None
+        if status is None or status['state'] in FINISHED_STATES:
+            return status
+
+        open(os.path.join(job.path, CANCEL_FILE), 'w').close()
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            job.write_status(state='cancelled', finished=time.time())
+        return job.read_status()
+
+    def get_result(self, job_id):
+        """
+        Get the result of a finished job.
+
+        Parameters:
+        job_id (str): Id of a job in state 'done'.
+
+        Returns:
+        pd.DataFrame: The result
+        """
+        job = self.get_job(job_id)
+        return self.result_cache.get_or_compute((job_id,), lambda: read_result(job.path))
+
+    def remove_expired(self):
+        """Remove the folders of jobs that finished more than ttl seconds ago"""
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        for job_id in os.listdir(self.directory):
+            job = self.get_job(job_id)
+            status = job.read_status() if job is not None else None
+            if status and status['state'] in FINISHED_STATES and now - (status['finished'] or now) > self.ttl:
+                self.result_cache.invalidate(lambda key: key[0] == job_id)
+                shutil.rmtree(job.path, ignore_errors=True)
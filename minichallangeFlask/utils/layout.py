@@ -0,0 +1,228 @@
+"""
+Force directed layout of communication graphs.
+
+A Fruchterman-Reingold layout with all forces computed as array operations:
+exact pairwise repulsion in blocks for small graphs, and for larger graphs
+repulsion from the mass centres of a grid of cells (a one level Barnes-Hut
+approximation). Nodes without a position start at a point derived from a
+hash of their id, so without a memory the same graph always gives the same
+layout.
+
+Positions of computed layouts are remembered per node id (LayoutMemory), so
+the next layout, e.g. of an adjacent window or after expanding a super-node,
+starts warm: known nodes start where they were, new nodes start next to
+their parent, and fewer, smaller steps are needed. A layout started from a
+memory depends on the layouts computed before it, so the same graph can come
+out differently depending on the history.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Iterations and initial step length of a layout starting from scratch or warm
+COLD_ITERATIONS = 60
+WARM_ITERATIONS = 20
+COLD_TEMPERATURE = 0.1
+WARM_TEMPERATURE = 0.02
+
+# Graphs with more nodes use the grid approximation for the repulsion
+EXACT_REPULSION_LIMIT = 600
+GRID_CELLS = 16
+
+# Rows of the pairwise distance blocks, bounds the memory of a step
+BLOCK_ROWS = 512
+
+# Pull towards the centre, keeps disconnected parts on the canvas
+GRAVITY = 0.05
+
+# Offset of new nodes from their parent
+CHILD_OFFSET = 0.02
+
+
+def hash_positions(ids):
+    """
+    Get a deterministic pseudo random position in the unit square per id.
+
+    Parameters:
+    ids (iterable): Node ids (strings).
+
+    Returns:
+    np.ndarray: n x 2 positions
+    """
+    return np.array([[zlib.crc32(f'{node_id}:x'.encode()) / 2 ** 32,
+                      zlib.crc32(f'{node_id}:y'.encode()) / 2 ** 32] for node_id in ids]).reshape(-1, 2)
+
+
+class LayoutMemory:
+    """
+    Thread safe LRU store of the last position of every node id.
+
+    Parameters:
+    max_nodes (int): Positions kept, least recently used ones are dropped above it.
+    """
+
+    def __init__(self, max_nodes=200000):
+        self.max_nodes = max_nodes
+        self._positions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ids):
+        """
+        Get the remembered positions of nodes.
+
+        Parameters:
+        ids (list): Node ids.
+
+        Returns:
+        tuple: (n x 2 positions, NaN where unknown; boolean mask of the known ones)
+        """
+        positions = np.full((len(ids), 2), np.nan)
+        with self._lock:
+            for i, node_id in enumerate(ids):
+                position = self._positions.get(node_id)
+                if position is not None:
+                    self._positions.move_to_end(node_id)
+                    positions[i] = position
+        return positions, ~np.isnan(positions[:, 0])
+
+    def update(self, ids, positions):
+        """Remember the positions of nodes"""
+        with self._lock:
+            for node_id, position in zip(ids, positions):
+                self._positions[node_id] = (float(position[0]), float(position[1]))
+                self._positions.move_to_end(node_id)
+            while len(self._positions) > self.max_nodes:
+                self._positions.popitem(last=False)
+
+    def clear(self):
+        """Forget every position"""
+        with self._lock:
+            self._positions.clear()
+
+
+def get_initial_positions(ids, parents, memory):
+    """
+    Get the start positions of a layout.
+
+    Parameters:
+    ids (list): Node ids.
+    parents (list): Id of the super-node of every node, or None.
+    memory (LayoutMemory): Remembered positions, may be None.
+
+    Returns:
+    tuple: (n x 2 positions, fraction of nodes that had a remembered position)
+    """
+    positions = hash_positions(ids)
+    if memory is None or not len(ids):
+        return positions, 0.0
+
+    known_positions, known = memory.get(ids)
+    positions[known] = known_positions[known]
+
+    # New children of an expanded node start around the position of the parent
+    unknown = np.flatnonzero(~known)
+    parent_ids = [parents[i] for i in unknown if parents[i] is not None]
+    if parent_ids:
+        parent_positions, parent_known = memory.get(parent_ids)
+        with_parent = [i for i in unknown if parents[i] is not None]
+        for i, position, found in zip(with_parent, parent_positions, parent_known):
+            if found:
+                positions[i] = position + (positions[i] - 0.5) * 2 * CHILD_OFFSET
+    return positions, known.mean()
+
+
+def get_repulsion(positions, k):
+    """
+    Compute the repulsive displacement k^2 / distance between all nodes.
+
+    Parameters:
+    positions (np.ndarray): n x 2 positions.
+    k (float): Ideal edge length.
+
+    Returns:
+    np.ndarray: n x 2 displacements
+    """
+    n = len(positions)
+    x, y = positions[:, 0], positions[:, 1]
+    if n <= EXACT_REPULSION_LIMIT:
+        others_x, others_y, weights, floor = x, y, None, 1e-9
+    else:
+        # Grid approximation: every node is pushed by the mass centre of every cell
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        cells = np.minimum(((positions - low) / np.maximum(high - low, 1e-9) * GRID_CELLS).astype(np.int64),
+                           GRID_CELLS - 1)
+        cell = cells[:, 0] * GRID_CELLS + cells[:, 1]
+        mass = np.bincount(cell, minlength=GRID_CELLS ** 2).astype(np.float64)
+        occupied = mass > 0
+        weights = mass[occupied]
+        others_x = np.bincount(cell, x, GRID_CELLS ** 2)[occupied] / weights
+        others_y = np.bincount(cell, y, GRID_CELLS ** 2)[occupied] / weights
+        floor = k * k * 1e-2
+
+    displacement = np.zeros_like(positions)
+    for start in range(0, n, BLOCK_ROWS):
+        dx = x[start:start + BLOCK_ROWS, None] - others_x[None, :]
+        dy = y[start:start + BLOCK_ROWS, None] - others_y[None, :]
+        force = (k * k) / np.maximum(dx * dx + dy * dy, floor)
+        if weights is not None:
+            force *= weights[None, :]
+        displacement[start:start + BLOCK_ROWS, 0] = (dx * force).sum(axis=1)
+        displacement[start:start + BLOCK_ROWS, 1] = (dy * force).sum(axis=1)
+    return displacement
+
+
+def compute_layout(ids, sources, targets, parents=None, memory=None):
+    """
+    Lay out a graph in the unit square.
+
+    Parameters:
+    ids (list): Node ids.
+    sources (np.ndarray): Index into ids of the source of every edge.
+    targets (np.ndarray): Index into ids of the target of every edge.
+    parents (list, optional): Id of the super-node of every node, or None.
+    memory (LayoutMemory, optional): Positions to start from, updated with the result.
+    Without it the layout only depends on the graph.
+
+    Returns:
+    np.ndarray: n x 2 positions between 0 and 1
+    """
+    n = len(ids)
+    if n == 0:
+        return np.zeros((0, 2))
+    parents = parents if parents is not None else [None] * n
+    positions, known = get_initial_positions(ids, parents, memory)
+
+    # Mostly known nodes only need to settle the new ones
+    warm = known >= 0.5
+    iterations = WARM_ITERATIONS if warm else COLD_ITERATIONS
+    temperature = WARM_TEMPERATURE if warm else COLD_TEMPERATURE
+
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    k = np.sqrt(1.0 / n)
+
+    for iteration in range(iterations):
+        displacement = get_repulsion(positions, k)
+
+        delta = positions[sources] - positions[targets]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+        attraction = delta * (distance / k)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] -= np.bincount(sources, attraction[:, axis], n)
+            displacement[:, axis] += np.bincount(targets, attraction[:, axis], n)
+        displacement -= GRAVITY * (positions - 0.5) / k
+
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        step = temperature * (1 - iteration / iterations)
+        positions = positions + displacement * (np.minimum(length, step) / length)[:, None]
+
+    if memory is not None:
+        memory.update(ids, positions)
+
+    # Fit into the unit square for the response, the memory keeps the raw positions
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    return (positions - low) / max(float((high - low).max()), 1e-9)
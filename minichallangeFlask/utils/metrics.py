@@ -0,0 +1,243 @@
+"""
+Request timing and Prometheus style metrics.
+
+The stages of the hot path (partition load, time slicing, categorization,
+category filtering, serialization) are wrapped in timed(stage). Within a
+request the time of every stage is summed up and sent back as a
+Server-Timing header together with the row count and payload size. Every
+stage and request duration is also added to a histogram, rendered with the
+cache and memory figures by render_metrics for the /metrics endpoint.
+
+Streamed responses (ndjson, arrow) are serialized after the headers went
+out, so their serialization only shows up in the histograms.
+
+Status and error messages of the server go through logging, see configure_logging.
+"""
+
+import os
+import math
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Timings of the request handled by the current thread, None outside requests
+current_timings = ContextVar('current_timings', default=None)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+def configure_logging(level=None):
+    """
+    Send log messages to stderr, unless the host (e.g. a WSGI server) configured logging already.
+
+    Parameters:
+    level (str or int, optional): Lowest level logged, defaults to HPDAV_LOG_LEVEL (INFO).
+    """
+    level = level or os.environ.get('HPDAV_LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+def escape_label(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    """Render label values as {name="value",...}"""
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def format_value(value):
+    """Render a sample value, Prometheus spells infinity +Inf"""
+    if value is None:
+        return 'NaN'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Thread safe cumulative histogram per combination of label values.
+
+    Parameters:
+    name (str): Metric name.
+    help (str): Description.
+    labels (tuple): Label names.
+    buckets (tuple): Upper bounds of the buckets.
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        """Add a value to the series of the label values"""
+        with self._lock:
+            series = self._series.setdefault(tuple(label_values), [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Render the histogram in the Prometheus text format"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels + ('le',), label_values + (format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    """
+    Thread safe counter per combination of label values.
+
+    Parameters:
+    name (str): Metric name, ending in _total.
+    help (str): Description.
+    labels (tuple): Label names.
+    """
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def increment(self, label_values, amount=1):
+        """Add to the counter of the label values"""
+        with self._lock:
+            key = tuple(label_values)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        """Render the counter in the Prometheus text format"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {format_value(value)}')
+        return lines
+
+
+request_duration = Histogram('hpdav_request_duration_seconds', 'Time to handle a request until the response is built.',
+                             ('endpoint', 'status'))
+stage_duration = Histogram('hpdav_stage_duration_seconds', 'Time spent in a stage of the hot path.', ('stage',))
+response_bytes = Counter('hpdav_response_bytes_total', 'Bytes of the non-streamed response bodies.', ('endpoint',))
+response_rows = Counter('hpdav_response_rows_total', 'Rows returned by frame responses.', ('endpoint',))
+
+
+def start_request():
+    """Start collecting the stage timings of the request handled by this thread"""
+    current_timings.set({'start': time.perf_counter(), 'stages': OrderedDict(), 'values': {}})
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a stage of the hot path.
+
+    Parameters:
+    stage (str): Name of the stage, e.g. 'load' or 'serialize'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe((stage,), elapsed)
+        timings = current_timings.get()
+        if timings is not None:
+            timings['stages'][stage] = timings['stages'].get(stage, 0.0) + elapsed
+
+
+def record(name, value):
+    """Attach a value (e.g. the row count) to the timings of the current request"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings['values'][name] = value
+
+
+def get_recorded(name, default=None):
+    """Get a value attached to the current request with record"""
+    timings = current_timings.get()
+    if timings is None:
+        return default
+    return timings['values'].get(name, default)
+
+
+def finish_request(endpoint, status, payload_bytes=None):
+    """
+    Stop collecting the timings of the current request and add them to the metrics.
+
+    Parameters:
+    endpoint (str): Name of the Flask endpoint.
+    status (int): Status code of the response.
+    payload_bytes (int, optional): Size of the body, None for streamed responses.
+
+    Returns:
+    str: Value of the Server-Timing header, None outside a started request
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return None
+    current_timings.set(None)
+
+    total = time.perf_counter() - timings['start']
+    endpoint = endpoint or 'unknown'
+    request_duration.observe((endpoint, str(status)), total)
+    entries = [f'{stage};dur={elapsed * 1000:.2f}' for stage, elapsed in timings['stages'].items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+
+    if 'rows' in timings['values']:
+        response_rows.increment((endpoint,), timings['values']['rows'])
+    if payload_bytes is not None:
+        timings['values']['bytes'] = payload_bytes
+        response_bytes.increment((endpoint,), payload_bytes)
+    entries += [f'{name};desc="{value}"' for name, value in timings['values'].items()]
+    return ', '.join(entries)
+
+
+def render_metrics(samples=()):
+    """
+    Render every metric in the Prometheus text format.
+
+    Parameters:
+    samples (iterable): (name, type, help, label names, [(label values, value), ...])
+    of values read from elsewhere, such as the cache counters and sizes.
+
+    Returns:
+    str: The exposition text
+    """
+    lines = []
+    for metric in (request_duration, stage_duration, response_bytes, response_rows):
+        lines += metric.render()
+    for name, metric_type, help, labels, values in samples:
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} {metric_type}']
+        lines += [f'{name}{format_labels(labels, label_values)} {format_value(value)}'
+                  for label_values, value in values]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,324 @@
+"""
+Time partitioned, lazily loaded datasets.
+
+The frontend works on one day at a time, so instead of keeping the whole
+history in memory a dataset is split into time partitions (see utils.ingest).
+A partition is loaded the first time a query window overlaps it and kept in a
+memory bounded LRU cache, so datasets larger than RAM can be served as long
+as a single query fits.
+
+refresh picks up new and appended CSV files while the server runs. Loaded
+partitions and summaries are keyed by the version of the partition, so
+readers keep working on the frames they have while changed partitions are
+loaded again on their next use.
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from utils.ingest import (
+    update_partition_cache,
+    get_partition_index,
+    read_partition,
+    concat_frames,
+    normalize_column_types,
+)
+from utils.queryCache import QueryCache
+from utils.sharedStore import is_enabled, get_shared_path, write_shared, attach_shared, remove_stale_shared
+from utils.metrics import timed
+
+
+def get_memory_budget(memory_budget=None):
+    """
+    Get the memory budget for loaded partitions.
+
+    Parameters:
+    memory_budget (int, optional): Budget in bytes, defaults to HPDAV_MEMORY_BUDGET_MB.
+
+    Returns:
+    float: Budget in bytes, infinite when no budget is configured
+    """
+    if memory_budget is None:
+        memory_budget = int(os.environ.get('HPDAV_MEMORY_BUDGET_MB', '0')) * 1024 * 1024
+    return memory_budget if memory_budget > 0 else float('inf')
+
+
+def slice_by_datetime(df, start_datetime, end_datetime):
+    """
+    Get the rows of a time sorted frame within a datetime range (both ends included).
+
+    The frames are sorted by DateTime at load, so the window is found with two
+    binary searches instead of comparing every row.
+
+    Parameters:
+    df (pd.DataFrame): Frame sorted by DateTime.
+    start_datetime (str or pd.Timestamp): Start datetime.
+    end_datetime (str or pd.Timestamp): End datetime.
+
+    Returns:
+    pd.DataFrame: View on the rows within the range.
+    """
+    if df.empty:
+        return df
+
+    start = df['DateTime'].searchsorted(pd.to_datetime(start_datetime), side='left')
+    end = df['DateTime'].searchsorted(pd.to_datetime(end_datetime), side='right')
+    return df.iloc[start:max(start, end)]
+
+
+class PartitionedDataset:
+    """
+    A dataset whose time partitions are loaded on first use.
+
+    Parameters:
+    name (str): Name of the dataset ('firewall' or 'intrusion-detection').
+    directory (str): The directory containing the CSV files.
+    schema (dict): Dataset schema from utils.schema.
+    prepare (callable, optional): Applied to every partition after it is read,
+    e.g. to add derived columns.
+    memory_budget (int, optional): Bytes of loaded partitions kept in memory.
+    Partition summaries (e.g. rollup cubes) get the same budget separately, so
+    they outlive evicted partitions.
+    shared (bool, optional): Memory map prepared partitions shared with other
+    processes, see utils.sharedStore. Defaults to HPDAV_SHARED_STORE.
+    """
+
+    def __init__(self, name, directory, schema, prepare=None, memory_budget=None, shared=None):
+        self.name = name
+        self.directory = directory
+        self.schema = schema
+        self.prepare = prepare
+        self.shared = is_enabled(shared)
+        self.partition_cache = QueryCache(f'{name}-partitions', get_memory_budget(memory_budget))
+        self.summary_cache = QueryCache(f'{name}-summaries', get_memory_budget(memory_budget))
+        self.manifest = update_partition_cache(directory, name, schema)
+        self.partitions = get_partition_index(self.manifest)
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def empty(self):
+        """True when the dataset has no rows"""
+        return not self.partitions
+
+    @property
+    def rows(self):
+        """Number of rows in all partitions"""
+        return sum(partition['rows'] for partition in self.partitions)
+
+    def load_partition(self, partition):
+        """Read a partition from disk and prepare it, or attach its shared copy"""
+        if self.shared:
+            # The first process to need the partition writes the shared copy
+            path = get_shared_path(self.directory, self.name, partition)
+            if os.path.exists(path):
+                try:
+                    with timed('load'):
+                        return attach_shared(path)
+                except FileNotFoundError:
+                    # Removed as stale by a process that refreshed first
+                    pass
+            write_shared(self.read_partition(partition), path)
+            with timed('load'):
+                return attach_shared(path)
+        return self.read_partition(partition)
+
+    def read_partition(self, partition):
+        """Read a partition from the partition cache and prepare it"""
+        with timed('load'):
+            df = read_partition(self.directory, self.name, partition)
+        return self.prepare(df) if self.prepare is not None else df
+
+    def write_shared_partitions(self):
+        """
+        Write the shared copy of every partition that has none yet, without keeping them loaded.
+
+        Older versions of the shared copies are removed, so this must run
+        before the worker processes start (see gunicorn.conf.py).
+
+        Returns:
+        int: Number of partitions written
+        """
+        written = 0
+        for partition in self.partitions:
+            path = get_shared_path(self.directory, self.name, partition)
+            if not os.path.exists(path):
+                write_shared(self.read_partition(partition), path)
+                written += 1
+            remove_stale_shared(path)
+        return written
+
+    def get_partition(self, partition):
+        """
+        Get a partition, loading it if it is not in memory.
+
+        Parameters:
+        partition (dict): Entry of self.partitions.
+
+        Returns:
+        pd.DataFrame: The rows of the partition sorted by DateTime
+        """
+        key = (partition['name'], partition['version'])
+        return self.partition_cache.get_or_compute(key, lambda: self.load_partition(partition))
+
+    def get_partition_summary(self, partition, summary, compute):
+        """
+        Get a value derived from a whole partition, computing it on first use.
+
+        Parameters:
+        partition (dict): Entry of self.partitions.
+        summary (str): Name of the summary, part of the cache key.
+        compute (callable): Function taking the partition frame and returning the summary.
+
+        Returns:
+        The summary of the partition
+        """
+        key = (summary, partition['name'], partition['version'])
+        return self.summary_cache.get_or_compute(key, lambda: compute(self.get_partition(partition)))
+
+    def get_summaries(self, summary, compute, start_datetime=None, end_datetime=None):
+        """
+        Get the summaries of the partitions overlapping a datetime window.
+
+        Parameters:
+        summary (str): Name of the summary, see get_partition_summary.
+        compute (callable): Function taking a partition frame and returning the summary.
+        start_datetime (str or pd.Timestamp, optional): Start datetime.
+        end_datetime (str or pd.Timestamp, optional): End datetime.
+
+        Returns:
+        list: Summaries of whole partitions in time order, the caller restricts them to the window
+        """
+        return [self.get_partition_summary(partition, summary, compute)
+                for partition in self.get_partitions_in_window(start_datetime, end_datetime)]
+
+    def refresh(self):
+        """
+        Ingest new and appended CSV files and drop the cached frames of the partitions they change.
+
+        Returns:
+        list: Entries of the changed partitions, before and after the change
+        """
+        with self._refresh_lock:
+            manifest = update_partition_cache(self.directory, self.name, self.schema)
+            partitions = get_partition_index(manifest)
+            versions = {partition['name']: partition['version'] for partition in partitions}
+            old_versions = {partition['name']: partition['version'] for partition in self.partitions}
+            changed = [partition for partition in partitions if old_versions.get(partition['name']) != partition['version']]
+            changed += [partition for partition in self.partitions if versions.get(partition['name']) != partition['version']]
+            if not changed:
+                return []
+
+            # Swapped in one assignment, readers see either the old or the new index
+            self.manifest, self.partitions = manifest, partitions
+            names = {partition['name'] for partition in changed}
+            self.partition_cache.invalidate(lambda key: key[0] in names)
+            self.summary_cache.invalidate(lambda key: key[1] in names)
+            if self.shared:
+                for partition in partitions:
+                    if partition['name'] in names:
+                        remove_stale_shared(get_shared_path(self.directory, self.name, partition))
+            return changed
+
+    def get_partitions_in_window(self, start_datetime=None, end_datetime=None):
+        """
+        Get the partitions overlapping a datetime window.
+
+        Parameters:
+        start_datetime (str or pd.Timestamp, optional): Start datetime.
+        end_datetime (str or pd.Timestamp, optional): End datetime.
+
+        Returns:
+        list: Entries of self.partitions, all of them when no window is given
+        """
+        if not start_datetime or not end_datetime:
+            return list(self.partitions)
+        start, end = pd.to_datetime(start_datetime), pd.to_datetime(end_datetime)
+        return [partition for partition in self.partitions
+                if partition['start'] <= end and partition['end'] >= start]
+
+    def iter_slices(self, start_datetime=None, end_datetime=None, progress=None):
+        """
+        Get the rows within a datetime window partition by partition.
+
+        Parameters:
+        start_datetime (str or pd.Timestamp, optional): Start datetime.
+        end_datetime (str or pd.Timestamp, optional): End datetime.
+        progress (callable, optional): Called with (done, total) partitions before
+        every partition and once at the end, may raise to stop early.
+
+        Returns:
+        generator: Non-empty views on the loaded partitions, in time order
+        """
+        partitions = self.get_partitions_in_window(start_datetime, end_datetime)
+        for done, partition in enumerate(partitions):
+            if progress is not None:
+                progress(done, len(partitions))
+            df = self.get_partition(partition)
+            if start_datetime and end_datetime:
+                with timed('slice'):
+                    df = slice_by_datetime(df, start_datetime, end_datetime)
+            if not df.empty:
+                yield df
+        if progress is not None:
+            progress(len(partitions), len(partitions))
+
+    def slice(self, start_datetime=None, end_datetime=None):
+        """
+        Get the rows within a datetime window (both ends included).
+
+        A window inside one partition is a view on the loaded partition, wider
+        windows are concatenated from the slices of every partition they touch.
+
+        Parameters:
+        start_datetime (str or pd.Timestamp, optional): Start datetime.
+        end_datetime (str or pd.Timestamp, optional): End datetime.
+
+        Returns:
+        pd.DataFrame: The rows sorted by DateTime, the whole dataset without a window
+        """
+        frames = list(self.iter_slices(start_datetime, end_datetime))
+        if not frames:
+            return pd.DataFrame() if self.empty else self.get_partition(self.partitions[0]).iloc[0:0]
+        if len(frames) == 1:
+            return frames[0]
+        with timed('slice'):
+            return normalize_column_types(concat_frames(frames))
+
+    def get_frame(self):
+        """Get the whole dataset, see slice"""
+        return self.slice()
+
+    def head(self, n=10):
+        """Get the first n rows, only loading the first partition"""
+        if self.empty:
+            return pd.DataFrame()
+        return self.get_partition(self.partitions[0]).head(n)
+
+    def get_memory_report(self):
+        """
+        Report the partitions on disk and the memory used by the loaded ones.
+
+        Returns:
+        dict: Row counts, loaded partitions and dtype and bytes of every column
+        """
+        loaded = self.partition_cache.values()
+        columns = {}
+        for df in loaded:
+            usage = df.memory_usage(index=False, deep=True)
+            for column in df.columns:
+                entry = columns.setdefault(column, {'dtype': str(df[column].dtype), 'bytes': 0})
+                entry['bytes'] += int(usage[column])
+
+        statistics = self.partition_cache.get_statistics()
+        return {
+            'rows': self.rows,
+            'partitions': len(self.partitions),
+            'loaded_partitions': len(loaded),
+            'loaded_rows': sum(len(df) for df in loaded),
+            'bytes': statistics['bytes'],
+            'memory_budget': statistics['max_bytes'] if statistics['max_bytes'] != float('inf') else None,
+            'evictions': statistics['evictions'],
+            'columns': columns,
+        }
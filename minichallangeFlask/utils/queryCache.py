@@ -0,0 +1,218 @@
+"""
+Memory bounded LRU cache for windowed queries.
+
+The frontend asks for the same time window several times in a row (and fires
+the firewall and IDS calls of fetchAllCategoryData at the same time), so the
+results of windowed queries are kept here keyed by the normalized window.
+Identical requests that arrive while a result is being computed wait for that
+computation instead of starting their own.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def normalize_window(start_datetime, end_datetime):
+    """
+    Turn a datetime window into a canonical, hashable key.
+
+    '2012-04-05T17:51:26' and '2012-04-05 17:51:26' describe the same window and
+    must hit the same cache entry. Like the data functions, a window is only
+    applied when both bounds are given.
+
+    Parameters:
+    start_datetime (str or pd.Timestamp, optional): Start datetime
+    end_datetime (str or pd.Timestamp, optional): End datetime
+
+    Returns:
+    tuple: (start, end) as ISO strings, or (None, None) for the full dataset
+    """
+    if not start_datetime or not end_datetime:
+        return (None, None)
+    return (pd.Timestamp(start_datetime).isoformat(), pd.Timestamp(end_datetime).isoformat())
+
+
+def estimate_size(value):
+    """
+    Estimate the memory used by a cached value in bytes.
+
+    Parameters:
+    value: A DataFrame, Series or a (nested) container of plain Python objects.
+
+    Returns:
+    int: Approximate size in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _PendingResult:
+    """Result of a computation other threads are waiting for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """
+    Thread safe LRU cache bounded by the estimated memory of its values.
+
+    Parameters:
+    name (str): Name used in the statistics.
+    max_bytes (int): Memory budget, least recently used entries are evicted above it.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        # Bumped by invalidate, results computed before that are not stored
+        self._generation = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Get a cached value, or compute and cache it.
+
+        If another thread is already computing the same key, wait for its result.
+        Exceptions are passed on to every waiting caller and never cached.
+
+        Parameters:
+        key (tuple): Cache key, use normalize_window for the window part.
+        compute (callable): Function without arguments returning the value.
+
+        Returns:
+        The cached or computed value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                pending = self._pending[key] = _PendingResult()
+                generation = self._generation
+                owner = True
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+            size = estimate_size(pending.value)
+        except BaseException as e:
+            # Interrupts too, so waiting callers don't get a None value and nothing is cached
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+                if pending.error is None and generation == self._generation:
+                    self._store(key, pending.value, size)
+            pending.done.set()
+
+        return pending.value
+
+    def get(self, key, default=None):
+        """
+        Get a cached value without computing it.
+
+        Parameters:
+        key (tuple): Cache key.
+        default: Returned when the key is not cached.
+
+        Returns:
+        The cached value or default.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def _store(self, key, value, size):
+        """Insert a value and evict old entries, the lock must be held"""
+        if size > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """
+        Drop cached entries.
+
+        Parameters:
+        predicate (callable, optional): Only drop keys for which it returns True,
+        drop everything when omitted.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if predicate is None or predicate(key):
+                    _, size = self._entries.pop(key)
+                    self.current_bytes -= size
+
+    def values(self):
+        """Get a snapshot of the cached values"""
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def clear(self):
+        """Drop every cached entry"""
+        self.invalidate()
+
+    def get_statistics(self):
+        """
+        Get the counters of the cache.
+
+        Returns:
+        dict: Entry count, memory use and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
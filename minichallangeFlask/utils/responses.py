@@ -0,0 +1,272 @@
+"""
+Serialization of data frames into Flask responses.
+
+Row data can be returned as one JSON array (the default the frontend uses),
+streamed as newline delimited JSON or streamed as an Apache Arrow IPC stream.
+The streamed formats are serialized chunk by chunk so the first rows go out
+before the whole window has been converted. The format is picked with the
+format query parameter or, without it, from the Accept header. All formats
+support paging with limit and cursor and column projection with fields.
+"""
+
+import io
+
+from flask import Response, jsonify, stream_with_context
+
+from utils.dataProcessing import to_public_frame, category_columns
+from utils.metrics import timed, record
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Rows serialized per chunk when streaming
+STREAM_CHUNK_ROWS = 10000
+
+MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+FORMATS = tuple(MIMETYPES)
+
+
+def get_paging_args(args):
+    """
+    Read the paging parameters of a request.
+
+    Parameters:
+    args (MultiDict): Query parameters, with optional 'limit' (rows per page) and
+    'cursor' (value of the X-Next-Cursor header of the previous page).
+
+    Returns:
+    tuple: (limit or None, cursor as row offset)
+    """
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+        cursor = int(args['cursor']) if args.get('cursor') else 0
+    except ValueError:
+        raise ValueError("limit and cursor must be integers")
+    if (limit is not None and limit <= 0) or cursor < 0:
+        raise ValueError("limit must be positive and cursor must not be negative")
+    return limit, cursor
+
+
+def get_output_format(args, accept_mimetypes=None):
+    """
+    Pick the response format of a request.
+
+    Parameters:
+    args (MultiDict): Query parameters, an explicit 'format' wins over the Accept header.
+    accept_mimetypes (MIMEAccept, optional): Parsed Accept header of the request.
+
+    Returns:
+    str or None: One of FORMATS, None when no acceptable format is available
+    """
+    available = [name for name in FORMATS if name != 'arrow' or pa is not None]
+    if args.get('format'):
+        output_format = args['format'].lower()
+        if output_format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        return output_format if output_format in available else None
+
+    if not accept_mimetypes:
+        return 'json'
+    best = accept_mimetypes.best_match([MIMETYPES[name] for name in available])
+    return next((name for name in available if MIMETYPES[name] == best), None)
+
+
+def get_fields(args, columns):
+    """
+    Read the column projection of a request.
+
+    Parameters:
+    args (MultiDict): Query parameters, with optional comma separated 'fields'.
+    columns (list): Columns of the data.
+
+    Returns:
+    list: Columns to return, in the requested order
+    """
+    columns = [column for column in columns if column not in category_columns]
+    if not args.get('fields'):
+        return columns
+    fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+    for field in fields:
+        if field not in columns:
+            raise ValueError(f"Unknown field: {field}")
+    return list(dict.fromkeys(fields))
+
+
+def get_page(frames, limit, cursor):
+    """
+    Select a page of rows from a list of frames without concatenating them.
+
+    Parameters:
+    frames (list): Frames holding consecutive rows.
+    limit (int or None): Maximum number of rows, all remaining rows when None.
+    cursor (int): Offset of the first row.
+
+    Returns:
+    tuple: (list of views making up the page, offset after the page)
+    """
+    page = []
+    offset = 0
+    end = cursor + limit if limit is not None else float('inf')
+    for df in frames:
+        start, stop = max(cursor - offset, 0), min(end - offset, len(df))
+        if start < stop:
+            page.append(df.iloc[int(start):int(stop)])
+        offset += len(df)
+        if offset >= end:
+            break
+    return page, min(end, sum(len(df) for df in frames))
+
+
+def iter_ndjson(frames, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Serialize frames as newline delimited JSON, one chunk of rows at a time.
+
+    Parameters:
+    frames (list): Frames to serialize in order.
+    chunk_rows (int): Rows per chunk.
+
+    Returns:
+    generator: bytes per chunk
+    """
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            with timed('serialize'):
+                chunk = to_public_frame(df.iloc[start:start + chunk_rows])
+                text = chunk.to_json(orient='records', lines=True, date_format='iso')
+            yield (text if text.endswith('\n') else text + '\n').encode('utf-8')
+
+
+def get_arrow_schema(df):
+    """
+    Get the Arrow schema used for every batch of a stream.
+
+    Batches of different partitions may differ in dictionary index width and
+    string type, so these are widened to one type the JavaScript reader handles.
+
+    Parameters:
+    df (pd.DataFrame): Public frame, possibly empty.
+
+    Returns:
+    pa.Schema: Schema without pandas metadata
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif pa.types.is_large_string(field.type) or pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def iter_arrow(frames, template, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Serialize frames as an Arrow IPC stream, one record batch per chunk of rows.
+
+    Parameters:
+    frames (list): Frames to serialize in order.
+    template (pd.DataFrame): Frame with the columns of the response, used for
+    the schema when there are no rows.
+    chunk_rows (int): Rows per record batch.
+
+    Returns:
+    generator: bytes of the schema message, then of every batch
+    """
+    sink = io.BytesIO()
+    schema = get_arrow_schema(to_public_frame(template.iloc[0:0]))
+    writer = pa.ipc.new_stream(sink, schema)
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            with timed('serialize'):
+                chunk = to_public_frame(df.iloc[start:start + chunk_rows])
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer.write_table(table.replace_schema_metadata(None).cast(schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+def to_json_records(frames):
+    """
+    Serialize frames into one JSON array of records.
+
+    Parameters:
+    frames (list): Frames to serialize in order.
+
+    Returns:
+    str: JSON text
+    """
+    with timed('serialize'):
+        parts = [to_public_frame(df).to_json(orient='records', date_format='iso')[1:-1]
+                 for df in frames if not df.empty]
+        return '[' + ','.join(parts) + ']'
+
+
+def frame_response(data, args, accept_mimetypes=None):
+    """
+    Build the response for rows of data according to the request parameters.
+
+    Parameters:
+    data (pd.DataFrame or list): Rows to return, or a list of frames holding
+    consecutive rows (e.g. one slice per partition). The order must be stable
+    so that paging works.
+    args (MultiDict): Query parameters: 'format' ('json', 'ndjson' or 'arrow'),
+    'fields' (comma separated columns), 'limit' and 'cursor'.
+    accept_mimetypes (MIMEAccept, optional): Accept header, used when there is no 'format'.
+
+    Returns:
+    Response or tuple: Flask response
+    """
+    frames = data if isinstance(data, list) else [data]
+    try:
+        output_format = get_output_format(args, accept_mimetypes)
+        limit, cursor = get_paging_args(args)
+        fields = get_fields(args, frames[0].columns if frames else [])
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    if output_format is None:
+        return jsonify({
+            "error": f"None of the accepted formats is available, supported: "
+                     f"{', '.join(MIMETYPES[name] for name in FORMATS if name != 'arrow' or pa is not None)}"
+        }), 406
+
+    frames = [df[fields] for df in frames]
+    total = sum(len(df) for df in frames)
+    page, end = get_page(frames, limit, cursor)
+    record('rows', sum(len(df) for df in page))
+    headers = {'X-Total-Count': str(total), 'Vary': 'Accept'}
+    if end < total:
+        headers['X-Next-Cursor'] = str(end)
+
+    if output_format == 'ndjson':
+        return Response(stream_with_context(iter_ndjson(page)), 200, headers,
+                        mimetype=MIMETYPES['ndjson'])
+    if output_format == 'arrow':
+        template = frames[0] if frames else page
+        return Response(stream_with_context(iter_arrow(page, template)), 200, headers,
+                        mimetype=MIMETYPES['arrow'])
+
+    return Response(to_json_records(page), 200, headers, mimetype=MIMETYPES['json'])
+
+
+def tables_response(tables):
+    """
+    Build a JSON response holding several tables, e.g. the nodes and edges of a graph.
+
+    Parameters:
+    tables (dict): Name -> pd.DataFrame, each serialized as an array of records.
+
+    Returns:
+    Response: Flask response
+    """
+    body = ','.join(f'"{name}":{to_json_records([df])}' for name, df in tables.items())
+    return Response('{' + body + '}', 200, mimetype=MIMETYPES['json'])
@@ -0,0 +1,155 @@
+"""
+Per-minute rollup cubes.
+
+A rollup cube holds, for every minute of a partition, the row count and the
+sums and value counts the time views need. Cubes are built once per
+partition (see PartitionedDataset.get_partition_summary) and coarser
+intervals are answered by re-aggregating the cube instead of the raw rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Resolution of the cubes, every interval must be a multiple of it
+ROLLUP_FREQ = '1min'
+
+
+def get_interval(interval):
+    """
+    Validate an aggregation interval.
+
+    Parameters:
+    interval (str): Pandas frequency string, e.g. '1min', '5min' or '1h'.
+
+    Returns:
+    str: The interval
+
+    Raises:
+    ValueError: If the interval is not a positive whole number of minutes
+    """
+    try:
+        length = pd.Timedelta(pd.tseries.frequencies.to_offset(interval))
+    except (TypeError, ValueError):
+        length = None
+    if length is None or length <= pd.Timedelta(0) or length % pd.Timedelta(ROLLUP_FREQ):
+        raise ValueError(f"interval must be a whole number of minutes, e.g. '1min', '5min' or '1h', got '{interval}'")
+    return interval
+
+
+def build_rollup(df, sum_columns=(), mean_columns=(), breakdown_columns=()):
+    """
+    Build the per-minute cube of a frame.
+
+    Parameters:
+    df (pd.DataFrame): Rows with a DateTime column.
+    sum_columns (iterable): Numeric columns summed per minute.
+    mean_columns (iterable): Numeric columns averaged later, stored as '<column>Sum'
+    and '<column>Count' so they can be re-aggregated.
+    breakdown_columns (iterable): Categorical columns counted per value, stored
+    as '<column>_<value>'.
+
+    Returns:
+    pd.DataFrame: One row per minute with data, indexed by the minute
+    """
+    minutes = df['DateTime'].dt.floor(ROLLUP_FREQ).rename('DateTime')
+    grouped = df.groupby(minutes, sort=True)
+
+    cube = pd.DataFrame({'Count': grouped.size()})
+    for column in sum_columns:
+        cube[column] = grouped[column].sum().astype(np.int64)
+    for column in mean_columns:
+        cube[f'{column}Sum'] = grouped[column].sum().astype(np.float64)
+        cube[f'{column}Count'] = grouped[column].count()
+    for column in breakdown_columns:
+        counts = df.groupby([minutes, df[column]], observed=True, sort=True).size().unstack(fill_value=0)
+        counts.columns = [f'{column}_{value}' for value in counts.columns]
+        cube = cube.join(counts)
+
+    return cube.fillna(0)
+
+
+def merge_rollups(cubes):
+    """
+    Merge the cubes of several partitions.
+
+    Parameters:
+    cubes (list): Cubes from build_rollup, possibly with different breakdown columns.
+
+    Returns:
+    pd.DataFrame: One cube, missing breakdown values counted as 0
+    """
+    cubes = [cube for cube in cubes if not cube.empty]
+    if not cubes:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='DateTime'))
+    merged = pd.concat(cubes).fillna(0)
+    if not merged.index.is_unique:
+        merged = merged.groupby(level=0).sum()
+    return merged.sort_index()
+
+
+def slice_rollup(cube, start_datetime=None, end_datetime=None):
+    """
+    Get the minutes of a cube within a datetime window, rounded out to whole minutes.
+
+    Parameters:
+    cube (pd.DataFrame): Cube indexed by minute.
+    start_datetime (str or pd.Timestamp, optional): Start datetime.
+    end_datetime (str or pd.Timestamp, optional): End datetime.
+
+    Returns:
+    pd.DataFrame: The minutes within the window, the whole cube without a window
+    """
+    if not start_datetime or not end_datetime:
+        return cube
+    start = pd.Timestamp(start_datetime).floor(ROLLUP_FREQ)
+    return cube.loc[start:pd.Timestamp(end_datetime)]
+
+
+def resample_rollup(cube, interval):
+    """
+    Re-aggregate a cube to a coarser interval.
+
+    Parameters:
+    cube (pd.DataFrame): Cube indexed by minute.
+    interval (str): Interval from get_interval.
+
+    Returns:
+    pd.DataFrame: One row per interval between the first and last minute, empty intervals counted as 0
+    """
+    if cube.empty:
+        return cube
+    return cube.resample(interval).sum()
+
+
+def get_breakdown(cube, column):
+    """
+    Get the value counts of a breakdown column.
+
+    Parameters:
+    cube (pd.DataFrame): Cube or resampled cube.
+    column (str): Breakdown column passed to build_rollup.
+
+    Returns:
+    pd.DataFrame: One column per value, named after the value
+    """
+    prefix = f'{column}_'
+    counts = cube[[name for name in cube.columns if name.startswith(prefix)]]
+    return counts.rename(columns=lambda name: name[len(prefix):])
+
+
+def get_most_common(cube, column):
+    """
+    Get the most common value of a breakdown column per row of a cube.
+
+    Parameters:
+    cube (pd.DataFrame): Cube or resampled cube.
+    column (str): Breakdown column passed to build_rollup.
+
+    Returns:
+    pd.Series: The most common value, None where there are no rows
+    """
+    counts = get_breakdown(cube, column)
+    if counts.empty or counts.shape[1] == 0:
+        return pd.Series(None, index=cube.index, dtype=object)
+    values = np.asarray(counts.columns, dtype=object)[counts.to_numpy().argmax(axis=1)]
+    return pd.Series(np.where(counts.to_numpy().sum(axis=1) > 0, values, None), index=cube.index, dtype=object)
@@ -0,0 +1,122 @@
+"""
+Heading Information for Firewall Data and Intrusion Detection Data
+
+Firewall Data:
+    | Field                | Description                  |
+    |----------------------|------------------------------|
+    | Date/time            | 06/Apr/2012 17:40:02         |
+    | Syslog priority      | Info (not only)              |
+    | Operation            | Built or Teardown            |
+    | Message code         | ASA-6-302015 (or others)     |
+    | Protocol             | TCP or UDP                   |
+    | Source IP            | IPV4 address                 |
+    | Destination IP       | IPV4 address                 |
+    | Source hostname      | (empty) maybe others         |
+    | Destination hostname | (empty) maybe others         |
+    | Source port          | some number                  |
+    | Destination port     | some number                  |
+    | Destination service  | http or other things         |
+    | Direction            | Inbound or Outbound          |
+    | Connections built    | 0 or 1                       |
+    | Connections torn down| 0 or 1                       |
+"""
+    
+# For consistency, the column names in the DataFrame should be:
+field_mapping_firewall = {
+        'Date/time': 'DateTime',
+        'Syslog priority': 'SyslogPriority',
+        'Operation': 'Operation',
+        'Message code': 'MessageCode',
+        'Protocol': 'Protocol',
+        'Source IP': 'SourceIP',
+        'Destination IP': 'DestinationIP',
+        'Source hostname': 'SourceHostname',
+        'Destination hostname': 'DestinationHostname',
+        'Source port': 'SourcePort',
+        'Destination port': 'DestinationPort',
+        'Destination service': 'DestinationService',
+        'Direction': 'Direction',
+        'Connections built': 'ConnectionsBuilt',
+        'Connections torn down': 'ConnectionsTornDown'
+    }
+
+
+"""
+Intrusion Detection Data:
+    | Field          | Description             |
+    |----------------|-------------------------|
+    | time           | 4/6/2012 17:23          |
+    | sourceIP       | IPV4 address            |
+    | sourcePort     | some number             |
+    | destIP         | IPV4 address            |
+    | destPort       | some number             |
+    | classification | Text with information   |
+    | priority       | number                  |
+    | label          |                         |
+    | packet info    |                         |
+    | packet info cont'd|                      |
+    | xref           |                         |
+"""
+field_mapping_intrusion_detection = {
+    'time': 'DateTime',
+    ' sourceIP': 'SourceIP',
+    ' sourcePort': 'SourcePort',
+    ' destIP': 'DestinationIP',
+    ' destPort': 'DestinationPort',
+    ' classification': 'Classification',
+    ' priority': 'Priority',
+    ' label': 'Label',
+    ' packet info': 'PacketInfo',
+    ' packet info cont\'d': 'PacketInfoContd',
+    ' xref': 'Xref'
+}
+
+
+# Column types applied at ingest:
+#   'category' - pandas categorical for low cardinality text
+#   'ipv4'     - uint32, rendered back to dotted strings when data leaves the API
+#   'port'     - uint16 (nullable UInt16 if some rows have no port)
+#   'unsigned' - smallest unsigned integer type holding all values
+# Columns not listed keep their parsed type.
+
+# Everything the ingest needs to know about a dataset
+firewall_schema = {
+    'field_mapping': field_mapping_firewall,
+    # Rows are dropped at ingest when one of these columns holds the "(empty)" placeholder
+    'empty_filter_columns': ['SourceIP', 'DestinationIP', 'Direction'],
+    # 06/Apr/2012 17:40:02
+    'datetime_format': '%d/%b/%Y %H:%M:%S',
+    'column_types': {
+        'SyslogPriority': 'category',
+        'Operation': 'category',
+        'MessageCode': 'category',
+        'Protocol': 'category',
+        'SourceIP': 'ipv4',
+        'DestinationIP': 'ipv4',
+        'SourceHostname': 'category',
+        'DestinationHostname': 'category',
+        'SourcePort': 'port',
+        'DestinationPort': 'port',
+        'DestinationService': 'category',
+        'Direction': 'category',
+        'ConnectionsBuilt': 'unsigned',
+        'ConnectionsTornDown': 'unsigned',
+    },
+}
+
+intrusion_detection_schema = {
+    'field_mapping': field_mapping_intrusion_detection,
+    'empty_filter_columns': ['SourceIP', 'DestinationIP'],
+    # 4/6/2012 17:23
+    'datetime_format': '%m/%d/%Y %H:%M',
+    'column_types': {
+        'SourceIP': 'ipv4',
+        'SourcePort': 'port',
+        'DestinationIP': 'ipv4',
+        'DestinationPort': 'port',
+        'Classification': 'category',
+        'Priority': 'unsigned',
+        'Label': 'category',
+        'Xref': 'category',
+    },
+}
@@ -0,0 +1,130 @@
+"""
+Memory-mapped partitions shared by several server processes.
+
+With gunicorn every worker process loads the partitions it queries, so N
+workers would hold N copies of the dataset. In shared mode (HPDAV_SHARED_STORE=1,
+set by gunicorn.conf.py) a prepared partition, category columns included, is
+written once as an uncompressed Arrow IPC file next to the partition cache and
+every process memory maps it. Numeric, datetime and categorical columns
+without missing values are views on the mapping (split_blocks keeps pandas
+from copying them into 2D blocks), so their pages are read from disk once and
+shared by all workers through the OS page cache. String columns and columns
+with missing values are converted into pandas objects on attach, so every
+process holds its own copy of those.
+
+The file name contains a hash of the partition version, so partitions that
+received new rows (see PartitionedDataset.refresh) are written again under a
+new name while readers keep the old mapping. Writing never removes other
+versions, as workers that haven't refreshed yet still use them, only the
+process refreshing the partitions and the gunicorn master remove stale ones
+(see remove_stale_shared).
+"""
+
+import os
+import glob
+import logging
+import threading
+import zlib
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc
+except ImportError:
+    pa = ipc = None
+
+from utils.ingest import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+SHARED_PREFIX = 'prepared-'
+
+
+def is_enabled(shared=None):
+    """
+    Check whether partitions are shared through memory-mapped files.
+
+    Parameters:
+    shared (bool, optional): Explicit choice, defaults to HPDAV_SHARED_STORE.
+
+    Returns:
+    bool: True when enabled and pyarrow is installed
+    """
+    if shared is None:
+        shared = os.environ.get('HPDAV_SHARED_STORE', '0') == '1'
+    if shared and pa is None:
+        logger.warning("HPDAV_SHARED_STORE needs pyarrow (pip install pyarrow), partitions are loaded per process")
+        return False
+    return shared
+
+
+def get_shared_path(directory, dataset, partition):
+    """
+    Get the path of the memory-mapped copy of a partition.
+
+    Parameters:
+    directory (str): The directory containing the CSV files.
+    dataset (str): Name of the dataset.
+    partition (dict): Entry of get_partition_index.
+
+    Returns:
+    str: Path of the Arrow file for the current version of the partition
+    """
+    version = zlib.crc32(repr(partition['version']).encode())
+    return os.path.join(get_cache_dir(directory, dataset), partition['name'], f'{SHARED_PREFIX}{version:08x}.arrow')
+
+
+def write_shared(df, path):
+    """
+    Write a frame as an uncompressed Arrow IPC file.
+
+    Parameters:
+    df (pd.DataFrame): Prepared partition.
+    path (str): Destination, see get_shared_path.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Unique temporary name, several processes may write the same partition at once
+    temporary = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with pa.OSFile(temporary, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temporary, path)
+
+
+def remove_stale_shared(path):
+    """
+    Remove the other versions of a shared partition.
+
+    Processes still using a removed version write it again on their next load,
+    see PartitionedDataset.load_partition.
+
+    Parameters:
+    path (str): Path of the current version, see get_shared_path.
+
+    Returns:
+    int: Number of files removed
+    """
+    removed = 0
+    for old in glob.glob(os.path.join(os.path.dirname(path), f'{SHARED_PREFIX}*.arrow')):
+        if old != path:
+            try:
+                os.remove(old)
+                removed += 1
+            except OSError:
+                # Removed by another process, or still mapped on a platform that doesn't allow removing it
+                pass
+    return removed
+
+
+def attach_shared(path):
+    """
+    Memory map a frame written by write_shared.
+
+    Parameters:
+    path (str): Path of the Arrow file.
+
+    Returns:
+    pd.DataFrame: Read-only columns backed by the mapping
+    """
+    table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
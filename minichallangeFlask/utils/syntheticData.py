@@ -0,0 +1,265 @@
+"""
+Synthetic firewall and IDS logs in the layout of the VAST 2012 challenge.
+
+The real logs can't be shipped with the repository, so this writes CSVs with
+the exact headers of utils.schema and addresses drawn from the categories of
+create_ip_categories (plus external addresses, the anomalies), to measure
+ingest and query times on a known amount of data (see benchmark.py).
+
+Run "python -m utils.syntheticData --rows 1000000 --days 2" to fill the data
+folders. The output is deterministic for a given seed.
+"""
+
+import os
+import argparse
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+from utils.schema import field_mapping_firewall, field_mapping_intrusion_detection
+from utils.dataProcessing import create_ip_categories
+
+# Rows generated and written at once
+CHUNK_ROWS = 500000
+
+# Addresses sampled per category, and external addresses (no category)
+ADDRESSES_PER_CATEGORY = 400
+EXTERNAL_ADDRESSES = 200
+
+# Share of firewall rows with "(empty)" in SourceIP, dropped by the ingest
+EMPTY_FRACTION = 0.001
+
+# Destination port, service and share of the firewall traffic
+SERVICES = [
+    (80, 'http', 0.45), (443, 'https', 0.2), (53, 'domain', 0.15), (6667, '6667_tcp', 0.08),
+    (21, 'ftp', 0.04), (25, 'smtp', 0.04), (22, 'ssh', 0.04),
+]
+
+# Operation, share, message code for TCP and for UDP
+OPERATIONS = [
+    ('Built', 0.46, 'ASA-6-302013', 'ASA-6-302015'),
+    ('Teardown', 0.46, 'ASA-6-302014', 'ASA-6-302016'),
+    ('Deny', 0.08, 'ASA-4-106023', 'ASA-4-106023'),
+]
+
+# Classification, priority, share of the IDS alerts and the rule of the label
+ALERTS = [
+    ('Generic Protocol Command Decode', 3, 0.4, '[1:2100366:8] GPL ICMP_INFO PING *NIX'),
+    ('Misc activity', 3, 0.25, '[1:2000355:5] ET POLICY IRC authorization message'),
+    ('Potential Corporate Privacy Violation', 1, 0.2, '[1:2000355:5] ET POLICY IRC authorization message'),
+    ('Attempted Information Leak', 2, 0.1, '[1:2001219:18] ET SCAN Potential SSH Scan'),
+    ('Attempted Denial of Service', 2, 0.05, '[1:2001569:14] ET SCAN Behavioral Unusual Port 445 traffic'),
+]
+
+
+def get_category_addresses(rng):
+    """
+    Sample the addresses of every category of create_ip_categories.
+
+    Parameters:
+    rng (np.random.Generator): Random numbers.
+
+    Returns:
+    dict: Category -> np.ndarray of uint32 addresses, 'Anomalies' for external ones
+    """
+    addresses = {}
+    for category, definition in create_ip_categories().items():
+        candidates = [int(ip) for ip in definition.get('ips', set()) | definition.get('single_ips', set())]
+        for network in definition.get('networks', []):
+            hosts = rng.integers(int(network.network_address) + 1, int(network.broadcast_address),
+                                 ADDRESSES_PER_CATEGORY // len(definition['networks']) + 1)
+            candidates.extend(int(host) for host in hosts)
+        for first, last in definition.get('ranges', []):
+            candidates.extend(range(int(first), int(last) + 1))
+        candidates = np.unique(np.array(candidates, dtype=np.uint32))
+        if len(candidates) > ADDRESSES_PER_CATEGORY:
+            candidates = rng.choice(candidates, ADDRESSES_PER_CATEGORY, replace=False)
+        addresses[category] = candidates
+
+    # Outside the internal 172.23.0.0/16 and 10.32.0.0/16 networks
+    external = rng.integers(int(ipaddress.ip_address('10.40.0.1')), int(ipaddress.ip_address('10.250.255.254')),
+                            EXTERNAL_ADDRESSES)
+    addresses['Anomalies'] = external.astype(np.uint32)
+    return addresses
+
+
+def draw_addresses(rng, addresses, weights, n):
+    """
+    Draw addresses category by category.
+
+    Parameters:
+    rng (np.random.Generator): Random numbers.
+    addresses (dict): Result of get_category_addresses.
+    weights (dict): Category -> share of the drawn addresses.
+    n (int): Number of addresses.
+
+    Returns:
+    np.ndarray: n uint32 addresses
+    """
+    names = list(weights)
+    probabilities = np.array([weights[name] for name in names], dtype=np.float64)
+    categories = rng.choice(len(names), n, p=probabilities / probabilities.sum())
+    result = np.empty(n, dtype=np.uint32)
+    for index, name in enumerate(names):
+        selected = categories == index
+        result[selected] = rng.choice(addresses[name], selected.sum())
+    return result
+
+
+def to_dotted(addresses):
+    """Render uint32 addresses as dotted strings"""
+    addresses = addresses.astype(np.int64)
+    octets = [pd.Series((addresses >> shift) & 0xFF).astype(str) for shift in (24, 16, 8, 0)]
+    return octets[0] + '.' + octets[1] + '.' + octets[2] + '.' + octets[3]
+
+
+def get_times(rng, day, n):
+    """Sorted random times within one day"""
+    seconds = np.sort(rng.integers(0, 24 * 3600, n))
+    return day + pd.to_timedelta(seconds, unit='s')
+
+
+def generate_firewall_rows(rng, addresses, day, n):
+    """
+    Generate firewall rows of one day.
+
+    Parameters:
+    rng (np.random.Generator): Random numbers.
+    addresses (dict): Result of get_category_addresses.
+    day (pd.Timestamp): Midnight of the day.
+    n (int): Number of rows.
+
+    Returns:
+    pd.DataFrame: Rows with the CSV headers of field_mapping_firewall
+    """
+    times = get_times(rng, day, n)
+    sources = draw_addresses(rng, addresses, {'Workstations': 0.8, 'Anomalies': 0.15, 'Websites': 0.05}, n)
+    destinations = draw_addresses(rng, addresses, {
+        'Websites': 0.3, 'Financial_Servers': 0.2, 'Core_Servers': 0.1, 'Firewalls': 0.05,
+        'IDS': 0.02, 'Anomalies': 0.23, 'Workstations': 0.1}, n)
+
+    operation = rng.choice(len(OPERATIONS), n, p=[share for _, share, _, _ in OPERATIONS])
+    udp = rng.random(n) < 0.2
+    service = rng.choice(len(SERVICES), n, p=[share for _, _, share in SERVICES])
+    outbound = np.isin(sources, addresses['Workstations'])
+
+    source_ips = to_dotted(sources)
+    source_ips[rng.random(n) < EMPTY_FRACTION] = '(empty)'
+    names = list(field_mapping_firewall)
+    return pd.DataFrame({
+        names[0]: times.strftime('%d/%b/%Y %H:%M:%S'),
+        names[1]: np.where(operation == 2, 'Warning', 'Info'),
+        names[2]: np.array([name for name, _, _, _ in OPERATIONS])[operation],
+        names[3]: np.where(udp, np.array([code for _, _, _, code in OPERATIONS])[operation],
+                           np.array([code for _, _, code, _ in OPERATIONS])[operation]),
+        names[4]: np.where(udp, 'UDP', 'TCP'),
+        names[5]: source_ips,
+        names[6]: to_dotted(destinations),
+        names[7]: '(empty)',
+        names[8]: '(empty)',
+        names[9]: rng.integers(1024, 65535, n),
+        names[10]: np.array([port for port, _, _ in SERVICES])[service],
+        names[11]: np.array([name for _, name, _ in SERVICES])[service],
+        names[12]: np.where(outbound, 'outbound', 'inbound'),
+        names[13]: (operation == 0).astype(np.uint8),
+        names[14]: (operation == 1).astype(np.uint8),
+    })
+
+
+def generate_intrusion_detection_rows(rng, addresses, day, n):
+    """
+    Generate IDS alerts of one day.
+
+    Parameters:
+    rng (np.random.Generator): Random numbers.
+    addresses (dict): Result of get_category_addresses.
+    day (pd.Timestamp): Midnight of the day.
+    n (int): Number of rows.
+
+    Returns:
+    pd.DataFrame: Rows with the CSV headers of field_mapping_intrusion_detection
+    """
+    times = pd.Series(get_times(rng, day, n))
+    alert = rng.choice(len(ALERTS), n, p=[share for _, _, share, _ in ALERTS])
+    names = list(field_mapping_intrusion_detection)
+    return pd.DataFrame({
+        # 4/6/2012 17:23, without leading zeros like the original logs
+        names[0]: (times.dt.month.astype(str) + '/' + times.dt.day.astype(str) + '/' + times.dt.year.astype(str) +
+                   ' ' + times.dt.hour.astype(str) + ':' + times.dt.strftime('%M')),
+        names[1]: to_dotted(draw_addresses(rng, addresses, {'Workstations': 0.6, 'Anomalies': 0.4}, n)),
+        names[2]: rng.integers(1024, 65535, n),
+        names[3]: to_dotted(draw_addresses(rng, addresses, {
+            'Websites': 0.3, 'Financial_Servers': 0.3, 'Core_Servers': 0.1, 'Workstations': 0.3}, n)),
+        names[4]: rng.choice([80, 6667, 22, 445], n),
+        names[5]: np.array([name for name, _, _, _ in ALERTS])[alert],
+        names[6]: np.array([priority for _, priority, _, _ in ALERTS])[alert],
+        names[7]: np.array([label for _, _, _, label in ALERTS])[alert],
+        names[8]: 'TCP TTL:63 TOS:0x0 ID:' + pd.Series(rng.integers(1, 65535, n)).astype(str) + ' IpLen:20 DgmLen:52 DF',
+        names[9]: '***AP*** Seq: 0x' + pd.Series(rng.integers(1, 2 ** 31, n)).map('{:X}'.format),
+        names[10]: '',
+    })
+
+
+def write_rows(path, generate, rng, addresses, day, n):
+    """Generate the rows of one day in chunks and write them to a CSV file"""
+    with open(path, 'w', newline='') as f:
+        for start in range(0, n, CHUNK_ROWS):
+            chunk = generate(rng, addresses, day, min(CHUNK_ROWS, n - start))
+            chunk.to_csv(f, index=False, header=start == 0)
+
+
+def generate_dataset(firewall_dir, ids_dir, rows=100000, days=2, ids_ratio=0.05,
+                     start='2012-04-05', seed=0):
+    """
+    Write synthetic firewall and IDS CSVs, one file per dataset and day.
+
+    Parameters:
+    firewall_dir (str): Directory of the firewall CSVs.
+    ids_dir (str): Directory of the IDS CSVs.
+    rows (int): Firewall rows per day.
+    days (int): Number of days.
+    ids_ratio (float): IDS alerts per firewall row.
+    start (str): First day.
+    seed (int): Seed of the random numbers.
+
+    Returns:
+    list: Paths of the written files
+    """
+    rng = np.random.default_rng(seed)
+    addresses = get_category_addresses(rng)
+    os.makedirs(firewall_dir, exist_ok=True)
+    os.makedirs(ids_dir, exist_ok=True)
+
+    files = []
+    for offset in range(days):
+        day = pd.Timestamp(start) + pd.Timedelta(days=offset)
+        name = day.strftime('%Y%m%d')
+        firewall_path = os.path.join(firewall_dir, f'synthetic-firewall-{name}.csv')
+        ids_path = os.path.join(ids_dir, f'synthetic-ids-{name}.csv')
+        write_rows(firewall_path, generate_firewall_rows, rng, addresses, day, rows)
+        write_rows(ids_path, generate_intrusion_detection_rows, rng, addresses, day, int(rows * ids_ratio))
+        files += [firewall_path, ids_path]
+    return files
+
+
+def main():
+    """Write synthetic logs into the data folders"""
+    parser = argparse.ArgumentParser(description='Generate synthetic firewall and IDS logs.')
+    parser.add_argument('--firewall-dir', default='./data/firewall/')
+    parser.add_argument('--ids-dir', default='./data/intrusion-detection/')
+    parser.add_argument('--rows', type=int, default=100000, help='Firewall rows per day')
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--ids-ratio', type=float, default=0.05, help='IDS alerts per firewall row')
+    parser.add_argument('--start', default='2012-04-05', help='First day')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate_dataset(args.firewall_dir, args.ids_dir, args.rows, args.days, args.ids_ratio,
+                             args.start, args.seed)
+    for file in files:
+        print(f"{file}: {os.path.getsize(file) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
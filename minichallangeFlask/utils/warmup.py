@@ -0,0 +1,102 @@
+"""
+Background warm-up of the server.
+
+Loading the partitions, categorizing the IPs and building the rollups takes
+a while on the full dataset. Instead of doing that at import time, before the
+port is open, the steps run one after the other on a daemon thread and the
+app reports their progress (see get_status) until they are done.
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds clients are asked to wait before retrying while warming up
+RETRY_AFTER_SECONDS = 5
+
+
+class WarmUp:
+    """
+    Named steps run in order on a background thread.
+
+    Parameters:
+    steps (list): (name, callable without arguments) pairs.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.status = 'pending'
+        self.current_step = None
+        self.completed_steps = []
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the steps on a daemon thread, once, later calls return right away"""
+        if self._thread is not None:
+            return self
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self.status = 'running'
+            self.started = time.time()
+            self._thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        for name, step in self.steps:
+            with self._lock:
+                self.current_step = name
+            step_start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.exception("Warm-up step %s failed", name)
+                with self._lock:
+                    self.status = 'failed'
+                    self.error = f"{name}: {e}"
+                    self.finished = time.time()
+                return
+            logger.info("Warm-up step %s done in %.1fs", name, time.perf_counter() - step_start)
+            with self._lock:
+                self.completed_steps.append(name)
+
+        with self._lock:
+            self.status = 'ready'
+            self.current_step = None
+            self.finished = time.time()
+
+    @property
+    def ready(self):
+        """True once every step is done"""
+        return self.status == 'ready'
+
+    @property
+    def warming_up(self):
+        """True while steps are still to be run, a failed warm-up is not waited for"""
+        return self.status in ('pending', 'running')
+
+    def get_status(self):
+        """
+        Report the progress of the warm-up.
+
+        Returns:
+        dict: Status ('pending', 'running', 'ready' or 'failed'), current and
+        completed steps, progress between 0 and 1, elapsed seconds and the error
+        """
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                'status': self.status,
+                'current_step': self.current_step,
+                'completed_steps': list(self.completed_steps),
+                'progress': len(self.completed_steps) / len(self.steps) if self.steps else 1.0,
+                'elapsed_seconds': round(end - self.started, 3) if self.started else 0.0,
+                'error': self.error,
+            }
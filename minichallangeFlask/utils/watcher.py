@@ -0,0 +1,87 @@
+"""
+Polling watcher of the data directories.
+
+Change notifications (inotify and friends) are not available everywhere the
+server runs, so the CSV files of the watched directories are listed and
+stat'ed every few seconds instead. When a file was added, removed or changed
+the callback runs (in the watcher thread), e.g. to ingest the new rows.
+"""
+
+import os
+import glob
+import logging
+import threading
+
+from utils.ingest import get_source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def get_interval(interval=None):
+    """
+    Get the seconds between two polls.
+
+    Parameters:
+    interval (float, optional): Explicit interval, defaults to HPDAV_WATCH_INTERVAL.
+
+    Returns:
+    float: Seconds between polls, 0 when watching is disabled
+    """
+    if interval is None:
+        interval = float(os.environ.get('HPDAV_WATCH_INTERVAL', '0'))
+    return max(0.0, interval)
+
+
+def get_directory_fingerprint(directories):
+    """
+    Describe the CSV files of several directories by size and modification time.
+
+    Parameters:
+    directories (list): Watched directories.
+
+    Returns:
+    dict: Directory -> fingerprint of its CSV files, see get_source_fingerprint
+    """
+    fingerprint = {}
+    for directory in directories:
+        try:
+            fingerprint[directory] = get_source_fingerprint(glob.glob(os.path.join(directory, '*.csv')))
+        except OSError:
+            # A file was removed between listing and stat, the next poll sees the result
+            fingerprint[directory] = None
+    return fingerprint
+
+
+class PollingWatcher(threading.Thread):
+    """
+    Daemon thread calling a function whenever the CSV files of some directories change.
+
+    Parameters:
+    directories (list): Directories to watch.
+    callback (callable): Called without arguments after a change.
+    interval (float): Seconds between polls.
+    """
+
+    def __init__(self, directories, callback, interval):
+        super().__init__(name='data-watcher', daemon=True)
+        self.directories = list(directories)
+        self.callback = callback
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._fingerprint = get_directory_fingerprint(self.directories)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            fingerprint = get_directory_fingerprint(self.directories)
+            if fingerprint == self._fingerprint:
+                continue
+            try:
+                self.callback()
+                self._fingerprint = fingerprint
+            except Exception:
+                # Retried on the next poll, e.g. when a file was read while being replaced
+                logger.exception("Ingesting changed data failed")
+
+    def stop(self):
+        """Stop polling after the current poll"""
+        self._stopped.set()